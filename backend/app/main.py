@@ -1,11 +1,13 @@
 # backend/app.py
 from email.message import EmailMessage
+from email.utils import formatdate, parsedate_to_datetime
 import smtplib
 from dotenv import load_dotenv
 load_dotenv()
-from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException, Header, Query
+from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException, Header, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
@@ -17,13 +19,32 @@ import sqlite3
 import jwt
 import pandas as pd
 import numpy as np
+import time
+import asyncio
+import threading
+import itertools
 import logging
+from urllib.parse import parse_qs
+from contextlib import asynccontextmanager
 
 # Local modules (expected in repository)
 import database.db_manager as db_manager
+from database import async_db
 from utils.decision_engine import analyze_forecast
-from utils.forecast_engine import predict_demand
-from genai.insight_engine import generate_insights, generate_insights_async
+from utils.forecast_engine import forecast_products, active_bundle
+from utils.model_registry import registry as model_registry
+from utils.backtest_engine import run_backtest
+from utils import metrics
+from utils import profiling
+from utils import admission
+from utils import mail_queue
+from utils import scheduler
+from utils import response_formats
+from utils import upload_formats
+from utils import upload_validator
+from utils import charts
+from utils import sharded_inference
+from genai.insight_engine import generate_insights, generate_insights_async, stream_insights
 from genai.schemas import InsightInput, ForecastSummary, InventoryStatus
 
 # Optional utilities
@@ -48,6 +69,9 @@ logging.basicConfig(level=logging.INFO)
 JWT_SECRET = os.getenv("JWT_SECRET", "niyojan_default_secret_change_me")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "720"))
+METRICS_TOKEN = os.getenv("NIYOJAN_METRICS_TOKEN")  # optional bearer token for /metrics
+PRERENDER_REPORTS = os.getenv("NIYOJAN_PRERENDER_REPORTS", "1") == "1"  # render each batch's PDF after /forecast
+STREAM_SHARD_SIZE = int(os.getenv("NIYOJAN_STREAM_SHARD_SIZE", "500"))  # products per /forecast/stream event
 
 BASE_DIR = os.path.dirname(__file__)
 DB_PATH = os.path.join(BASE_DIR, "..", "database", "niyojan.db")
@@ -63,14 +87,38 @@ try:
 except Exception as e:
     logger.warning("db_manager init/ensure_default_admin failed: %s", e)
 
-app = FastAPI(title="Niyojan Demand Forecasting API", version="1.0")
+@asynccontextmanager
+async def lifespan(app):
+    # per-process background work; runs in each worker after the fork
+    sharded_inference.log_status()
+    optional = {**response_formats.available(), **upload_formats.available()}
+    missing = sorted(p for p, ok in optional.items() if not ok)
+    if missing:
+        logger.warning("optional packages not installed, their formats are off: %s", ", ".join(missing))
+    else:
+        logger.info("optional encoders active: %s", ", ".join(sorted(optional)))
+    mail_queue.start()
+    if scheduler.SCHEDULER_ENABLED:
+        scheduler.scheduler.start()
+    yield
+    await scheduler.scheduler.stop()
+    mail_queue.stop()
+    async_db.stop()
+
+app = FastAPI(title="Niyojan Demand Forecasting API", version="1.0", lifespan=lifespan)
+# innermost: its 429s still get CORS headers and show up in the HTTP metrics.
+# The lambda defers to _request_subject, defined with the JWT helpers below.
+app.add_middleware(admission.AdmissionMiddleware, identify=lambda scope: _request_subject(scope))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # api.ts reads ETag for conditional polling and Retry-After on 429
+    expose_headers=["ETag", "Last-Modified", "Retry-After"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 # -------------------------
 # JWT helpers
@@ -99,24 +147,48 @@ def get_token_from_header(authorization: Optional[str] = Header(None), token: Op
             return authorization.split(" ", 1)[1].strip()
     raise HTTPException(status_code=401, detail="Unauthorized: token required")
 
-def get_current_user(token: str = Depends(get_token_from_header)):
+async def get_current_user(token: str = Depends(get_token_from_header)):
     payload = decode_token(token)
     email = payload.get("sub")
     role = payload.get("role", "analyst")
     if not email:
         raise HTTPException(status_code=401, detail="Invalid token payload")
-    user = db_manager.find_user_by_email(email)
+    user = await async_db.read(db_manager.find_user_by_email, email)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return {"email": email, "role": role}
 
 def require_role(role: str):
-    def checker(current_user=Depends(get_current_user)):
+    async def checker(current_user=Depends(get_current_user)):
         if current_user["role"] != role:
             raise HTTPException(status_code=403, detail="Forbidden: insufficient privileges")
         return current_user
     return checker
 
+def _scope_claims(scope) -> Dict[str, Any]:
+    """Verified JWT claims for ASGI middleware (same token sources as get_token_from_header), {} if none."""
+    token = (parse_qs(scope.get("query_string", b"").decode()).get("token") or [None])[0]
+    if not token:
+        for key, value in scope.get("headers", []):
+            if key == b"authorization" and value.lower().startswith(b"bearer "):
+                token = value.split(b" ", 1)[1].strip().decode()
+    if not token:
+        return {}
+    try:
+        return decode_token(token)
+    except HTTPException:
+        return {}
+
+def _is_admin_request(scope) -> bool:
+    return _scope_claims(scope).get("role") == "admin"
+
+def _request_subject(scope) -> Optional[str]:
+    """User key for admission control's per-user limits."""
+    return _scope_claims(scope).get("sub")
+
+# admins can profile any request with X-Niyojan-Profile: <mode> or ?profile=<mode>
+app.add_middleware(profiling.ProfileMiddleware, authorize=_is_admin_request)
+
 # -------------------------
 # Models
 # -------------------------
@@ -134,10 +206,25 @@ class ForecastResponseModel(BaseModel):
     products: int
     horizon: int
     data: List[Dict[str, Any]]
+    model_version: Optional[str] = None
+    batch_id: Optional[int] = None
+    validation: Optional[Dict[str, Any]] = None
 
 class SendReportBody(BaseModel):
     recipients: List[str]
 
+class ScheduleBody(BaseModel):
+    name: str
+    cron: str                      # "0 6 * * 1" = Mondays 06:00 (server time)
+    job: str = "forecast_report"   # forecast_report | report
+    horizon: int = 4
+    recipients: List[str] = []
+    lists: List[str] = []          # distribution list names
+    enabled: bool = True
+
+class DistributionListBody(BaseModel):
+    recipients: List[str]
+
 class InsightRequest(BaseModel):
     product_name: str
     current_stock: int
@@ -147,124 +234,140 @@ class InsightRequest(BaseModel):
 # -------------------------
 # Small helpers
 # -------------------------
-def sqlite3_connect():
-    # centralized DB path
-    con = sqlite3.connect(os.path.join(os.path.dirname(__file__), "..", "database", "niyojan.db"))
-    con.row_factory = sqlite3.Row
-    return con
-
-def build_report_payload_from_db(limit: int = 50):
+def _validators(tag: str, versions: Dict[str, Any]) -> Dict[str, str]:
     """
-    Fetch latest forecasts batch and compute overview, categories and top_products.
-    Uses 'created_at' to group the most recent batch.
+    ETag / Last-Modified headers for a response built from the tables in
+    `versions` (db_manager.get_versions). The stamps change in the same
+    transaction as the data, so equal stamps mean an identical body.
+    """
+    stamp = "-".join(f"{v}.{int(t * 1000)}" for v, t in versions.values())
+    headers = {"ETag": f'"{tag}-{stamp}"', "Cache-Control": "private, no-cache"}
+    changed = max((t for _, t in versions.values()), default=0)
+    if changed:
+        headers["Last-Modified"] = formatdate(changed, usegmt=True)
+    return headers
+
+def _not_modified(validators: Dict[str, str], if_none_match: Optional[str],
+                  if_modified_since: Optional[str]) -> Optional[Response]:
+    """A 304 carrying the validators when the client's copy is current, else None."""
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since (RFC 9110)
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        fresh = "*" in tags or validators["ETag"] in tags
+    elif if_modified_since and "Last-Modified" in validators:
+        try:
+            modified = parsedate_to_datetime(validators["Last-Modified"])
+            # dates have 1 s resolution: within the stamp's own second another write could still follow
+            fresh = modified <= parsedate_to_datetime(if_modified_since) and modified.timestamp() + 1 <= time.time()
+        except (TypeError, ValueError):
+            fresh = False
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    metrics.cache_lookup("conditional_get", True)
+    return Response(status_code=304, headers=validators)
+
+def _load_sales_frame(raw: bytes):
+    """Parse an upload (CSV, gzip/zstd CSV, Parquet or Arrow), check required columns and validate rows.
+
+    Returns the cleaned frame (Week as datetime) and the validation report.
     """
     try:
-        max_ts = db_manager.get_latest_batch_timestamp()
-        
-        if not max_ts:
-            return {"products": 0, "horizon": 0, "forecast_total": 0, "avg_growth": 0}, [], [], []
-
-        # 2. Fetch all forecasts in that batch (allowing small time window drift if separate commits)
-        #    We use a window of 60 seconds
-        rows = db_manager.get_all_forecasts_raw_query(max_ts)
-        
-        # 3. Fetch alerts (latest batch)
-        # Re-using raw connection for alerts or adding logic to db_manager?
-        # Let's just do a quick query here or add to db_manager. for now, inline is deprecated, let's use db manager if possible
-        # but to save time, assume get_all_alerts returns everything.
-        # Actually proper way: filter alerts by max_ts too.
-        # Since I didn't add filter support to `get_all_alerts`, I will filter in python or add a new method?
-        # Let's filter in python for safety if list is small, or just assume latest.
-        # Ideally, we should add 'get_alerts_batch' to db manager.
-        # For this turn, I will use `get_all_alerts` and filter by timestamp manually if needed, 
-        # or better: rely on `LIMIT` logic or similar.
-        all_alerts = db_manager.get_all_alerts()
-        # Filter alerts created close to max_ts
-        from datetime import datetime, timedelta
-        
-        # max_ts string to dt? SQLite returns string.
-        # Simple string comparison works for ISO8601
-        # timestamp format: YYYY-MM-DD HH:MM:SS
-        # 1 min window roughly
-        alerts = [a for a in all_alerts if a['created_at'] >= max_ts] 
-        # Actually exact match implies >= because max_ts is the latest forecast. Alerts are created at same time.
-        # Safe to just take top N or filter by date string prefix
-        
+        with metrics.stage("upload.parse_csv"):
+            df = upload_formats.read_frame(raw)
+    except upload_formats.UnsupportedUpload as e:
+        raise HTTPException(status_code=415, detail=str(e))
     except Exception as e:
-        logger.error("Error building report payload: %s", e)
-        return {"products": 0, "horizon": 0, "forecast_total": 0, "avg_growth": 0}, [], [], []
-
-    # Processing Forecast Data
-    # Group by product to find horizon
-    product_map = {} # productId -> list of forecasts
-    category_map = {} # category -> total forecast
-    last_week_sales_map = {} # productId -> last_week_sales (taking unique)
-    
-    for r in rows:
-        pid = r['product']
-        cat = r['category'] or "Unknown"
-        val = float(r['forecast'])
-        lw_sales = float(r.get('last_week_sales') or 0.0)
-        
-        if pid not in product_map:
-            product_map[pid] = []
-        product_map[pid].append(val)
-        
-        # Store last week sales (overwrite is fine as it should be same for all rows of same product, or use max)
-        last_week_sales_map[pid] = lw_sales
-        
-        if cat not in category_map:
-            category_map[cat] = {"products": set(), "total": 0}
-        category_map[cat]["products"].add(pid)
-        category_map[cat]["total"] += val
-
-    # Compute Overview
-    num_products = len(product_map)
-    horizon = len(list(product_map.values())[0]) if num_products > 0 else 0
-    forecast_total = sum(sum(vals) for vals in product_map.values())
-    
-    # Calculate Avg Weekly Growth
-    # Avg Weekly Forecast = Total Forecast / Horizon
-    # Last Week Total = Sum of all products' last week sales
-    total_last_week_sales = sum(last_week_sales_map.values())
-    
-    avg_weekly_forecast = forecast_total / horizon if horizon > 0 else 0
-    
-    avg_growth = 0.0
-    if total_last_week_sales > 0:
-        avg_growth = ((avg_weekly_forecast / total_last_week_sales) - 1) * 100
-
-    categories = []
-    for cat, data in category_map.items():
-        categories.append({
-            "category": cat,
-            "products": len(data["products"]),
-            "total": int(data["total"]),
-            "avgPerProduct": int(data["total"] / len(data["products"])) if data["products"] else 0
-        })
+        raise HTTPException(status_code=400, detail=f"Invalid upload file: {e}")
+
+    # cleanse and normalize
+    df.columns = df.columns.str.strip()
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(missing)}")
+
+    try:
+        with metrics.stage("upload.validate"):
+            df, report = upload_validator.validate(df)
+    except upload_validator.UploadRejected as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), "validation": e.report})
+    if report["errors"] or report["warnings"]:
+        logger.info("upload validation: %d of %d rows kept, %s", report["valid_rows"], report["rows"],
+                    sorted(report["errors"]) + sorted(report["warnings"]))
+    return df, report
+
+def _sales_history_rows(df: pd.DataFrame):
+    """Rows for db_manager.bulk_upsert_sales_history, built column-wise."""
+    if 'Price' in df.columns:
+        price = df['Price']
+    elif 'Price_per_Unit' in df.columns:
+        price = df['Price_per_Unit']
+    else:
+        price = pd.Series(0.0, index=df.index)
+    return list(zip(
+        df['Product_ID'].astype(str),
+        df['Product_Name'].astype(str),
+        df['Category'].astype(str),
+        df['Week'].dt.strftime('%Y-%m-%d'),
+        df['Sales_Quantity'].fillna(0).astype(float),
+        price.fillna(0).astype(float),
+    ))
+
+EMPTY_OVERVIEW = {"products": 0, "horizon": 0, "forecast_total": 0, "avg_growth": 0}
+
+def _summary_sections(summary):
+    """overview, categories, top_products in the report's shape, from db_manager.get_batch_summary()."""
+    s = summary["overview"]
+    overview = {
+        "products": s["products"],
+        "horizon": s["horizon"],
+        "forecast_total": int(s["forecast_total"]),
+        "avg_growth": round(s["avg_growth"], 2)
+    }
+    categories = [{
+        "category": c["category"],
+        "products": c["products"],
+        "total": int(c["total"]),
+        "avgPerProduct": int(c["total"] / c["products"]) if c["products"] else 0
+    } for c in summary["categories"]]
 
-    # Prepare Top Products
-    sorted_prods = sorted(product_map.items(), key=lambda x: sum(x[1]), reverse=True)[:5]
     top_products = []
-    for pid, vals in sorted_prods:
-        total = sum(vals)
+    for p in summary["top_products"]:
         trend_str = "Stable"
-        if len(vals) > 1:
-            if vals[-1] > vals[0]: trend_str = "Upward ↗"
-            elif vals[-1] < vals[0]: trend_str = "Downward ↘"
+        if s["horizon"] > 1:
+            if p["last_forecast"] > p["first_forecast"]: trend_str = "Upward ↗"
+            elif p["last_forecast"] < p["first_forecast"]: trend_str = "Downward ↘"
         top_products.append({
-            "id": pid,
-            "name": pid, 
-            "trend": f"{int(total)} units ({trend_str})"
+            "id": p["product"],
+            "name": p["product"],
+            "trend": f"{int(p['total'])} units ({trend_str})"
         })
+    return overview, categories, top_products
 
-    overview = {
-        "products": num_products,
-        "horizon": horizon,
-        "forecast_total": int(forecast_total),
-        "avg_growth": round(avg_growth, 2)
-    }
+def _batch_summary(batch_id: Optional[int] = None, top_k: int = 5):
+    """(batch, summary) for the given or latest batch; summary is None when it has no forecasts."""
+    batch = db_manager.get_forecast_batch(batch_id) if batch_id else db_manager.get_latest_batch()
+    if not batch:
+        return batch, None
+    return batch, db_manager.get_batch_summary(batch["id"], top_k)
+
+def build_report_payload_from_db(limit: int = 50):
+    """
+    Overview, categories, top products and alerts of the latest batch, read
+    from the per-batch summary tables written with the batch, so the cost
+    does not grow with the number of forecast rows.
+    """
+    try:
+        batch, summary = _batch_summary()
+        if summary is None:
+            return dict(EMPTY_OVERVIEW), [], [], []
+        alerts = db_manager.get_batch_alerts(batch["id"])
+    except Exception as e:
+        logger.error("Error building report payload: %s", e)
+        return dict(EMPTY_OVERVIEW), [], [], []
 
+    overview, categories, top_products = _summary_sections(summary)
     return overview, categories, top_products, alerts
 
 # -------------------------
@@ -274,35 +377,35 @@ def build_report_payload_from_db(limit: int = 50):
 def health():
     return {"status": "ok", "component": "niyojan-backend", "time": datetime.utcnow().isoformat()}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint(authorization: Optional[str] = Header(None)):
+    """Prometheus text exposition of this worker's counters, stage timers and histograms."""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # -------------------------
 # Auth endpoints
 # -------------------------
 @app.post("/auth/login", response_model=AuthToken)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     # verify via db_manager
-    u = db_manager.find_user_by_email(form_data.username)
+    u = await async_db.read(db_manager.find_user_by_email, form_data.username)
     if not u:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
-    # Secure password check
-    if not db_manager.verify_user_credentials(form_data.username, form_data.password):
+    # Secure password check (PBKDF2 is CPU work: shared threadpool, not the DB read pool)
+    if not await run_in_threadpool(db_manager.verify_user_credentials, form_data.username, form_data.password):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     role = u.get("role") if u and "role" in u else "analyst"
     token = create_access_token(form_data.username, role) # type: ignore
     return AuthToken(access_token=token)
 
 @app.post("/users", status_code=201)
-def create_user_ep(body: CreateUserBody, current_user = Depends(require_role("admin"))):
+async def create_user_ep(body: CreateUserBody, current_user = Depends(require_role("admin"))):
     try:
-        db_manager.create_user(body.email, body.name or "", body.password)
-        # optionally set role if column exists
-        try:
-            conn = sqlite3_connect()
-            cur = conn.cursor()
-            cur.execute("UPDATE users SET role = ? WHERE email = ?", (body.role or "analyst", body.email))
-            conn.commit()
-            conn.close()
-        except Exception:
-            pass
+        password_hash, salt = await run_in_threadpool(db_manager.hash_new_password, body.password)
+        await async_db.write(db_manager.insert_user, body.email, body.name or "", password_hash, salt,
+                             role=body.role or "analyst")
         return {"ok": True}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=409, detail="Email already exists")
@@ -312,57 +415,26 @@ def create_user_ep(body: CreateUserBody, current_user = Depends(require_role("ad
 # -------------------------
 # Forecast endpoint (CSV upload)
 # -------------------------
-@app.post("/forecast", response_model=ForecastResponseModel)
-async def forecast_endpoint(
-    file: UploadFile = File(...),
-    horizon: int = Form(4),
-    current_user = Depends(get_current_user)
-):
-    if horizon < 1 or horizon > 12:
-        raise HTTPException(status_code=400, detail="horizon must be between 1 and 12 weeks")
-
-    # read CSV into dataframe
-    try:
-        raw = await file.read()
-        df = pd.read_csv(io.BytesIO(raw))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid CSV file: {e}")
-
-    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
-    if missing:
-        raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(missing)}")
-
-    # cleanse and normalize
-    df.columns = df.columns.str.strip()
-    try:
-        df['Week'] = pd.to_datetime(df['Week'], dayfirst=True, errors='coerce')
-    except Exception:
-        df['Week'] = pd.to_datetime(df['Week'], errors='coerce')
-    if df['Week'].isna().any():
-        raise HTTPException(status_code=400, detail="Invalid dates in 'Week' column")
+def _iter_product_groups(df: pd.DataFrame):
+    """(Product_ID, rows sorted by week, sales history) per product, lazily."""
+    # group once instead of re-filtering the frame for every Product_ID
+    for pid, psub in df.groupby('Product_ID', sort=False):
+        psub = psub.sort_values('Week')
+        sales_history = psub['Sales_Quantity'].fillna(0).astype(float).tolist()
+        if len(sales_history) < 1:
+            continue
+        yield pid, psub, sales_history
 
+def _build_results(groups, forecast_rows, methods):
+    """Response rows plus the forecasts / alerts rows to persist, for grouped products and their forecasts."""
     results = []
     forecasts_to_insert = []
     alerts_to_insert = []
 
-    # iterate unique Product_IDs and predict horizon steps
-    for pid in df['Product_ID'].unique():
-        psub = df[df['Product_ID'] == pid].sort_values('Week')
-        sales_history = psub['Sales_Quantity'].fillna(0).astype(float).tolist()
-        if len(sales_history) < 1:
-            continue
-
-        history = sales_history.copy()
-        preds = []
-        try:
-            for _ in range(horizon):
-                next_val = float(predict_demand(str(pid), history))
-                next_val = max(0.0, next_val)
-                preds.append(next_val)
-                history.append(next_val)
-        except Exception as e:
-            logger.warning("prediction failed for %s: %s", pid, e)
-            continue
+    loop_started = time.perf_counter()
+    analyze_seconds = 0.0
+    for (pid, psub, sales_history), preds, method in zip(groups, forecast_rows, methods):
+        history = sales_history + preds
 
         last_week_dt = psub['Week'].max()
         final_preds = [int(round(x)) for x in preds]
@@ -403,7 +475,8 @@ async def forecast_endpoint(
             "Last_Week_Sales": int(round(psub['Sales_Quantity'].iloc[-1] if len(psub) else 0)),
             "Forecasted_Sales": final_preds, # using final_preds as primary
             "Forecasted_Revenue": forecasted_revenue,
-            "Final_Forecasted_Sales": final_preds
+            "Final_Forecasted_Sales": final_preds,
+            "Forecast_Model": method
         }
         results.append(entry)
 
@@ -420,19 +493,75 @@ async def forecast_endpoint(
             # Alerts still generally focus on the immediate next week for urgency
             next_week_val = float(final_preds[0]) if final_preds else 0.0
             
+            analyze_started = time.perf_counter()
             analysis_result = analyze_forecast(str(pid), next_week_val, last_stock_proxy)
+            analyze_seconds += time.perf_counter() - analyze_started
             # Refactored: analyze_forecast returns a dict, we need 'message' for the alert table
             alert_msg = analysis_result["message"]
             alerts_to_insert.append((str(pid), next_week_val, alert_msg, category_val))
         except Exception:
             pass
+    metrics.record_stage("forecast.build_results", time.perf_counter() - loop_started - analyze_seconds)
+    metrics.record_stage("forecast.analyze", analyze_seconds)
+
+    return results, forecasts_to_insert, alerts_to_insert
 
+def _save_batch(forecasts_to_insert, alerts_to_insert, bundle, horizon, created_by, history_week=None):
+    batch_id = None
     if forecasts_to_insert:
         try:
-            db_manager.bulk_insert_forecasts(forecasts_to_insert)
-            db_manager.bulk_insert_alerts(alerts_to_insert)
+            batch_id = async_db.write_sync(
+                db_manager.save_forecast_batch, forecasts_to_insert, alerts_to_insert,
+                model_version=bundle.version, horizon=horizon, created_by=created_by,
+                history_week=history_week
+            )
         except Exception as e:
             logger.error("Bulk insert failed: %s", e)
+    return batch_id
+
+def _last_week(df: pd.DataFrame) -> Optional[str]:
+    """Last week of the uploaded history, stored with the batch forecast from it."""
+    return df['Week'].max().strftime('%Y-%m-%d') if len(df) else None
+
+def _store_history(df: pd.DataFrame):
+    """
+    Queue the upload for sales_history without waiting for it: it commits on
+    the DB writer while the model runs, and ahead of the batch saved after it.
+    """
+    def logged(future):
+        if future.exception() is not None:
+            logger.warning("storing sales history failed: %s", future.exception())
+    async_db.writer.submit(db_manager.bulk_upsert_sales_history, _sales_history_rows(df)).add_done_callback(logged)
+
+def _forecast_frame(df: pd.DataFrame, horizon: int, created_by: Optional[str] = None, store_history: bool = True):
+    """
+    The /forecast pipeline on a parsed sales frame: store the history,
+    forecast every product, build result rows and alerts, save the batch.
+    Blocking; scheduled re-forecasts call it on stored history.
+    """
+    # keep the upload so it can be backtested / re-forecast later
+    if store_history:
+        _store_history(df)
+
+    with metrics.stage("forecast.group_products"):
+        groups = list(_iter_product_groups(df))
+
+    # forecast every product in one routed, batched call; the bundle is taken
+    # once so a model hot swap mid-request cannot mix versions. Large catalogs
+    # are sharded over the inference process pool.
+    bundle = active_bundle()
+    try:
+        with metrics.stage("forecast.model"):
+            forecast_matrix, methods = forecast_products(
+                [str(pid) for pid, _, _ in groups], [h for _, _, h in groups], horizon, bundle=bundle
+            )
+    except Exception as e:
+        logger.error("batch prediction failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Forecasting failed: {e}")
+    logger.info("forecast routing: %s", {m: methods.count(m) for m in set(methods)})
+
+    results, forecasts_to_insert, alerts_to_insert = _build_results(groups, forecast_matrix.tolist(), methods)
+    batch_id = _save_batch(forecasts_to_insert, alerts_to_insert, bundle, horizon, created_by, _last_week(df))
 
     if not results:
         raise HTTPException(status_code=400, detail="No products with valid history found")
@@ -441,18 +570,155 @@ async def forecast_endpoint(
     resp = {
         "products": len(results),
         "horizon": horizon,
-        "data": results
+        "data": results,
+        "model_version": bundle.version,
+        "batch_id": batch_id
     }
     return resp
 
+def _stored_history_frame() -> pd.DataFrame:
+    """sales_history in the upload schema, for scheduled re-forecasts."""
+    hist = db_manager.get_sales_history_frame()
+    if hist.empty:
+        raise ValueError("no stored sales history to forecast")
+    df = hist.rename(columns={
+        'product': 'Product_ID', 'product_name': 'Product_Name', 'category': 'Category',
+        'week': 'Week', 'sales_quantity': 'Sales_Quantity', 'price': 'Price_per_Unit',
+    })
+    df['Week'] = pd.to_datetime(df['Week'], format='%Y-%m-%d')
+    return df
+
+@app.post("/forecast", response_model=ForecastResponseModel)
+async def forecast_endpoint(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    horizon: int = Form(4),
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    current_user = Depends(get_current_user)
+):
+    if horizon < 1 or horizon > 12:
+        raise HTTPException(status_code=400, detail="horizon must be between 1 and 12 weeks")
+    # rows (default) | columnar | arrow, see utils/response_formats.py
+    fmt = response_formats.pick_format(response_format, accept)
+
+    with metrics.stage("forecast.read_upload"):
+        raw = await file.read()
+    # parsing and validating a large upload is CPU work: keep it off the event loop too
+    df, validation = await run_in_threadpool(_load_sales_frame, raw)
+
+    # grouping, the model and SQLite all block: run the pipeline off the event loop
+    resp = await run_in_threadpool(_forecast_frame, df, horizon, current_user["email"])
+    resp["validation"] = validation
+    if PRERENDER_REPORTS and resp["batch_id"]:
+        # render the batch's PDF after responding, so the first report view is instant
+        background_tasks.add_task(_latest_report_pdf_quietly)
+    if fmt != "rows":
+        # bypasses response_model validation; the body is already encoded (and compressed)
+        with metrics.stage("forecast.serialize"):
+            return await run_in_threadpool(response_formats.render, resp, fmt, accept_encoding)
+    return resp
+
+def _forecast_events(df: pd.DataFrame, horizon: int, created_by: Optional[str] = None,
+                     shard_size: int = STREAM_SHARD_SIZE, validation: Optional[dict] = None):
+    """
+    _forecast_frame as (event, data) pairs, one shard of products at a time:
+    start, then products + progress per shard, then done once the history and
+    the batch are saved. Grouping is lazy too, so the first shard does not wait
+    for the whole catalog.
+    """
+    started = time.perf_counter()
+    total = int(df['Product_ID'].nunique())
+    bundle = active_bundle()
+    yield "start", {"products": total, "horizon": horizon, "shard_size": shard_size,
+                    "model_version": bundle.version, "validation": validation}
+
+    groups_iter = _iter_product_groups(df)
+    forecasts_to_insert, alerts_to_insert = [], []
+    done = 0
+    while True:
+        group_started = time.perf_counter()
+        shard = list(itertools.islice(groups_iter, shard_size))
+        metrics.record_stage("forecast.group_products", time.perf_counter() - group_started)
+        if not shard:
+            break
+        with metrics.stage("forecast.model"):
+            forecast_matrix, methods = forecast_products(
+                [str(pid) for pid, _, _ in shard], [h for _, _, h in shard], horizon, bundle=bundle
+            )
+        results, forecasts, alerts = _build_results(shard, forecast_matrix.tolist(), methods)
+        forecasts_to_insert += forecasts
+        alerts_to_insert += alerts
+        if not done:
+            metrics.record_stage("forecast.stream_first_shard", time.perf_counter() - started)
+        done += len(shard)
+        yield "products", {"data": results}
+        yield "progress", {"done": done, "total": total, "elapsed": round(time.perf_counter() - started, 3)}
+
+    # nothing above reads the stored history, so keep it out of the time to first shard
+    _store_history(df)
+    batch_id = _save_batch(forecasts_to_insert, alerts_to_insert, bundle, horizon, created_by, _last_week(df))
+    yield "done", {"products": done, "horizon": horizon, "model_version": bundle.version, "batch_id": batch_id,
+                   "elapsed": round(time.perf_counter() - started, 3)}
+
+def _encode_event(event: str, data: dict, ndjson: bool) -> bytes:
+    body = response_formats.dumps(data)
+    if ndjson:
+        return b'{"event":"' + event.encode() + b'","data":' + body + b'}\n'
+    return b"event: " + event.encode() + b"\ndata: " + body + b"\n\n"
+
+@app.post("/forecast/stream")
+async def forecast_stream_endpoint(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    horizon: int = Form(4),
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+    current_user = Depends(get_current_user)
+):
+    """
+    /forecast streamed as Server-Sent Events (default) or NDJSON
+    (?format=ndjson or Accept: application/x-ndjson). Events: start,
+    products (a shard of result rows), progress, done, error.
+    """
+    if horizon < 1 or horizon > 12:
+        raise HTTPException(status_code=400, detail="horizon must be between 1 and 12 weeks")
+    if response_format not in (None, "sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be sse or ndjson")
+    ndjson = response_format == "ndjson" or (response_format is None and "application/x-ndjson" in (accept or ""))
+
+    # upload problems are still plain 4xx responses: nothing has been streamed yet
+    df, validation = await run_in_threadpool(_load_sales_frame, await file.read())
+    events = _forecast_events(df, horizon, current_user["email"], validation=validation)
+
+    def body():
+        # sync generator: Starlette iterates it in the threadpool, off the event loop
+        try:
+            for event, data in events:
+                yield _encode_event(event, data, ndjson)
+        except Exception as e:
+            logger.exception("streamed forecast failed")
+            yield _encode_event("error", {"detail": f"Forecasting failed: {e}"}, ndjson)
+
+    if PRERENDER_REPORTS:
+        background_tasks.add_task(_latest_report_pdf_quietly)
+    return StreamingResponse(
+        body(), media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        # proxies (nginx) must not buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # -------------------------
 # Download CSV (calls same pipeline)
 # -------------------------
 @app.post("/download")
 async def download_csv(file: UploadFile = File(...), horizon: int = Form(4), current_user = Depends(get_current_user)):
-    # call forecast endpoint functionally (avoid double-parse by calling internal logic is complicated here),
-    # simplest reliable approach: call forecast_endpoint to obtain JSON then convert to CSV
-    resp = await forecast_endpoint(file=file, horizon=horizon, current_user=current_user)
+    # same pipeline as /forecast, then flattened to CSV
+    if horizon < 1 or horizon > 12:
+        raise HTTPException(status_code=400, detail="horizon must be between 1 and 12 weeks")
+    df, _ = await run_in_threadpool(_load_sales_frame, await file.read())
+    resp = await run_in_threadpool(_forecast_frame, df, horizon, current_user["email"])
     rows = []
     for f in resp['data']:
         row = {
@@ -476,56 +742,161 @@ async def download_csv(file: UploadFile = File(...), horizon: int = Form(4), cur
     return StreamingResponse(io.BytesIO(output.getvalue().encode('utf-8')), media_type='text/csv',
                              headers={"Content-Disposition": f"attachment; filename={filename}"})
 
+# -------------------------
+# Backtesting (rolling origin)
+# -------------------------
+@app.post("/backtest")
+async def backtest_endpoint(
+    file: Optional[UploadFile] = File(None),
+    horizon: int = Form(4),
+    context: Optional[int] = Form(None),
+    stride: int = Form(1),
+    max_origins: Optional[int] = Form(None),
+    methods: Optional[str] = Form(None),
+    current_user = Depends(get_current_user)
+):
+    """
+    Score LSTM and baseline forecasts over every rolling origin of the
+    uploaded CSV (or of the stored history when no file is sent).
+    """
+    if horizon < 1 or horizon > 12:
+        raise HTTPException(status_code=400, detail="horizon must be between 1 and 12 weeks")
+    if stride < 1:
+        raise HTTPException(status_code=400, detail="stride must be >= 1")
+
+    df = None
+    if file is not None:
+        raw = await file.read()
+        df = (await run_in_threadpool(_load_sales_frame, raw))[0]
+    try:
+        return await run_in_threadpool(
+            run_backtest, df, horizon=horizon, context=context, stride=stride, max_origins=max_origins,
+            methods=methods.split(",") if methods else None,
+            source=file.filename if file is not None else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Backtest failed")
+        raise HTTPException(status_code=500, detail=f"Backtest failed: {e}")
+
+@app.get("/backtest/{run_id}")
+async def backtest_result_endpoint(run_id: int, level: Optional[str] = Query(None), current_user = Depends(get_current_user)):
+    result = await async_db.read(db_manager.get_backtest_run, run_id, level)
+    if not result:
+        raise HTTPException(status_code=404, detail="Backtest run not found")
+    return result
+
 # -------------------------
 # Alerts & Forecast retrieval
 # -------------------------
 @app.get("/alerts")
-def alerts_endpoint(current_user = Depends(get_current_user)):
+async def alerts_endpoint(response: Response, if_none_match: Optional[str] = Header(None),
+                          if_modified_since: Optional[str] = Header(None), current_user = Depends(get_current_user)):
     try:
-        alerts = db_manager.get_all_alerts()
+        validators = _validators("alerts", await async_db.read(db_manager.get_versions, "alerts"))
+        not_modified = _not_modified(validators, if_none_match, if_modified_since)
+        if not_modified:
+            return not_modified
+        metrics.cache_lookup("conditional_get", False)
+        alerts = await async_db.read(db_manager.get_all_alerts)
+        response.headers.update(validators)
         return {"count": len(alerts), "data": alerts}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch alerts: {e}")
 
 @app.get("/forecasts")
-def forecasts_endpoint(limit: int = Query(50, ge=1, le=1000), current_user = Depends(get_current_user)):
+async def forecasts_endpoint(response: Response, limit: int = Query(50, ge=1, le=1000),
+                             if_none_match: Optional[str] = Header(None), if_modified_since: Optional[str] = Header(None),
+                             current_user = Depends(get_current_user)):
     try:
-        if hasattr(db_manager, 'get_all_forecasts'):
-            data = db_manager.get_all_forecasts(limit=limit) # type: ignore
-            return {"count": len(data), "data": data}
-        # fallback: read from forecasts table directly
-        conn = sqlite3_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT product, forecast, created_at FROM forecasts ORDER BY created_at DESC LIMIT ?", (limit,))
-        rows = cur.fetchall()
-        conn.close()
-        data = [{"product": r["product"], "forecast": r["forecast"], "created_at": r["created_at"]} for r in rows]
+        validators = _validators(f"forecasts-{limit}", await async_db.read(db_manager.get_versions, "forecasts"))
+        not_modified = _not_modified(validators, if_none_match, if_modified_since)
+        if not_modified:
+            return not_modified
+        metrics.cache_lookup("conditional_get", False)
+        data = await async_db.read(db_manager.get_all_forecasts, limit=limit)
+        response.headers.update(validators)
         return {"count": len(data), "data": data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch forecasts: {e}")
 
+@app.get("/dashboard/summary")
+def dashboard_summary(batch_id: Optional[int] = Query(None), top_k: int = Query(5, ge=1, le=100),
+                      current_user = Depends(get_current_user)):
+    """Overview, category totals and top products of a batch (latest by default) from the summary tables."""
+    batch, summary = _batch_summary(batch_id, top_k)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No forecast batch found")
+    overview, categories, top_products = _summary_sections(summary)
+    return {
+        "batch_id": batch["id"],
+        "model_version": batch.get("model_version"),
+        "created_at": batch.get("created_at"),
+        "overview": {**overview, "last_week_total": int(summary["overview"]["last_week_total"])},
+        "categories": categories,
+        "top_products": top_products,
+    }
+
+# -------------------------
+# Charts (server-side heatmap and downsampled series, cached per batch)
+# -------------------------
+def _chart_batch(batch_id: Optional[int]):
+    batch = db_manager.get_forecast_batch(batch_id) if batch_id else db_manager.get_latest_batch()
+    if not batch:
+        raise HTTPException(status_code=404, detail="No forecast batch found")
+    return batch["id"]
+
+@app.get("/charts/heatmap")
+async def chart_heatmap(batch_id: Optional[int] = Query(None),
+                        by: str = Query("product", pattern="^(product|category)$"),
+                        top_k: int = Query(50, ge=1, le=charts.MAX_HEATMAP_ROWS),
+                        history_weeks: int = Query(12, ge=0, le=charts.MAX_HISTORY_WEEKS),
+                        order: str = Query("total", pattern="^(total|name|cluster)$"),
+                        current_user = Depends(get_current_user)):
+    """Units per product (or category) and week: recent history, then the batch's forecast weeks."""
+    batch = await async_db.read(_chart_batch, batch_id)
+    return await run_in_threadpool(charts.heatmap, batch, by, top_k, history_weeks, order)
+
+@app.get("/charts/series")
+async def chart_series(batch_id: Optional[int] = Query(None),
+                       product: Optional[str] = Query(None),
+                       category: Optional[str] = Query(None),
+                       points: int = Query(200, ge=charts.MIN_POINTS, le=charts.MAX_POINTS),
+                       method: str = Query("lttb", pattern="^(lttb|minmax)$"),
+                       current_user = Depends(get_current_user)):
+    """Weekly history + forecast of a product, a category or everything, at most `points` points."""
+    batch = await async_db.read(_chart_batch, batch_id)
+    payload = await run_in_threadpool(charts.series, batch, product, category, points, method)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Product or category not in this batch")
+    return payload
+
 # -------------------------
 # Report endpoints (text + PDF view + PDF download)
 # -------------------------
 @app.get("/report")
-def report_endpoint(current_user = Depends(get_current_user)):
+async def report_endpoint(response: Response, if_none_match: Optional[str] = Header(None),
+                          if_modified_since: Optional[str] = Header(None), current_user = Depends(get_current_user)):
+    validators = _validators("report", await async_db.read(db_manager.get_versions, "forecasts", "alerts"))
+    not_modified = _not_modified(validators, if_none_match, if_modified_since)
+    if not_modified:
+        return not_modified
+    metrics.cache_lookup("conditional_get", False)
+    response.headers.update(validators)
+
     # Prefer optional heavy report generator if available
     if 'generate_report' in globals():
         try:
-            text = globals().get('generate_report')()  # type: ignore
+            text = await run_in_threadpool(globals().get('generate_report'))  # type: ignore
             return {"report": text}
         except Exception:
             pass
 
     # Fallback: build from DB
     try:
-        conn = sqlite3_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT product, forecast, created_at FROM forecasts ORDER BY created_at DESC LIMIT 10")
-        forecasts = cur.fetchall()
-        cur.execute("SELECT product, forecast, alert, created_at FROM alerts ORDER BY created_at DESC LIMIT 10")
-        alerts = cur.fetchall()
-        conn.close()
+        forecasts = await async_db.read(db_manager.get_all_forecasts, limit=10)
+        alerts = await async_db.read(db_manager.get_recent_alerts, limit=10)
     except Exception:
         forecasts, alerts = [], []
 
@@ -546,7 +917,48 @@ def report_endpoint(current_user = Depends(get_current_user)):
     report_text += "\n=== Summary ===\nPlain-text report generated. Install transformers for AI summary."
     return {"report": report_text}
 
+_report_render_lock = threading.Lock()
+
+def _latest_report_pdf() -> Optional[str]:
+    """
+    PDF of the latest forecast batch, rendered once and then served from
+    REPORTS_DIR until the next batch. None when no batch exists yet.
+    """
+    batch = db_manager.get_latest_batch()
+    if not batch or not PDF_GEN_AVAILABLE:
+        return None
+    path = os.path.join(REPORTS_DIR, f"niyojan_report_batch_{batch['id']}.pdf")
+    if os.path.exists(path):
+        metrics.cache_lookup("report_pdf", True)
+        return path
+    with _report_render_lock:
+        if os.path.exists(path):
+            metrics.cache_lookup("report_pdf", True)
+            return path
+        metrics.cache_lookup("report_pdf", False)
+        overview, categories, top_products, alerts = build_report_payload_from_db()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with metrics.stage("report.pdf"):
+            generate_pdf_report(tmp_path, overview, categories, top_products, alerts) # type: ignore
+        os.replace(tmp_path, path)  # other workers never see a half-written file
+    return path
+
+def _latest_report_pdf_quietly():
+    try:
+        _latest_report_pdf()
+    except Exception as e:
+        logger.warning("pre-rendering report failed: %s", e)
+
 def _generate_pdf_for_current_user(current_user):
+    try:
+        path = _latest_report_pdf()
+    except Exception as e:
+        logger.exception("PDF generation failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"PDF generation failed: {e}")
+    if path:
+        return path
+
+    # no forecast batch yet: render the sample report for this user
     overview, categories, top_products, alerts = build_report_payload_from_db()
     # fallback sample categories/top_products if empty
     if not categories:
@@ -567,29 +979,48 @@ def _generate_pdf_for_current_user(current_user):
         raise HTTPException(status_code=500, detail="PDF generator not available on server (missing utils.pdf_report_generator)")
 
     try:
-        generate_pdf_report(output_path, overview, categories, top_products, alerts) # type: ignore
+        with metrics.stage("report.pdf"):
+            generate_pdf_report(output_path, overview, categories, top_products, alerts) # type: ignore
         return output_path
     except Exception as e:
         logger.exception("PDF generation failed: %s", e)
         raise HTTPException(status_code=500, detail=f"PDF generation failed: {e}")
 
+def _report_pdf_validators() -> Dict[str, str]:
+    """Validators of the latest batch's PDF; {} while only per-user sample reports exist."""
+    batch = db_manager.get_latest_batch()
+    if not batch or not PDF_GEN_AVAILABLE:
+        return {}
+    return _validators(f"report-{batch['id']}", db_manager.get_versions("forecast_batches"))
+
+def _report_pdf_response(current_user, disposition: str, if_none_match: Optional[str], if_modified_since: Optional[str]):
+    # checked before _generate_pdf_for_current_user, so an unchanged report is neither rendered nor read
+    validators = _report_pdf_validators()
+    if validators:
+        not_modified = _not_modified(validators, if_none_match, if_modified_since)
+        if not_modified:
+            return not_modified
+        metrics.cache_lookup("conditional_get", False)
+    output_path = _generate_pdf_for_current_user(current_user)
+    return FileResponse(output_path, media_type="application/pdf", filename=os.path.basename(output_path),
+                        headers={**validators,
+                                 "Content-Disposition": f"{disposition}; filename={os.path.basename(output_path)}"})
+
 @app.get("/report/view", response_class=FileResponse)
-def view_report(current_user = Depends(get_current_user)):
+def view_report(if_none_match: Optional[str] = Header(None), if_modified_since: Optional[str] = Header(None),
+                current_user = Depends(get_current_user)):
     """
     Generate PDF and return inline (browser preview).
     """
-    output_path = _generate_pdf_for_current_user(current_user)
-    return FileResponse(output_path, media_type="application/pdf", filename=os.path.basename(output_path),
-                        headers={"Content-Disposition": f"inline; filename={os.path.basename(output_path)}"})
+    return _report_pdf_response(current_user, "inline", if_none_match, if_modified_since)
 
 @app.get("/report/download", response_class=FileResponse)
-def download_report(current_user = Depends(get_current_user)):
+def download_report(if_none_match: Optional[str] = Header(None), if_modified_since: Optional[str] = Header(None),
+                    current_user = Depends(get_current_user)):
     """
     Generate PDF and return as attachment for download.
     """
-    output_path = _generate_pdf_for_current_user(current_user)
-    return FileResponse(output_path, media_type="application/pdf", filename=os.path.basename(output_path),
-                        headers={"Content-Disposition": f"attachment; filename={os.path.basename(output_path)}"})
+    return _report_pdf_response(current_user, "attachment", if_none_match, if_modified_since)
 
 # -------------------------
 # Send report via email (admin only)
@@ -601,69 +1032,283 @@ from utils.email_handler import send_email_report
 class SendReportBody(BaseModel):
     recipients: list[str]
 
-@app.post("/send-report")
+@app.post("/send-report", status_code=202)
 def send_report_endpoint(body: SendReportBody, current_user=Depends(get_current_user)):
     """
-    Sends the generated PDF report via email to one or more recipients.
+    Renders the PDF report and queues it for e-mail delivery to one or more
+    recipients; poll /deliveries/{delivery_id} for the outcome.
     Any authenticated user can send it for testing purposes.
     """
+    if not body.recipients:
+        raise HTTPException(status_code=400, detail="recipients must not be empty")
+    pdf_path = _generate_pdf_for_current_user(current_user)
+    subject = f"Niyojan Forecast Report - {datetime.now().strftime('%Y-%m-%d')}"
+    body_text = "Please find attached the latest Niyojan Forecast Report."
     try:
-        pdf_path = _generate_pdf_for_current_user(current_user)
-        subject = f"Niyojan Forecast Report - {datetime.now().strftime('%Y-%m-%d')}"
-        body_text = "Please find attached the latest Niyojan Forecast Report."
-        
-        ok = send_email_report(body.recipients, subject, body_text, attachments=[pdf_path])
-        if not ok:
-            raise HTTPException(status_code=500, detail="Email sending failed (check credentials / network)")
-        return {"sent_to": body.recipients, "ok": True}
+        delivery_id = mail_queue.enqueue(body.recipients, subject, body_text, attachments=[pdf_path],
+                                         created_by=current_user["email"])
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send report: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue report: {e}")
+    return {"delivery_id": delivery_id, "status": "queued", "sent_to": body.recipients, "ok": True}
+
+@app.get("/deliveries/{delivery_id}")
+def delivery_status(delivery_id: int, current_user=Depends(get_current_user)):
+    mail = mail_queue.status(delivery_id)
+    if not mail or (mail["created_by"] != current_user["email"] and current_user["role"] != "admin"):
+        raise HTTPException(status_code=404, detail="Delivery not found")
+    return mail
+
+
+# -------------------------
+# Model registry (admin only)
+# -------------------------
+@app.get("/admin/models")
+def list_models(current_user = Depends(require_role("admin"))):
+    return {"versions": model_registry.list_versions(), **model_registry.status()}
+
+@app.get("/admin/models/status")
+def model_status(current_user = Depends(require_role("admin"))):
+    return model_registry.status()
+
+@app.post("/admin/models/{version}/activate", status_code=202)
+def activate_model(version: str, wait: bool = Query(False), current_user = Depends(require_role("admin"))):
+    """
+    Load, warm up and atomically swap in a model version. Requests already
+    running finish on the old version; other workers follow the ACTIVE pointer.
+    """
+    try:
+        return model_registry.activate(version, background=not wait)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model activation failed: {e}")
+
+
+# -------------------------
+# Report schedules (admin only)
+# -------------------------
+def _schedule_recipients(params):
+    recipients = list(params.get("recipients") or [])
+    wanted = set(params.get("lists") or [])
+    for dl in db_manager.get_distribution_lists():
+        if dl["name"] in wanted:
+            recipients += dl["recipients"]
+    return list(dict.fromkeys(r.strip() for r in recipients if r.strip()))
+
+def _run_report_schedule(schedule):
+    """
+    Scheduled job: optionally re-forecast stored history, render the batch
+    PDF once and queue it to the schedule's recipients and lists.
+    """
+    params = schedule["params"]
+    notes = []
+    if schedule["job"] == "forecast_report":
+        resp = _forecast_frame(_stored_history_frame(), int(params.get("horizon", 4)),
+                               created_by=f"scheduler:{schedule['name']}", store_history=False)
+        notes.append(f"batch {resp['batch_id']}: {resp['products']} products")
+    path = _latest_report_pdf()
+    if not path:
+        raise RuntimeError("no forecast batch to report on")
+    notes.append(os.path.basename(path))
+    recipients = _schedule_recipients(params)
+    if recipients:
+        delivery_id = mail_queue.enqueue(
+            recipients, f"Niyojan Forecast Report - {datetime.now().strftime('%Y-%m-%d')}",
+            "Please find attached the latest Niyojan Forecast Report.",
+            attachments=[path], created_by=f"scheduler:{schedule['name']}"
+        )
+        notes.append(f"delivery {delivery_id} to {len(recipients)} recipient(s)")
+    return "; ".join(notes)
+
+scheduler.register_job("forecast_report", _run_report_schedule)
+scheduler.register_job("report", _run_report_schedule)
+
+@app.get("/admin/schedules")
+def schedules_list(current_user = Depends(require_role("admin"))):
+    return {"schedules": db_manager.list_schedules(), "scheduler": scheduler.scheduler.status()}
+
+@app.post("/admin/schedules", status_code=201)
+def schedule_create(body: ScheduleBody, current_user = Depends(require_role("admin"))):
+    if body.horizon < 1 or body.horizon > 12:
+        raise HTTPException(status_code=400, detail="horizon must be between 1 and 12 weeks")
+    params = {"horizon": body.horizon, "recipients": body.recipients, "lists": body.lists}
+    try:
+        return scheduler.create(body.name, body.cron, body.job, params, current_user["email"], body.enabled)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=409, detail=f"Schedule '{body.name}' already exists")
+
+@app.delete("/admin/schedules/{schedule_id}", status_code=204)
+def schedule_delete(schedule_id: int, current_user = Depends(require_role("admin"))):
+    if not async_db.write_sync(db_manager.delete_schedule, schedule_id):
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return Response(status_code=204)
+
+@app.post("/admin/schedules/{schedule_id}/run", status_code=202)
+async def schedule_run_now(schedule_id: int, current_user = Depends(require_role("admin"))):
+    """Run a schedule now in the background; its last_status shows the outcome."""
+    schedule = await async_db.read(db_manager.get_schedule, schedule_id)
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    scheduler.scheduler.run_now(schedule)
+    return {"id": schedule_id, "status": "started"}
+
+@app.get("/admin/distribution-lists")
+def distribution_lists(current_user = Depends(require_role("admin"))):
+    return {"lists": db_manager.get_distribution_lists()}
+
+@app.put("/admin/distribution-lists/{name}")
+def distribution_list_put(name: str, body: DistributionListBody, current_user = Depends(require_role("admin"))):
+    async_db.write_sync(db_manager.upsert_distribution_list, name, body.recipients)
+    return {"name": name, "recipients": body.recipients}
+
+@app.delete("/admin/distribution-lists/{name}", status_code=204)
+def distribution_list_delete(name: str, current_user = Depends(require_role("admin"))):
+    if not async_db.write_sync(db_manager.delete_distribution_list, name):
+        raise HTTPException(status_code=404, detail="Distribution list not found")
+    return Response(status_code=204)
+
+# -------------------------
+# Profiling (admin only)
+# -------------------------
+def _profile_links(meta):
+    return {**meta, "download": f"/admin/profiles/{meta['id']}/download"}
+
+@app.post("/admin/profile/start")
+async def profile_start(
+    mode: str = Query("sample"),
+    interval_ms: float = Query(profiling.SAMPLE_INTERVAL_MS, gt=0),
+    max_seconds: float = Query(profiling.WINDOW_MAX_SECONDS, gt=0, le=3600),
+    current_user = Depends(require_role("admin"))
+):
+    """
+    Start profiling the whole worker until /admin/profile/stop (or max_seconds).
+    Async so cProfile attaches to the event loop thread; "sample" sees every thread.
+    """
+    try:
+        return profiling.start_window(mode, interval_ms, max_seconds, loop=asyncio.get_running_loop())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/profile/stop")
+async def profile_stop(current_user = Depends(require_role("admin"))):
+    # halt on the event loop (cProfile is attached to it), write the files in the threadpool
+    session = profiling.halt_window()
+    if session is None:
+        raise HTTPException(status_code=409, detail="No profile is running")
+    return _profile_links(await run_in_threadpool(session.stop))
+
+@app.get("/admin/profile/status")
+def profile_status(current_user = Depends(require_role("admin"))):
+    return profiling.window_status()
+
+@app.get("/admin/profiles")
+def profiles_list(current_user = Depends(require_role("admin"))):
+    return {"profiles": profiling.list_profiles()}
+
+@app.get("/admin/profiles/{profile_id}")
+def profile_detail(profile_id: str, current_user = Depends(require_role("admin"))):
+    try:
+        return _profile_links(profiling.get_profile(profile_id))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+@app.get("/admin/profiles/{profile_id}/download", response_class=FileResponse)
+def profile_download(profile_id: str, current_user = Depends(require_role("admin"))):
+    """speedscope JSON (sample), pstats (cprofile) or a tracemalloc snapshot."""
+    try:
+        path = profiling.profile_file(profile_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/json" if path.endswith(".json") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
 
 
 # -------------------------
 # Insight Engine Endpoint
 # -------------------------
+def _insight_input(req: InsightRequest, current_user) -> InsightInput:
+    # Re-run decision logic to get structured decision tags
+    analysis = analyze_forecast(req.product_name, req.forecast_next_week, req.current_stock)
+
+    # safely map custom trend string to schema literal
+    trend_map = {
+        "Increasing": "increasing", "Decreasing": "decreasing", "Stable": "stable",
+        "Upward ↗": "increasing", "Downward ↘": "decreasing"
+    }
+    safe_trend = trend_map.get(req.trend, "stable")
+    # Ensure it matches Literal in schemas.py exactly: "increasing", "decreasing", "stable"
+    if safe_trend not in ["increasing", "decreasing", "stable"]:
+         safe_trend = "stable"
+
+    # Construct GenAI Input
+    return InsightInput(
+        product_name=req.product_name,
+        forecast_summary=ForecastSummary(
+            avg_daily_demand=req.forecast_next_week / 7.0,
+            peak_demand=req.forecast_next_week, # approx
+            trend=safe_trend
+        ),
+        inventory_status=InventoryStatus(
+            current_stock=req.current_stock,
+            days_of_cover=(req.current_stock / (req.forecast_next_week/7.0)) if req.forecast_next_week > 0 else 999.0,
+            reorder_threshold=10  # This could be dynamic in future
+        ),
+        decision=analysis["decision"], # RESTOCK, HOLD, REDUCE
+        risk_level=analysis["risk_level"], # LOW, MEDIUM, HIGH
+        context={"system_msg": analysis["message"], "user_role": current_user["role"]}
+    )
+
 @app.post("/insight")
 async def insight_endpoint(req: InsightRequest, current_user = Depends(get_current_user)):
     try:
-        # Re-run decision logic to get structured decision tags
-        analysis = analyze_forecast(req.product_name, req.forecast_next_week, req.current_stock)
-        
-        # safely map custom trend string to schema literal
-        trend_map = {
-            "Increasing": "increasing", "Decreasing": "decreasing", "Stable": "stable",
-            "Upward ↗": "increasing", "Downward ↘": "decreasing" 
-        }
-        safe_trend = trend_map.get(req.trend, "stable")
-        # Ensure it matches Literal in schemas.py exactly: "increasing", "decreasing", "stable"
-        if safe_trend not in ["increasing", "decreasing", "stable"]:
-             safe_trend = "stable"
-
-        # Construct GenAI Input
-        inp = InsightInput(
-            product_name=req.product_name,
-            forecast_summary=ForecastSummary(
-                avg_daily_demand=req.forecast_next_week / 7.0,
-                peak_demand=req.forecast_next_week, # approx
-                trend=safe_trend
-            ),
-            inventory_status=InventoryStatus(
-                current_stock=req.current_stock,
-                days_of_cover=(req.current_stock / (req.forecast_next_week/7.0)) if req.forecast_next_week > 0 else 999.0,
-                reorder_threshold=10  # This could be dynamic in future
-            ),
-            decision=analysis["decision"], # RESTOCK, HOLD, REDUCE
-            risk_level=analysis["risk_level"], # LOW, MEDIUM, HIGH
-            context={"system_msg": analysis["message"], "user_role": current_user["role"]}
-        )
-
-        from genai.insight_engine import generate_insights_async
-        output = await generate_insights_async(inp)
+        inp = _insight_input(req, current_user)
+        with metrics.stage("insight.generate"):
+            output = await generate_insights_async(inp)
         return output
     except Exception as e:
         logger.exception("Insight generation failed")
         raise HTTPException(status_code=500, detail=f"Insight generation failed: {str(e)}")
 
+@app.post("/insight/stream")
+async def insight_stream_endpoint(
+    req: InsightRequest,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+    current_user = Depends(get_current_user)
+):
+    """
+    /insight streamed as Server-Sent Events (default) or NDJSON, relaying
+    Gemini's chunks as they arrive. Events: start (prompt token estimate),
+    delta (text appended to one language/field), field (a field is
+    complete), done (the validated insight), error.
+    """
+    if response_format not in (None, "sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be sse or ndjson")
+    ndjson = response_format == "ndjson" or (response_format is None and "application/x-ndjson" in (accept or ""))
+    inp = _insight_input(req, current_user)
+
+    async def body():
+        try:
+            async for event, data in stream_insights(inp):
+                if event == "done":
+                    metrics.record_stage("insight.stream_first_chunk", data["first_chunk"])
+                    metrics.record_stage("insight.generate", data["elapsed"])
+                yield _encode_event(event, data, ndjson)
+        except Exception as e:
+            logger.exception("streamed insight failed")
+            yield _encode_event("error", {"detail": f"Insight generation failed: {e}"}, ndjson)
+
+    return StreamingResponse(
+        body(), media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 
 # -------------------------
@@ -0,0 +1,47 @@
+"""
+Multi-worker serving with shared model weights.
+
+    NIYOJAN_MODEL_VARIANT=numpy_int8 NIYOJAN_WORKERS=4 gunicorn -c backend/gunicorn.conf.py backend.app:app
+
+NumPy variants map <variant>.weights read-only (utils/shared_weights.py),
+so every worker points at the same page-cache copy of the weights, and the
+app is preloaded in the master so workers inherit the imported modules
+copy-on-write. TensorFlow is not fork-safe: with the keras / tflite
+variants preload stays off by default and each worker loads on its own
+(the TFLite interpreter still maps the .tflite file rather than copying it).
+"""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+_variant = os.getenv("NIYOJAN_MODEL_VARIANT", "keras")
+
+bind = os.getenv("NIYOJAN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("NIYOJAN_WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("NIYOJAN_WORKER_TIMEOUT", "120"))
+preload_app = os.getenv("NIYOJAN_PRELOAD", "1" if _variant.startswith("numpy") else "0") == "1"
+
+
+def on_starting(server):
+    """Pull the served weight files into the page cache once, before any worker maps them."""
+    from utils.model_registry import registry
+    from utils.shared_weights import warm
+
+    try:
+        files = registry.variant_files(_variant)
+    except Exception as e:  # a broken registry should surface in the workers, not block startup
+        server.log.warning("could not resolve model files for %s: %s", _variant, e)
+        return
+    if files:
+        server.log.info("warmed %.1f KiB of %s weights (%s)", warm(files) / 1024, _variant,
+                        ", ".join(os.path.relpath(f, ROOT_DIR) for f in files))
+    else:
+        server.log.info("model variant %s: no shared weight files, workers load their own copy", _variant)
+
+
+def post_fork(server, worker):
+    server.log.info("worker %s started (variant=%s, preload=%s)", worker.pid, _variant, preload_app)
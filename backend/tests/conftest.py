@@ -0,0 +1,87 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# manual scripts: they need a live Gemini key / a running server
+collect_ignore = ["test_llm.py", "verify_insight.py"]
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """A fresh schema in a temporary file; db_manager reads DB_PATH at call time."""
+    from database import db_manager
+    monkeypatch.setattr(db_manager, "DB_PATH", str(tmp_path / "niyojan.db"))
+    db_manager.init_db()
+    return db_manager
+
+
+# the three tables of the first release, before forecast batches existed
+BASELINE_SCHEMA = """
+CREATE TABLE forecasts (id INTEGER PRIMARY KEY AUTOINCREMENT, product TEXT NOT NULL, category TEXT,
+                        last_week_sales REAL DEFAULT 0, forecast REAL NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE alerts (id INTEGER PRIMARY KEY AUTOINCREMENT, product TEXT NOT NULL, category TEXT, forecast REAL,
+                     alert TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL, name TEXT,
+                    password_hash TEXT NOT NULL, salt TEXT NOT NULL, role TEXT DEFAULT 'analyst',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+"""
+
+
+def legacy_run(conn, at, products, horizon, category="Grains"):
+    """One /forecast call as the first release stored it: product by product, no batch."""
+    for i, product in enumerate(products):
+        conn.executemany(
+            "INSERT INTO forecasts (product, category, last_week_sales, forecast, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(product, category, 10.0 + i, 20.0 + i + week, at) for week in range(horizon)]
+        )
+    conn.executemany(
+        "INSERT INTO alerts (product, category, forecast, alert, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(product, category, 20.0, "Stable", at) for product in products]
+    )
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """
+    A first-release database holding two /forecast runs 30 s apart (P1, P2
+    for 2 weeks, then P1-P3 for 3 weeks), migrated by init_db().
+    """
+    import sqlite3
+    from database import db_manager
+    path = str(tmp_path / "niyojan.db")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        legacy_run(conn, "2024-03-04 10:00:00", ["P1", "P2"], 2)
+        legacy_run(conn, "2024-03-04 10:00:30", ["P1", "P2", "P3"], 3, category="Dairy")
+    monkeypatch.setattr(db_manager, "DB_PATH", path)
+    db_manager.init_db()
+    return db_manager
+
+
+class StubBundle:
+    version = "stub"
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    """
+    backend.app.main, imported offline: Gemini is the benchmarks stand-in, and
+    the init_db() and model load the import runs stay away from the repo.
+    """
+    from benchmarks import standins
+    from database import db_manager
+    from utils.model_registry import registry
+    standins.install_gemini(latency_ms=0)
+    mp = pytest.MonkeyPatch()
+    mp.setattr(db_manager, "DB_PATH", str(tmp_path_factory.mktemp("import") / "niyojan.db"))
+    if registry._active is None:
+        mp.setattr(registry, "_active", StubBundle())
+    from backend.app import main
+    yield main
+    mp.undo()
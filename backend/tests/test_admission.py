@@ -0,0 +1,164 @@
+import asyncio
+import json
+
+import pytest
+
+from utils import admission
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+
+
+def pool(**overrides):
+    spec = dict(concurrency=1, per_user=1, queue=1, wait=5, rate=1.0, burst=2)
+    spec.update(overrides)
+    return admission.Pool("forecast", **spec)
+
+
+# ---- Token buckets ----
+def test_bucket_allows_a_burst_then_refills_at_rate():
+    p = pool(rate=0.5, burst=2)
+    p.take_token("alice", 0.0)
+    p.take_token("alice", 0.0)
+    with pytest.raises(admission.Rejected) as e:
+        p.take_token("alice", 0.0)
+    assert e.value.reason == "rate_limited"
+    assert e.value.retry_after == pytest.approx(2.0)   # one token at 0.5/s
+    p.take_token("alice", 2.0)
+    with pytest.raises(admission.Rejected):
+        p.take_token("alice", 2.5)
+
+
+def test_buckets_are_per_user():
+    p = pool(burst=1)
+    p.take_token("alice", 0.0)
+    p.take_token("bob", 0.0)
+    with pytest.raises(admission.Rejected):
+        p.take_token("alice", 0.0)
+
+
+def test_refill_is_capped_at_burst():
+    p = pool(rate=1.0, burst=2)
+    p.take_token("alice", 0.0)
+    for _ in range(2):
+        p.take_token("alice", 1000.0)
+    with pytest.raises(admission.Rejected):
+        p.take_token("alice", 1000.0)
+
+
+def test_parse_spec_overrides_defaults():
+    spec = admission.parse_spec("concurrency=4, rate=0.5", admission.parse_spec("concurrency=2,burst=3"))
+    assert spec == {"concurrency": 4.0, "burst": 3.0, "rate": 0.5}
+
+
+# ---- Middleware ----
+class App:
+    """Holds every request until `release` is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.running = 0
+
+    async def __call__(self, scope, receive, send):
+        self.running += 1
+        await self.release.wait()
+        self.running -= 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def call(middleware, user, path="/forecast", method="POST"):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "client": ("10.0.0.1", 1234), "user": user}
+    await middleware(scope, None, send)
+    start, body = messages
+    headers = dict(start["headers"])
+    return start["status"], headers.get(b"retry-after"), json.loads(body["body"]) if start["status"] == 429 else None
+
+
+def middleware(app, p):
+    return admission.AdmissionMiddleware(app, identify=lambda scope: scope["user"],
+                                         routes={("POST", "/forecast"): "forecast"}, pools={"forecast": p})
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_user_busy_rejects_a_second_request_from_the_same_user():
+    async def run():
+        app = App()
+        mw = middleware(app, pool(concurrency=2))
+        first = asyncio.create_task(call(mw, "alice"))
+        await settle()
+        status, retry_after, body = await call(mw, "alice")
+        app.release.set()
+        assert (await first)[0] == 200
+        return status, retry_after, body
+
+    status, retry_after, body = asyncio.run(run())
+    assert status == 429 and int(retry_after) >= 1
+    assert body["reason"] == "user_busy"
+
+
+def test_rate_limited_carries_the_refill_time():
+    async def run():
+        app = App()
+        app.release.set()
+        mw = middleware(app, pool(rate=0.1, burst=1))
+        assert (await call(mw, "alice"))[0] == 200
+        return await call(mw, "alice")
+
+    status, retry_after, body = asyncio.run(run())
+    assert (status, retry_after, body["reason"]) == (429, b"10", "rate_limited")
+
+
+def test_queue_full_and_fifo_handover():
+    async def run():
+        app = App()
+        mw = middleware(app, pool(concurrency=1, queue=1))
+        running = asyncio.create_task(call(mw, "alice"))
+        await settle()
+        queued = asyncio.create_task(call(mw, "bob"))
+        await settle()
+        rejected = await call(mw, "carol")
+        assert app.running == 1
+        app.release.set()
+        return rejected, await running, await queued
+
+    rejected, running, queued = asyncio.run(run())
+    assert rejected[0] == 429 and rejected[2]["reason"] == "queue_full"
+    assert running[0] == queued[0] == 200
+
+
+def test_waiting_too_long_times_out():
+    async def run():
+        app = App()
+        mw = middleware(app, pool(concurrency=1, queue=4, wait=0.05))
+        running = asyncio.create_task(call(mw, "alice"))
+        await settle()
+        timed_out = await call(mw, "bob")
+        app.release.set()
+        await running
+        return timed_out, mw.pools["forecast"]
+
+    (status, retry_after, body), p = asyncio.run(run())
+    assert status == 429 and body["reason"] == "timeout" and int(retry_after) >= 1
+    assert p.active == 0 and not p.waiters and not p.user_requests
+
+
+def test_other_routes_are_never_limited():
+    async def run():
+        app = App()
+        app.release.set()
+        mw = middleware(app, pool(rate=0.001, burst=1, per_user=1))
+        return [(await call(mw, "alice", path="/alerts", method="GET"))[0] for _ in range(5)]
+
+    assert asyncio.run(run()) == [200] * 5
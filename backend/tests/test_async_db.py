@@ -0,0 +1,72 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from database import async_db
+
+
+@pytest.fixture
+def writer(temp_db):
+    w = async_db.DBWriter(group_seconds=0.2)
+    groups = []
+    commit = w._commit
+
+    def recording(group):
+        groups.append(len(group))
+        commit(group)
+
+    w._commit = recording
+    w.groups = groups
+    yield w
+    w.stop()
+
+
+def half_written(product, conn=None):
+    """Writes a row, then fails: the row must not survive."""
+    conn.execute("INSERT INTO forecasts (product, forecast) VALUES (?, 1)", (product,))
+    raise RuntimeError("failed after writing")
+
+
+def products(db):
+    with sqlite3.connect(db.DB_PATH) as conn:
+        return [r[0] for r in conn.execute("SELECT product FROM forecasts ORDER BY id")]
+
+
+def test_failed_write_is_rolled_back_alone(writer, temp_db):
+    futures = [
+        writer.submit(temp_db.insert_forecast, "A", 1.0),
+        writer.submit(half_written, "B"),
+        writer.submit(temp_db.insert_forecast, "C", 3.0),
+    ]
+    for future in (futures[0], futures[2]):
+        assert future.result(timeout=10) is None
+    with pytest.raises(RuntimeError, match="failed after writing"):
+        futures[1].result(timeout=10)
+    assert writer.groups == [3]
+    assert products(temp_db) == ["A", "C"]
+
+
+def test_caller_gets_the_original_exception(writer, temp_db):
+    writer.submit(temp_db.insert_user, "a@example.com", "A", "hash", "salt").result(timeout=10)
+    with pytest.raises(sqlite3.IntegrityError):
+        writer.submit(temp_db.insert_user, "a@example.com", "A", "hash", "salt").result(timeout=10)
+
+
+def test_results_resolve_after_commit(writer, temp_db):
+    batch_id = writer.submit(temp_db.save_forecast_batch, [("A", 5.0, "Grains", 4.0)], []).result(timeout=10)
+    # visible to a separate connection as soon as the future resolves
+    assert temp_db.get_forecast_batch(batch_id)["products"] == 1
+
+
+def test_async_write_and_read(temp_db, monkeypatch):
+    monkeypatch.setattr(async_db, "writer", async_db.DBWriter())
+
+    async def run():
+        delivery = await async_db.write(temp_db.enqueue_mail, ["ops@example.com"], "s", "b")
+        return await async_db.read(temp_db.get_mail, delivery)
+
+    try:
+        assert asyncio.run(run())["status"] == "queued"
+    finally:
+        async_db.writer.stop()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import backtest_engine
+
+
+def sales(lengths, category=None):
+    """A long frame; product p sells 1, 2, 3, ... over its weeks."""
+    rows = []
+    for p, n in lengths.items():
+        for w in range(n):
+            rows.append({"Product_ID": p, "Category": (category or {}).get(p, "Grains"),
+                         "Week": pd.Timestamp("2024-01-01") + pd.Timedelta(weeks=w),
+                         "Sales_Quantity": float(w + 1)})
+    return pd.DataFrame(rows).sample(frac=1.0, random_state=0)   # input order must not matter
+
+
+# ---- History matrix ----
+def test_history_matrix_is_right_aligned():
+    products, categories, values, lengths = backtest_engine.history_matrix(
+        sales({"B": 2, "A": 4}, category={"B": "Dairy"}))
+    assert products.tolist() == ["A", "B"]
+    assert categories.tolist() == ["Grains", "Dairy"]
+    assert lengths.tolist() == [4, 2]
+    assert values[0].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert np.isnan(values[1, :2]).all() and values[1, 2:].tolist() == [1.0, 2.0]
+
+
+# ---- Rolling origins ----
+@pytest.mark.parametrize("context, horizon", [(3, 1), (4, 2), (2, 4)])
+def test_origin_count_for_a_horizon(context, horizon):
+    T = 10
+    _, _, values, _ = backtest_engine.history_matrix(sales({"A": T}))
+    idx, inputs, actuals = backtest_engine.rolling_origins(values, context, horizon)
+    assert len(idx) == T - context - horizon + 1
+    assert inputs.shape[1:] == (context,) and actuals.shape[1:] == (horizon,)
+    # the last origin ends on the last week
+    assert actuals[-1, -1] == T
+    assert (inputs[:, -1] + 1 == actuals[:, 0]).all()
+
+
+def test_stride_and_max_origins_count_back_from_the_end():
+    _, _, values, _ = backtest_engine.history_matrix(sales({"A": 10}))
+    _, _, actuals = backtest_engine.rolling_origins(values, 3, 1, stride=2)
+    assert actuals[:, 0].tolist() == [4.0, 6.0, 8.0, 10.0]
+    _, _, actuals = backtest_engine.rolling_origins(values, 3, 1, stride=2, max_origins=2)
+    assert actuals[:, 0].tolist() == [8.0, 10.0]
+
+
+def test_windows_in_the_padding_are_dropped():
+    _, _, values, _ = backtest_engine.history_matrix(sales({"A": 8, "B": 5}))
+    idx, _, _ = backtest_engine.rolling_origins(values, 3, 2)
+    assert np.bincount(idx).tolist() == [4, 1]
+    assert len(backtest_engine.rolling_origins(values, 6, 3)[0]) == 0
+
+
+# ---- Scoring ----
+def test_per_category_scores_match_a_groupby():
+    actuals = np.array([[10.0, 0.0], [4.0, 6.0], [5.0, 5.0]])
+    forecasts = np.array([[12.0, 1.0], [2.0, 6.0], [5.0, 8.0]])
+    groups = np.array([0, 0, 1])
+    mape, wape, bias, points = backtest_engine.score(forecasts, actuals, groups, 2)
+
+    long = pd.DataFrame({"g": np.repeat(groups, 2), "f": forecasts.ravel(), "a": actuals.ravel()})
+    long["err"] = long.f - long.a
+    by = long.groupby("g")
+    expected_wape = 100 * by.err.apply(lambda e: e.abs().sum()) / by.a.sum()
+    expected_bias = 100 * by.err.sum() / by.a.sum()
+    nz = long[long.a > 0]
+    expected_mape = 100 * (nz.err.abs() / nz.a).groupby(nz.g).mean()
+
+    np.testing.assert_allclose(wape, expected_wape.to_numpy())
+    np.testing.assert_allclose(bias, expected_bias.to_numpy())
+    np.testing.assert_allclose(mape, expected_mape.to_numpy())
+    assert points.tolist() == [4, 2]
+    # by hand: category 0 is off by 2+1+2+0 on 20 units sold
+    assert wape[0] == pytest.approx(25.0) and bias[0] == pytest.approx(5.0)
+
+
+def test_group_without_sales_scores_nan():
+    mape, wape, bias, points = backtest_engine.score(np.ones((1, 2)), np.zeros((1, 2)), np.array([1]), 2)
+    assert points.tolist() == [0, 2]
+    assert np.isnan([mape[1], wape[1], bias[1]]).all()
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from conftest import StubBundle
+from utils import baseline_engine as be
+
+
+def ses_reference(history, alpha):
+    level = history[0]
+    for y in history[1:]:
+        level = alpha * y + (1 - alpha) * level
+    return level
+
+
+def croston_reference(history, alpha):
+    size = interval = None
+    since_last = 1
+    for y in history:
+        if y > 0:
+            if size is None:
+                size, interval = y, since_last
+            else:
+                size += alpha * (y - size)
+                interval += alpha * (since_last - interval)
+            since_last = 1
+        else:
+            since_last += 1
+    return 0.0 if size is None else size / interval
+
+
+@pytest.fixture
+def histories():
+    rng = np.random.default_rng(7)
+    out = [rng.poisson(20, size=n).astype(float) for n in (1, 2, 5, 17, 60)]
+    # intermittent rows, one of them never selling
+    out += [np.where(rng.random(n) < 0.6, 0, rng.poisson(8, size=n)).astype(float) for n in (9, 40)]
+    out.append(np.zeros(12))
+    return out
+
+
+@pytest.mark.parametrize("alpha", [0.1, 0.3, 0.9])
+def test_ses_closed_form_matches_loop(histories, alpha):
+    values, lengths = be.stack_histories(histories)
+    forecast = be.simple_exponential_smoothing(values, lengths, horizon=3, alpha=alpha)
+    assert forecast.shape == (len(histories), 3)
+    expected = [ses_reference(h, alpha) for h in histories]
+    np.testing.assert_allclose(forecast[:, 0], expected, rtol=1e-9)
+    np.testing.assert_allclose(forecast[:, 2], expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize("alpha", [0.1, 0.5])
+def test_croston_matches_loop(histories, alpha):
+    values, lengths = be.stack_histories(histories)
+    forecast = be.croston(values, lengths, horizon=2, alpha=alpha)
+    expected = [croston_reference(h, alpha) for h in histories]
+    np.testing.assert_allclose(forecast[:, 0], expected, rtol=1e-9)
+    assert forecast[-1, 0] == 0.0
+
+
+def test_seasonal_naive_falls_back_to_last_value_for_short_histories():
+    long = np.arange(1, 9, dtype=float)
+    values, lengths = be.stack_histories([long, np.array([5.0, 6.0])])
+    forecast = be.seasonal_naive(values, lengths, horizon=6, season=4)
+    np.testing.assert_array_equal(forecast[0], [5, 6, 7, 8, 5, 6])
+    np.testing.assert_array_equal(forecast[1], [6] * 6)
+
+
+def test_route_products():
+    rng = np.random.default_rng(0)
+    histories = [
+        np.array([10.0, 12.0]),                      # < 3 weeks
+        rng.poisson(50, size=8).astype(float),       # shorter than the LSTM window
+        np.tile([0.0, 0.0, 9.0], 10),                # intermittent
+        rng.poisson(50, size=30).astype(float),      # regular
+    ]
+    values, lengths = be.stack_histories(histories)
+    methods = be.route_products(values, lengths, lstm_window=12)
+    assert list(methods) == [be.METHOD_MOVING_AVERAGE, be.METHOD_SES, be.METHOD_CROSTON, be.METHOD_LSTM]
+
+
+# ---- Empty histories ----
+@pytest.mark.parametrize("method", list(be.BASELINES))
+def test_empty_history_forecasts_zero(method):
+    values, lengths = be.stack_histories([np.array([]), np.array([4.0, 6.0]), np.array([])])
+    forecast = be.run_baseline(method, values, lengths, horizon=3)
+    assert forecast.shape == (3, 3)
+    np.testing.assert_array_equal(forecast[[0, 2]], 0.0)
+    assert (forecast[1] > 0).all()
+
+
+def test_ses_with_only_empty_histories():
+    values, lengths = be.stack_histories([np.array([]), np.array([])])
+    assert be.simple_exponential_smoothing(values, lengths, horizon=2).tolist() == [[0.0, 0.0]] * 2
+
+
+def test_lstm_windows_for_an_empty_history(monkeypatch):
+    from utils.model_registry import registry
+    if registry._active is None:   # forecast_engine loads the active model at import
+        monkeypatch.setattr(registry, "_active", StubBundle())
+    from utils import forecast_engine as fe
+
+    class Scaler:
+        scale_, min_ = np.array([0.5]), np.array([0.1])
+
+    class Bundle:
+        window, scaler, product_index = 4, Scaler(), None
+
+    x = fe._build_windows(Bundle(), [[], [2.0, 4.0]], ["A", "B"])
+    assert x.shape == (2, 4, 2)
+    np.testing.assert_allclose(x[0, :, 0], 0.1)
+    np.testing.assert_allclose(x[1, :, 0], [1.1, 1.1, 1.1, 2.1])
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from utils import admission
+
+FORECASTS = [
+    ("P1", 10, "Grains", 8), ("P1", 12, "Grains", 8),
+    ("P2", 5, "Dairy", 6), ("P2", 4, "Dairy", 6),
+]
+
+
+def test_summary_is_written_with_the_batch(temp_db):
+    batch_id = temp_db.save_forecast_batch(FORECASTS, [], horizon=2)
+    summary = temp_db.get_batch_summary(batch_id)
+    assert summary["overview"]["products"] == 2
+    assert summary["overview"]["forecast_total"] == 31
+    assert [c["category"] for c in summary["categories"]] == ["Grains", "Dairy"]
+    assert summary["top_products"][0]["product"] == "P1"
+    assert summary["top_products"][0]["last_forecast"] == 12
+
+
+def test_legacy_batch_is_backfilled_once_by_init_db(temp_db):
+    batch_id = temp_db.save_forecast_batch(FORECASTS, [], horizon=2)
+    before = temp_db.get_batch_summary(batch_id)
+    # a database from before the summary tables existed
+    with sqlite3.connect(temp_db.DB_PATH) as conn:
+        for table in ("batch_summary", "batch_category_summary", "batch_product_summary"):
+            conn.execute(f"DELETE FROM {table}")
+    assert temp_db.get_batch_summary(batch_id) is None
+
+    temp_db.init_db()
+    assert temp_db.get_batch_summary(batch_id) == before
+    # running the migration again (another worker starting) writes nothing twice
+    temp_db.init_db()
+    with sqlite3.connect(temp_db.DB_PATH) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM batch_product_summary").fetchone()[0] == 2
+
+
+def test_summary_write_is_idempotent(temp_db):
+    batch_id = temp_db.save_forecast_batch(FORECASTS, [], horizon=2)
+    with sqlite3.connect(temp_db.DB_PATH) as conn:
+        temp_db._write_batch_summary(conn, batch_id, FORECASTS, 2)
+        assert conn.execute("SELECT COUNT(*) FROM batch_category_summary").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM batch_product_summary").fetchone()[0] == 2
+
+
+# ---- A first-release database ----
+@pytest.fixture
+def client(main, legacy_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", False)
+    monkeypatch.setattr(main, "REPORTS_DIR", str(tmp_path))
+    legacy_db.create_user("analyst@example.com", "Analyst", "secret")
+    token = main.create_access_token("analyst@example.com", "analyst")
+    return TestClient(main.app, headers={"Authorization": f"Bearer {token}"})
+
+
+def test_legacy_rows_are_summarized_by_the_migration(legacy_db):
+    summary = legacy_db.get_batch_summary(legacy_db.get_latest_batch()["id"])
+    assert summary["overview"]["products"] == 3
+    assert summary["overview"]["forecast_total"] == 3 * (20 + 21 + 22) + 3 + 6
+    assert [c["category"] for c in summary["categories"]] == ["Dairy"]
+
+
+def test_dashboard_and_report_serve_the_last_legacy_run(client, main):
+    body = client.get("/dashboard/summary").json()
+    assert body["model_version"] == "legacy"
+    assert body["overview"]["products"] == 3 and body["overview"]["horizon"] == 3
+    assert [p["id"] for p in body["top_products"]] == ["P3", "P2", "P1"]
+
+    overview, categories, top_products, alerts = main.build_report_payload_from_db()
+    assert overview["products"] == 3 and len(alerts) == 3
+
+    pdf = client.get("/report/view")
+    assert pdf.status_code == 200 and pdf.headers["content-type"] == "application/pdf"
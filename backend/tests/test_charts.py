@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from utils import charts
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    charts.clear_cache()
+    yield
+    charts.clear_cache()
+
+
+# ---- Downsampling ----
+@pytest.mark.parametrize("n, points", [(10, 3), (100, 7), (1000, 50), (1001, 200)])
+def test_lttb_keeps_endpoints(n, points):
+    rng = np.random.default_rng(n)
+    x, y = np.arange(n, dtype=float), rng.normal(size=n)
+    keep = charts.lttb(x, y, points)
+    assert len(keep) == points
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_a_lone_spike():
+    y = np.zeros(500)
+    y[237] = 100.0
+    assert 237 in charts.lttb(np.arange(500, dtype=float), y, 20)
+
+
+@pytest.mark.parametrize("points", [2, 10, 500])
+def test_short_or_tiny_budgets_keep_everything(points):
+    y = np.arange(10, dtype=float)
+    assert charts.lttb(np.arange(10.0), y, points).tolist() == list(range(10))
+    assert charts.minmax(y, points).tolist() == list(range(10))
+
+
+def test_minmax_keeps_every_extreme_and_endpoints():
+    rng = np.random.default_rng(1)
+    y = rng.normal(size=1000)
+    y[[100, 700]] = 50.0, -50.0
+    keep = charts.minmax(y, 40)
+    assert keep[0] == 0 and keep[-1] == 999
+    assert {100, 700} <= set(keep.tolist())
+    assert len(keep) <= 40
+
+
+def test_downsample_returns_matching_pairs():
+    x, y = np.arange(300) * 10, np.sin(np.arange(300) / 10.0)
+    for method in charts.METHODS:
+        dx, dy = charts.downsample(x, y, 30, method)
+        assert dx[0] == 0 and dx[-1] == 2990
+        assert (dy == y[dx // 10]).all()
+
+
+# ---- Payloads scoped to the batch ----
+def history(products, weeks, units=10.0, category="Grains"):
+    return [(p, p, category, str(np.datetime64("2024-01-01") + np.timedelta64(7 * w, "D")), units, 1.0)
+            for p in products for w in range(weeks)]
+
+
+def forecast_rows(products, horizon=2, category="Grains"):
+    return [(p, 100.0, category, 10.0) for p in products for _ in range(horizon)]
+
+
+@pytest.fixture
+def two_batches(temp_db):
+    # batch 1 is forecast from 8 weeks of A and B
+    temp_db.bulk_upsert_sales_history(history(["A", "B"], 8))
+    first = temp_db.save_forecast_batch(forecast_rows(["A", "B"]), [], horizon=2, history_week="2024-02-19")
+    # a later upload adds two weeks and a product the first batch never saw
+    temp_db.bulk_upsert_sales_history(history(["A", "B"], 10) + history(["C"], 10, units=1000.0))
+    second = temp_db.save_forecast_batch(forecast_rows(["A", "B", "C"]), [], horizon=2, history_week="2024-03-04")
+    return temp_db, first, second
+
+
+def test_heatmap_history_stops_at_the_batch_week(two_batches):
+    db, first, second = two_batches
+    old = charts.heatmap(first, history_weeks=4)
+    assert old["weeks"][:4] == ["2024-01-29", "2024-02-05", "2024-02-12", "2024-02-19"]
+    assert old["rows"] == ["A", "B"]
+    new = charts.heatmap(second, history_weeks=4)
+    assert new["weeks"][3] == "2024-03-04"
+    assert set(new["rows"]) == {"A", "B", "C"}
+
+
+def test_whole_catalog_and_category_sum_only_batch_products(two_batches):
+    db, first, second = two_batches
+    whole = charts.series(first, points=100)
+    assert whole["history"]["values"] == [20.0] * 8
+    assert whole["forecast"]["weeks"] == ["2024-02-26", "2024-03-04"]
+    assert charts.series(first, category="Grains", points=100)["history"]["values"] == [20.0] * 8
+    by_category = charts.heatmap(first, by="category", history_weeks=2)
+    assert by_category["values"] == [[20.0, 20.0, 200.0, 200.0]]
+
+
+def test_category_follows_the_batch_not_a_later_upload(two_batches):
+    db, first, second = two_batches
+    db.bulk_upsert_sales_history(history(["A"], 8, category="Pantry"))
+    assert charts.series(first, category="Grains", points=100)["history"]["values"] == [20.0] * 8
+    assert charts.series(first, category="Pantry", points=100) is None
+
+
+def test_revised_history_invalidates_the_cache(two_batches):
+    db, first, second = two_batches
+    assert charts.series(first, product="A", points=100)["history"]["values"][0] == 10.0
+    db.bulk_upsert_sales_history(history(["A"], 1, units=55.0))
+    assert charts.series(first, product="A", points=100)["history"]["values"][0] == 55.0
@@ -0,0 +1,85 @@
+import time
+from email.utils import formatdate
+
+import pytest
+from fastapi.testclient import TestClient
+
+from utils import admission
+
+FORECASTS = [("P1", 10.0, "Grains", 8.0), ("P1", 12.0, "Grains", 8.0)]
+ALERTS = [("P1", 10.0, "Reorder soon", "Grains")]
+
+
+@pytest.fixture
+def client(main, temp_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", False)
+    monkeypatch.setattr(main, "REPORTS_DIR", str(tmp_path))
+    temp_db.create_user("analyst@example.com", "Analyst", "secret")
+    token = main.create_access_token("analyst@example.com", "analyst")
+    return TestClient(main.app, headers={"Authorization": f"Bearer {token}"})
+
+
+@pytest.mark.parametrize("path", ["/alerts", "/forecasts"])
+def test_unchanged_table_answers_304(client, temp_db, path):
+    temp_db.save_forecast_batch(FORECASTS, ALERTS, horizon=2)
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    again = client.get(path, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["ETag"] == etag
+    # weak and listed tags match too
+    assert client.get(path, headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+
+@pytest.mark.parametrize("path, write", [
+    ("/alerts", lambda db: db.insert_alert("P2", "Overstock", "Dairy")),
+    ("/forecasts", lambda db: db.insert_forecast("P2", 3.0, "Dairy")),
+])
+def test_a_write_changes_the_etag(client, temp_db, path, write):
+    etag = client.get(path).headers["ETag"]
+    write(temp_db)
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["count"] == 1
+
+
+def test_forecasts_etag_depends_on_limit(client, temp_db):
+    temp_db.save_forecast_batch(FORECASTS, ALERTS, horizon=2)
+    assert client.get("/forecasts?limit=5").headers["ETag"] != client.get("/forecasts?limit=50").headers["ETag"]
+
+
+def test_if_modified_since(client, temp_db):
+    temp_db.save_forecast_batch(FORECASTS, ALERTS, horizon=2)
+    time.sleep(1.1)   # Last-Modified has 1 s resolution; the current second is never trusted
+    first = client.get("/alerts")
+    assert client.get("/alerts", headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+    stale = formatdate(time.time() - 3600, usegmt=True)
+    assert client.get("/alerts", headers={"If-Modified-Since": stale}).status_code == 200
+    # If-None-Match wins when both are sent
+    both = {"If-None-Match": '"other"', "If-Modified-Since": first.headers["Last-Modified"]}
+    assert client.get("/alerts", headers=both).status_code == 200
+
+
+def test_report_view_is_not_rendered_again(client, main, temp_db, monkeypatch):
+    temp_db.save_forecast_batch(FORECASTS, ALERTS, horizon=2)
+    first = client.get("/report/view")
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "application/pdf"
+    etag = first.headers["ETag"]
+
+    def not_again(current_user):
+        raise AssertionError("rendered a report the client already has")
+
+    render = main._generate_pdf_for_current_user
+    monkeypatch.setattr(main, "_generate_pdf_for_current_user", not_again)
+    again = client.get("/report/view", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.headers["ETag"] == etag
+
+    # a new batch is a new report
+    monkeypatch.setattr(main, "_generate_pdf_for_current_user", render)
+    temp_db.save_forecast_batch(FORECASTS, [], horizon=2)
+    assert client.get("/report/view", headers={"If-None-Match": etag}).status_code == 200
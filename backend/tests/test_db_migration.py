@@ -0,0 +1,36 @@
+import sqlite3
+
+from conftest import legacy_run
+
+
+def count(db, sql):
+    with sqlite3.connect(db.DB_PATH) as conn:
+        return conn.execute(sql).fetchone()[0]
+
+
+def test_each_legacy_run_becomes_a_batch(legacy_db):
+    assert count(legacy_db, "SELECT COUNT(*) FROM forecasts WHERE batch_id IS NULL") == 0
+    assert count(legacy_db, "SELECT COUNT(*) FROM alerts WHERE batch_id IS NULL") == 0
+    latest = legacy_db.get_latest_batch()
+    assert (latest["model_version"], latest["horizon"], latest["products"]) == ("legacy", 3, 3)
+    assert latest["created_at"] == "2024-03-04 10:00:30"
+    first = legacy_db.get_forecast_batch(latest["id"] - 1)
+    assert (first["horizon"], first["products"]) == (2, 2)
+    assert [a["product"] for a in legacy_db.get_batch_alerts(first["id"])] == ["P1", "P2"]
+    assert len(legacy_db.get_batch_alerts(latest["id"])) == 3
+
+
+def test_migration_runs_once(legacy_db):
+    legacy_db.init_db()
+    assert count(legacy_db, "SELECT COUNT(*) FROM forecast_batches") == 2
+
+
+def test_real_batches_stay_latest(legacy_db):
+    batch_id = legacy_db.save_forecast_batch([("P9", 1.0, "Grains", 1.0)], [], horizon=1)
+    # a row written later without a batch is not mistaken for an old run
+    with sqlite3.connect(legacy_db.DB_PATH) as conn:
+        legacy_run(conn, "2024-03-04 10:05:00", ["P4"], 1)
+    legacy_db.init_db()
+    assert count(legacy_db, "SELECT COUNT(*) FROM forecast_batches") == 3
+    assert legacy_db.get_latest_batch()["id"] == batch_id
+
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+ANSWER = {
+    "english": {"summary": 'Demand "spikes" at 1\\2 price.\nPlan ahead.',
+                "risk": "Low risk of stock-out.",
+                "action": "Hold the reorder plan."},
+    "hindi": {"summary": "मांग मौजूदा स्टॉक के मुकाबले स्थिर है।",
+              "risk": "जोखिम कम है।",
+              "action": "योजना जारी रखें।"},
+}
+
+
+@pytest.fixture(scope="module")
+def InsightStream():
+    from benchmarks import standins
+    standins.install_gemini(latency_ms=0)   # genai.llm_client imports the Gemini SDK
+    from genai.insight_engine import InsightStream
+    return InsightStream
+
+
+def replay(stream, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events += stream.feed(text[i:i + size])
+    return events
+
+
+def collect(events):
+    deltas, fields = {}, {}
+    for kind, lang, field, text in events:
+        if kind == "delta":
+            deltas[(lang, field)] = deltas.get((lang, field), "") + text
+        else:
+            assert (lang, field) not in fields, "field reported twice"
+            fields[(lang, field)] = text
+    return deltas, fields
+
+
+EXPECTED = {(lang, field): text for lang, values in ANSWER.items() for field, text in values.items()}
+
+
+@pytest.mark.parametrize("ensure_ascii", [False, True])      # raw Devanagari or \\uXXXX escapes
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64, 10_000])
+def test_any_chunking_gives_the_same_fields(InsightStream, ensure_ascii, size):
+    text = "```json\n" + json.dumps(ANSWER, ensure_ascii=ensure_ascii, indent=1) + "\n```"
+    stream = InsightStream()
+    deltas, fields = collect(replay(stream, text, size))
+    assert fields == EXPECTED
+    assert deltas == EXPECTED
+    assert stream.result().english.summary == ANSWER["english"]["summary"]
+
+
+def test_deltas_arrive_before_the_field_closes(InsightStream):
+    stream = InsightStream()
+    assert stream.feed('{"english": {"summary": "Demand is ') == [("delta", "english", "summary", "Demand is ")]
+    assert stream.feed('ste') == [("delta", "english", "summary", "ste")]
+    assert stream.feed('ady", "risk"') == [("delta", "english", "summary", "ady"),
+                                            ("field", "english", "summary", "Demand is steady")]
+
+
+def test_a_chunk_ending_inside_an_escape_waits_for_the_rest(InsightStream):
+    stream = InsightStream()
+    assert stream.feed('{"hindi": {"risk": "\\u092') == []
+    assert stream.feed('e\\') == [("delta", "hindi", "risk", "म")]
+    assert stream.feed('"x"') == [("delta", "hindi", "risk", '"x'), ("field", "hindi", "risk", 'म"x')]
+
+
+def test_unknown_keys_and_other_depths_are_ignored(InsightStream):
+    text = json.dumps({"summary": "root level", "english": {"summary": "kept", "extra": "dropped",
+                                                             "nested": {"risk": "too deep"}},
+                       "french": {"summary": "not a language we serve"}})
+    stream = InsightStream()
+    assert collect(stream.feed(text))[1] == {("english", "summary"): "kept"}
+
+
+def test_blank_field_is_not_reported(InsightStream):
+    stream = InsightStream()
+    events = stream.feed('{"english": {"summary": "  ", "risk": "ok"}}')
+    assert [e for e in events if e[0] == "field"] == [("field", "english", "risk", "ok")]
+
+
+def test_result_validates_the_whole_answer(InsightStream):
+    stream = InsightStream()
+    stream.feed('{"english": {"summary": "only one field"}}')
+    with pytest.raises(ValidationError):
+        stream.result()
@@ -0,0 +1,146 @@
+import time
+import smtplib
+
+import pytest
+
+from utils import mail_queue
+
+SETTINGS = {"sender": "reports@niyojan.ai", "password": "secret", "server": "localhost", "port": 25}
+
+
+class FakeSession:
+    def __init__(self, error=None, refused=None):
+        self.error = error
+        self.refused = refused or {}
+        self.sent = []
+
+    def send(self, settings, recipients, message):
+        if self.error is not None:
+            raise self.error
+        self.sent.append(recipients)
+        return self.refused
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("error, permanent", [
+    (smtplib.SMTPRecipientsRefused({"x@example.com": (550, b"no such user")}), True),
+    (smtplib.SMTPDataError(554, b"message rejected"), True),
+    (smtplib.SMTPSenderRefused(553, b"sender rejected", "reports@niyojan.ai"), True),
+    (smtplib.SMTPAuthenticationError(535, b"bad credentials"), False),
+    (smtplib.SMTPDataError(451, b"try again later"), False),
+    (smtplib.SMTPServerDisconnected("connection lost"), False),
+    (ConnectionRefusedError(111, "refused"), False),
+    (TimeoutError("timed out"), False),
+])
+def test_is_permanent(error, permanent):
+    assert mail_queue.is_permanent(error) is permanent
+
+
+def test_backoff_doubles_and_caps(monkeypatch):
+    monkeypatch.setattr(mail_queue, "MAIL_RETRY_BASE_SECONDS", 30)
+    monkeypatch.setattr(mail_queue, "MAIL_RETRY_MAX_SECONDS", 3600)
+    for attempts, expected in [(1, 30), (2, 60), (3, 120), (20, 3600)]:
+        delay = mail_queue.backoff_seconds(attempts)
+        assert 0.9 * expected <= delay <= 1.1 * expected
+
+
+@pytest.fixture
+def worker(temp_db, monkeypatch):
+    monkeypatch.setattr(mail_queue, "smtp_settings", lambda: SETTINGS)
+    monkeypatch.setattr(mail_queue, "build_message", lambda *args: type("M", (), {"as_string": lambda self: "msg"})())
+    return mail_queue.MailWorker(batch=10)
+
+
+def queue_one(db):
+    return db.enqueue_mail(["ops@example.com"], "Weekly report", "body")
+
+
+def test_delivered_mail_is_sent(worker, temp_db):
+    mail_id = queue_one(temp_db)
+    worker.session = FakeSession()
+    assert worker.drain_once() == 1
+    row = temp_db.get_mail(mail_id)
+    assert (row["status"], row["attempts"]) == ("sent", 1)
+    assert worker.session.sent == [["ops@example.com"]]
+
+
+def test_transient_failure_is_retried_later(worker, temp_db):
+    mail_id = queue_one(temp_db)
+    worker.session = FakeSession(smtplib.SMTPServerDisconnected("connection lost"))
+    worker.drain_once()
+    row = temp_db.get_mail(mail_id)
+    assert row["status"] == "queued"
+    assert row["next_attempt_at"] > time.time() + 20
+    assert "SMTPServerDisconnected" in row["last_error"]
+    # not due yet: nothing to claim
+    assert worker.drain_once() == 0
+
+
+def test_permanent_failure_is_final(worker, temp_db):
+    mail_id = queue_one(temp_db)
+    worker.session = FakeSession(smtplib.SMTPRecipientsRefused({"ops@example.com": (550, b"no such user")}))
+    worker.drain_once()
+    row = temp_db.get_mail(mail_id)
+    assert (row["status"], row["attempts"]) == ("failed", 1)
+
+
+def test_gives_up_after_max_attempts(worker, temp_db, monkeypatch):
+    monkeypatch.setattr(mail_queue, "MAIL_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(mail_queue, "backoff_seconds", lambda attempts: 0)
+    mail_id = queue_one(temp_db)
+    worker.session = FakeSession(TimeoutError("timed out"))
+    worker.drain_once()
+    assert temp_db.get_mail(mail_id)["status"] == "queued"
+    worker.drain_once()
+    row = temp_db.get_mail(mail_id)
+    assert (row["status"], row["attempts"]) == ("failed", 2)
+
+
+def test_expired_lease_is_reclaimed(temp_db):
+    mail_id = queue_one(temp_db)
+    assert [r["id"] for r in temp_db.claim_mail(10, lease_seconds=-1)] == [mail_id]
+    # the worker that claimed it died: its lease has already run out
+    reclaimed = temp_db.claim_mail(10, lease_seconds=60)
+    assert [(r["id"], r["attempts"]) for r in reclaimed] == [(mail_id, 2)]
+    assert temp_db.claim_mail(10, lease_seconds=60) == []
+
+
+# ---- Unauthenticated relays ----
+def test_sender_without_password_still_delivers(worker, temp_db, monkeypatch):
+    monkeypatch.setattr(mail_queue, "smtp_settings", lambda: {**SETTINGS, "password": None})
+    mail_id = queue_one(temp_db)
+    worker.session = FakeSession()
+    assert worker.drain_once() == 1
+    assert temp_db.get_mail(mail_id)["status"] == "sent"
+
+
+def test_no_sender_pauses_the_queue(worker, temp_db, monkeypatch):
+    monkeypatch.setattr(mail_queue, "smtp_settings", lambda: {**SETTINGS, "sender": None})
+    mail_id = queue_one(temp_db)
+    worker.session = FakeSession()
+    assert worker.drain_once() == 0
+    assert temp_db.get_mail(mail_id)["status"] == "queued"
+
+
+class FakeSMTP:
+    def __init__(self, server, port, timeout):
+        self.logins = []
+
+    def ehlo(self):
+        pass
+
+    def has_extn(self, name):
+        return name == "auth"
+
+    def login(self, user, password):
+        self.logins.append(user)
+
+
+@pytest.mark.parametrize("password, logins", [(None, []), ("", []), ("secret", ["reports@niyojan.ai"])])
+def test_login_only_with_a_password(monkeypatch, password, logins):
+    from utils import email_handler
+    monkeypatch.setattr(email_handler.smtplib, "SMTP", FakeSMTP)
+    session = email_handler.open_session({**SETTINGS, "password": password, "starttls": False, "timeout": 1})
+    assert session.logins == logins
@@ -0,0 +1,107 @@
+import asyncio
+import re
+
+import pytest
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.testclient import TestClient
+
+from utils import metrics
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/backtest/{run_id}")
+    def backtest(run_id: int):
+        if run_id == 0:
+            raise HTTPException(status_code=404)
+        with metrics.stage("test.lookup"):
+            return {"run_id": run_id}
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    return TestClient(app)
+
+
+def sample(text, name, **labels):
+    """Value of one exposed series, or None."""
+    want = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    for line in text.splitlines():
+        if line.startswith(f"{name}{{{want}}} ") or (not labels and line.startswith(f"{name} ")):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_exposition_labels_requests_with_the_route_template(client):
+    before = client.get("/metrics").text
+    ok = sample(before, "niyojan_http_requests_total", method="GET", route="/backtest/{run_id}", status="200") or 0
+    for run_id in (1, 2, 3, 0):
+        client.get(f"/backtest/{run_id}")
+    client.get("/nowhere")
+
+    body = client.get("/metrics")
+    assert body.headers["content-type"] == metrics.CONTENT_TYPE
+    text = body.text
+    assert "# TYPE niyojan_http_requests_total counter" in text
+    assert "# TYPE niyojan_http_request_seconds histogram" in text
+    assert sample(text, "niyojan_http_requests_total",
+                  method="GET", route="/backtest/{run_id}", status="200") == ok + 3
+    assert sample(text, "niyojan_http_requests_total",
+                  method="GET", route="/backtest/{run_id}", status="404") >= 1
+    assert sample(text, "niyojan_http_requests_total", method="GET", route="<unmatched>", status="404") >= 1
+    assert 'route="/backtest/1"' not in text          # raw paths never become labels
+    # the histogram closes with +Inf, _sum and _count for the same label set
+    labels = 'method="GET",route="/backtest/{run_id}"'
+    count = sample(text, "niyojan_http_request_seconds_count", method="GET", route="/backtest/{run_id}")
+    assert f'niyojan_http_request_seconds_bucket{{{labels},le="+Inf"}} {int(count)}' in text
+    assert sample(text, "niyojan_stage_seconds_count", stage="test.lookup") >= 3
+
+
+def test_histogram_buckets_are_cumulative():
+    h = metrics.Histogram("test_seconds", "t", ("kind",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 5.0):
+        h.observe(v, kind="a")
+    lines = h.render()
+    assert lines[2:] == [
+        'test_seconds_bucket{kind="a",le="0.1"} 1',
+        'test_seconds_bucket{kind="a",le="1.0"} 3',
+        'test_seconds_bucket{kind="a",le="+Inf"} 4',
+        'test_seconds_sum{kind="a"} 6.05',
+        'test_seconds_count{kind="a"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    c = metrics.Counter("test_total", "t", ("path",))
+    c.inc(path='a"b\\c\nd')
+    assert c.render()[-1] == r'test_total{path="a\"b\\c\nd"} 1'
+
+
+def test_reregistering_with_other_labels_fails():
+    metrics.counter("niyojan_test_once_total", "t", ("a",))
+    assert metrics.counter("niyojan_test_once_total", "t", ("a",)) is metrics.counter("niyojan_test_once_total", "t", ("a",))
+    with pytest.raises(ValueError):
+        metrics.counter("niyojan_test_once_total", "t", ("b",))
+
+
+def test_timed_records_sync_and_async(monkeypatch):
+    @metrics.timed("test.sync")
+    def work():
+        return 1
+
+    @metrics.timed("test.async")
+    async def async_work():
+        return 2
+
+    before = metrics.STAGE_SECONDS.snapshot(stage="test.async")[0]
+    assert work() == 1 and asyncio.run(async_work()) == 2
+    assert metrics.STAGE_SECONDS.snapshot(stage="test.async")[0] == before + 1
+    assert re.search(r'niyojan_stage_seconds_count\{stage="test.sync"\} [1-9]', metrics.render())
+
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    work()
+    assert metrics.STAGE_SECONDS.snapshot(stage="test.sync")[0] == 1
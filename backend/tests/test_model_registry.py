@@ -0,0 +1,142 @@
+import os
+import json
+import pickle
+
+import pytest
+
+from utils import model_registry as mr
+from lstm import train
+
+
+def make_version(directory, models=("global_lstm_model",), input_shape=(None, 6, 2)):
+    """A version directory with placeholder artifacts (no TensorFlow needed)."""
+    os.makedirs(directory)
+    for name in models:
+        os.makedirs(os.path.join(directory, name, "variables"))
+        with open(os.path.join(directory, name, "saved_model.pb"), "wb") as f:
+            f.write(name.encode())
+    for name in ("scaler.pkl", "label_encoder.pkl"):
+        with open(os.path.join(directory, name), "wb") as f:
+            pickle.dump(name, f)
+    with open(os.path.join(directory, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump({"input_shape": list(input_shape)}, f)
+    return str(directory)
+
+
+def test_manifest_for_full_version(tmp_path):
+    directory = make_version(tmp_path / "v1", models=("global_lstm_model", "global_lstm_direct_model"))
+    manifest = mr.build_manifest(directory)
+    assert manifest["version"] == "v1"
+    assert manifest["model"] == "global_lstm_model"
+    assert manifest["direct_model"] == "global_lstm_direct_model"
+    assert manifest["input_shape"] == [None, 6, 2]
+
+
+def test_manifest_for_direct_only_version(tmp_path):
+    # what `train.py --horizon 12 --version direct_h12` leaves behind
+    directory = make_version(tmp_path / "direct_h12", models=("global_lstm_direct_model",))
+    manifest = mr.write_manifest(directory)
+    assert manifest["model"] is None
+    assert manifest["direct_model"] == "global_lstm_direct_model"
+    assert mr.read_manifest(directory)["fingerprint"] == manifest["fingerprint"]
+    # registered, but refused for serving with a pointer to --into
+    with pytest.raises(ValueError, match="--into"):
+        mr.load_bundle("direct_h12", str(tmp_path), variant="keras")
+
+
+def test_manifest_without_any_model(tmp_path):
+    directory = make_version(tmp_path / "empty", models=())
+    with pytest.raises(FileNotFoundError):
+        mr.build_manifest(directory)
+
+
+def test_train_into_existing_version(tmp_path):
+    directory = make_version(tmp_path / "v1")
+    before = mr.write_manifest(directory)
+    assert before["direct_model"] is None
+
+    args = train.parse_args(["--horizon", "12", "--into", "v1", "--model-dir", str(tmp_path)])
+    out_dir, version, model_name = train.output_dir(args)
+    assert (out_dir, version, model_name) == (directory, "v1", "global_lstm_direct_model")
+
+    # train() saves the model there and rewrites the manifest
+    os.makedirs(os.path.join(out_dir, model_name))
+    with open(os.path.join(out_dir, model_name, "saved_model.pb"), "wb") as f:
+        f.write(b"direct")
+    after = mr.write_manifest(out_dir, version)
+    assert after["model"] == "global_lstm_model"
+    assert after["direct_model"] == "global_lstm_direct_model"
+    assert after["fingerprint"] != before["fingerprint"]
+
+    # a second direct model for the same version is refused before training
+    with pytest.raises(FileExistsError):
+        train.output_dir(args)
+
+
+@pytest.mark.parametrize("argv, error", [
+    (["--horizon", "1", "--into", "v1"], ValueError),
+    (["--horizon", "12", "--into", "missing"], FileNotFoundError),
+])
+def test_train_into_rejects(tmp_path, argv, error):
+    make_version(tmp_path / "v1")
+    with pytest.raises(error):
+        train.output_dir(train.parse_args(argv + ["--model-dir", str(tmp_path)]))
+
+
+def test_train_new_version_must_not_exist(tmp_path):
+    make_version(tmp_path / "v1")
+    with pytest.raises(FileExistsError):
+        train.output_dir(train.parse_args(["--version", "v1", "--model-dir", str(tmp_path)]))
+    args = train.parse_args(["--horizon", "12", "--version", "direct_h12", "--model-dir", str(tmp_path)])
+    assert train.output_dir(args) == (str(tmp_path / "direct_h12"), "direct_h12", "global_lstm_direct_model")
+
+
+class FakeBundle:
+    def __init__(self, version):
+        self.version = version
+
+    def warm_up(self):
+        pass
+
+    def describe(self):
+        return {"version": self.version}
+
+
+def test_refresh_retries_a_pointer_that_failed_to_load(tmp_path, monkeypatch):
+    make_version(tmp_path / "v2")
+    mr.write_manifest(str(tmp_path / "v2"))
+    registry = mr.ModelRegistry(str(tmp_path))
+    registry._active = FakeBundle("v1")
+    registry._write_pointer("v1")
+    monkeypatch.setattr(mr, "POINTER_POLL_SECONDS", 0)
+
+    attempts = []
+
+    def load_bundle(version, registry_dir, **kwargs):
+        attempts.append(version)
+        if len(attempts) == 1:
+            raise ValueError("half-written version")
+        return FakeBundle(version)
+
+    def refresh_and_wait():
+        registry._pointer_checked = 0.0
+        registry.refresh()
+        for thread in [t for t in mr.threading.enumerate() if t.name.startswith("model-load-")]:
+            thread.join(5)
+
+    monkeypatch.setattr(mr, "load_bundle", load_bundle)
+    with open(os.path.join(str(tmp_path), mr.ACTIVE_FILE), "w") as f:
+        f.write("v2")
+    os.utime(os.path.join(str(tmp_path), mr.ACTIVE_FILE), (1, 1))
+
+    refresh_and_wait()
+    assert attempts == ["v2"] and registry.active().version == "v1"
+    assert registry.status()["last_error"].startswith("v2")
+
+    # the pointer file did not change, but the failed version is tried again
+    refresh_and_wait()
+    assert attempts == ["v2", "v2"] and registry.active().version == "v2"
+
+    # followed: nothing left to do until the pointer moves again
+    refresh_and_wait()
+    assert attempts == ["v2", "v2"]
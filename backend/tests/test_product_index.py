@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from utils.product_index import ProductIndex
+
+CLASSES = ["P10", "P2", "A-7", "P1", "Z", "B"]
+
+
+@pytest.fixture
+def encoder():
+    return LabelEncoder().fit(CLASSES)
+
+
+def test_codes_match_label_encoder(encoder):
+    index = ProductIndex.from_label_encoder(encoder)
+    batch = ["Z", "P1", "P10", "A-7", "P1", "B", "P2"]
+    codes, unseen = index.encode(batch)
+    assert codes.dtype == np.float32
+    assert codes.tolist() == encoder.transform(batch).astype(float).tolist()
+    assert not unseen.any()
+
+
+def test_round_trip_keeps_batch_order(encoder):
+    index = ProductIndex.from_label_encoder(encoder)
+    batch = list(reversed(encoder.classes_))
+    codes, _ = index.encode(batch)
+    assert encoder.inverse_transform(codes.astype(int)).tolist() == batch
+
+
+def test_numeric_ids_are_looked_up_as_strings():
+    index = ProductIndex(["101", "7", "55"])
+    codes, unseen = index.encode(np.array([7, 101, 55]))
+    assert codes.tolist() == [1.0, 0.0, 2.0] and not unseen.any()
+
+
+@pytest.mark.parametrize("unseen, expected", [("mid", 2.5), ("zero", 0.0), ("4", 4.0)])
+def test_unknown_products_get_the_fallback(encoder, unseen, expected):
+    index = ProductIndex.from_label_encoder(encoder, unseen=unseen)
+    codes, mask = index.encode(["P1", "NEW", "ZZZ", "0"])   # past either end of the sorted classes
+    assert mask.tolist() == [False, True, True, True]
+    assert codes[1:].tolist() == [expected] * 3
+    with pytest.raises(ValueError):
+        encoder.transform(["NEW"])   # the encoder it replaces refused these outright
+
+
+def test_empty_index_and_empty_batch():
+    codes, mask = ProductIndex([]).encode(["A", "B"])
+    assert codes.tolist() == [0.0, 0.0] and mask.all()
+    codes, mask = ProductIndex(CLASSES).encode([])
+    assert len(codes) == 0 and len(mask) == 0
+
+
+def test_membership(encoder):
+    index = ProductIndex.from_label_encoder(encoder)
+    assert "P2" in index and "P3" not in index and "ZZ" not in index
+    assert len(index) == len(CLASSES)
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils import profiling
+
+
+@pytest.fixture(autouse=True)
+def profiles_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILES_DIR", str(tmp_path))
+    yield str(tmp_path)
+    profiling.stop_window()
+
+
+def spin_in_the_target(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(200))
+
+
+# ---- Sampler ----
+def test_sampler_finds_the_busy_function():
+    sampler = profiling.SamplingProfiler(interval_ms=1)
+    worker = threading.Thread(target=spin_in_the_target, args=(0.3,), name="busy")
+    sampler.start()
+    worker.start()
+    worker.join()
+    sampler.stop()
+
+    assert sampler.samples > 10
+    assert "busy" in sampler.stacks
+    top = {row["function"].split(" ")[0] for row in sampler.hotspots(top=5)}
+    assert "spin_in_the_target" in top
+
+    speedscope = sampler.to_speedscope("test")
+    frames = speedscope["shared"]["frames"]
+    busy = next(p for p in speedscope["profiles"] if p["name"] == "busy")
+    assert len(busy["samples"]) == len(busy["weights"])
+    assert all(0 <= i < len(frames) for stack in busy["samples"] for i in stack)
+
+
+def test_parked_threads_are_not_hotspots():
+    sampler = profiling.SamplingProfiler(interval_ms=1)
+    parked = threading.Event()
+    waiter = threading.Thread(target=parked.wait, name="parked")
+    waiter.start()
+    sampler.start()
+    time.sleep(0.1)
+    sampler.stop()
+    parked.set()
+    waiter.join()
+    assert "parked" in sampler.stacks
+    assert not any(row["function"].startswith("wait ") for row in sampler.hotspots())
+
+
+# ---- Sessions and windows ----
+@pytest.mark.parametrize("mode", profiling.MODES)
+def test_session_writes_summary_and_download(profiles_dir, mode):
+    session = profiling.ProfileSession(mode, "unit", interval_ms=1).start()
+    spin_in_the_target(0.05)
+    meta = session.stop()
+    assert meta["mode"] == mode and meta["label"] == "unit"
+    assert os.path.exists(profiling.profile_file(meta["id"]))
+    assert profiling.get_profile(meta["id"]) == json.loads(json.dumps(meta))
+    assert [p["id"] for p in profiling.list_profiles()] == [meta["id"]]
+
+
+def test_exclusive_modes_refuse_a_second_session():
+    first = profiling.ProfileSession("cprofile", "a").start()
+    try:
+        with pytest.raises(profiling.ProfilerBusy):
+            profiling.ProfileSession("cprofile", "b").start()
+    finally:
+        first.stop()
+
+
+def test_unknown_mode_and_unsafe_ids():
+    with pytest.raises(ValueError):
+        profiling.ProfileSession("perf", "x")
+    for bad in ("../secrets", ".hidden", ""):
+        with pytest.raises(FileNotFoundError):
+            profiling.get_profile(bad)
+
+
+def test_window_runs_until_stopped():
+    started = profiling.start_window("sample", interval_ms=1, max_seconds=60)
+    assert profiling.window_status() == {"running": True, "id": started["id"], "mode": "sample"}
+    with pytest.raises(profiling.ProfilerBusy):
+        profiling.start_window("sample")
+    spin_in_the_target(0.05)
+    meta = profiling.stop_window()
+    assert meta["id"] == started["id"] and meta["samples"] > 0
+    assert not profiling.window_status()["running"]
+    assert profiling.stop_window() is None
+
+
+def test_window_stops_itself_after_max_seconds():
+    started = profiling.start_window("sample", interval_ms=1, max_seconds=0.05)
+    deadline = time.time() + 5
+    while not profiling.list_profiles() and time.time() < deadline:   # halted first, then written
+        time.sleep(0.01)
+    assert not profiling.window_status()["running"]
+    assert profiling.get_profile(started["id"])["label"] == "window"
+
+
+def test_window_auto_stop_writes_off_the_event_loop(monkeypatch):
+    stopped_on = []
+    stop = profiling.ProfileSession.stop
+
+    def recording(session):
+        stopped_on.append(threading.get_ident())
+        return stop(session)
+
+    monkeypatch.setattr(profiling.ProfileSession, "stop", recording)
+
+    async def run():
+        started = profiling.start_window("cprofile", max_seconds=0.05, loop=asyncio.get_running_loop())
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if stopped_on and os.path.exists(os.path.join(profiling.PROFILES_DIR, started["id"] + ".json")):
+                break
+        return threading.get_ident(), started["id"]
+
+    loop_thread, profile_id = asyncio.run(run())
+    assert stopped_on and loop_thread not in stopped_on
+    assert profiling.get_profile(profile_id)["mode"] == "cprofile"
+
+
+def test_halt_window_only_halts_the_named_session():
+    started = profiling.start_window("sample", interval_ms=1, max_seconds=60)
+    assert profiling.halt_window("someone-else") is None
+    session = profiling.halt_window(started["id"])
+    assert not profiling.window_status()["running"]
+    assert session.stop()["id"] == started["id"]
+
+
+def test_old_profiles_are_pruned(profiles_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILES_KEEP", 2)
+    for i in range(4):
+        for suffix in (".json", ".speedscope.json"):
+            open(os.path.join(profiles_dir, f"2024010{i}-sample-x{suffix}"), "w").close()
+    profiling._prune(profiles_dir, keep=2)
+    assert sorted(os.listdir(profiles_dir)) == [
+        "20240102-sample-x.json", "20240102-sample-x.speedscope.json",
+        "20240103-sample-x.json", "20240103-sample-x.speedscope.json",
+    ]
+
+
+# ---- Per-request middleware ----
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(profiling.ProfileMiddleware,
+                       authorize=lambda scope: (b"x-admin", b"1") in scope.get("headers", []))
+
+    @app.get("/work")
+    async def work():   # cProfile follows the event loop thread
+        spin_in_the_target(0.02)
+        return {"ok": True}
+
+    @app.get("/where")
+    async def where():
+        return {"thread": threading.get_ident(), "profiler": repr(sys.getprofile()) if sys.getprofile() else None}
+
+    return TestClient(app)
+
+
+def test_admin_request_is_profiled(client):
+    response = client.get("/work", headers={"X-Niyojan-Profile": "cprofile", "X-Admin": "1"})
+    assert response.json() == {"ok": True}
+    meta = profiling.get_profile(response.headers["X-Niyojan-Profile-Id"])
+    assert meta["label"] == "GET /work"
+    assert any("spin_in_the_target" in row["function"] for row in meta["hotspots"])
+
+    by_query = client.get("/work?profile=sample", headers={"X-Admin": "1"})
+    assert profiling.get_profile(by_query.headers["X-Niyojan-Profile-Id"])["mode"] == "sample"
+
+
+def test_profile_files_are_written_off_the_event_loop(client, monkeypatch):
+    threads = {}
+    stop = profiling.ProfileSession.stop
+
+    def recording(session):
+        threads["stop"] = threading.get_ident()
+        return stop(session)
+
+    monkeypatch.setattr(profiling.ProfileSession, "stop", recording)
+    response = client.get("/where", headers={"X-Niyojan-Profile": "cprofile", "X-Admin": "1"})
+    assert threads["stop"] != response.json()["thread"]
+    # cProfile was detached from the loop thread before the files were written
+    assert response.headers["X-Niyojan-Profile-Id"]
+    assert client.get("/where").json()["profiler"] is None
+
+
+def test_others_are_served_without_a_profile(client):
+    response = client.get("/work", headers={"X-Niyojan-Profile": "sample"})
+    assert response.status_code == 200
+    assert "X-Niyojan-Profile-Id" not in response.headers
+    assert profiling.list_profiles() == []
+
+
+def test_bad_mode_is_reported_not_fatal(client):
+    response = client.get("/work", headers={"X-Niyojan-Profile": "perf", "X-Admin": "1"})
+    assert response.status_code == 200
+    assert "Unknown profile mode" in response.headers["X-Niyojan-Profile-Error"]
@@ -0,0 +1,134 @@
+import gzip
+import json
+import types
+
+import pytest
+from fastapi import HTTPException
+
+from utils import response_formats
+
+
+def forecast_response(products=2, horizon=3):
+    rows = [{"Product_ID": f"P{i}", "Product_Name": f"Item {i}", "Category": "Grains", "Price": 2.5,
+             "Trend_Symbol": "↑", "Last_Week": "2024-03-04", "Last_Week_Sales": 10 + i,
+             "Forecast_Model": "lstm", "Forecasted_Sales": [i, i + 1, i + 2][:horizon],
+             "Final_Forecasted_Sales": [i, i + 1, i + 2][:horizon], "Forecasted_Revenue": 0.0}
+            for i in range(products)]
+    return {"data": rows, "products": products, "horizon": horizon, "model_version": "v1", "batch_id": 7}
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    fake = types.SimpleNamespace(compress=lambda body, quality: b"br:" + body)
+    monkeypatch.setattr(response_formats, "brotli", fake)
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(response_formats, "brotli", None)
+
+
+# ---- Accept-Encoding ----
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),                 # br preferred on a tie
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0.1", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("identity;q=0, gzip", "gzip"),
+    ("identity", None),
+    ("*", "br"),
+    ("*;q=0.2, br;q=0", "gzip"),
+    ("GZIP;q=0.8, Br;q=0.9", "br"),
+    ("br;q=oops, gzip", "gzip"),                 # an unreadable q counts as 0
+    ("", None),
+    (None, None),
+])
+def test_negotiate_encoding_honours_q_values(with_brotli, header, expected):
+    assert response_formats.negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize("header, expected", [("br", None), ("br, gzip;q=0.1", "gzip"), ("*", "gzip")])
+def test_br_is_never_chosen_without_brotli(without_brotli, header, expected):
+    assert response_formats.negotiate_encoding(header) == expected
+
+
+# ---- Format selection ----
+@pytest.mark.parametrize("requested, accept, expected", [
+    (None, None, "rows"),
+    ("", "application/json", "rows"),
+    ("COLUMNAR", None, "columnar"),
+    ("rows", response_formats.ARROW_MEDIA_TYPE, "rows"),   # ?format= wins
+])
+def test_pick_format(requested, accept, expected):
+    assert response_formats.pick_format(requested, accept) == expected
+
+
+def test_pick_format_rejects_unknown_and_unavailable(monkeypatch):
+    with pytest.raises(HTTPException) as e:
+        response_formats.pick_format("csv")
+    assert e.value.status_code == 400
+    monkeypatch.setattr(response_formats, "pa", None)
+    with pytest.raises(HTTPException) as e:
+        response_formats.pick_format(None, f"{response_formats.ARROW_MEDIA_TYPE}, */*")
+    assert e.value.status_code == 406
+
+
+# ---- Columnar ----
+def test_columnar_drops_derived_fields():
+    table = response_formats.columnar(forecast_response())
+    assert table["format"] == "columnar" and table["horizon"] == 3 and table["batch_id"] == 7
+    assert set(table["columns"]) == set(response_formats.COLUMNS)
+    assert table["columns"]["Product_ID"] == ["P0", "P1"]
+    assert table["forecast"] == [[0, 1, 2], [1, 2, 3]]
+    assert "Forecasted_Revenue" not in table["columns"]
+
+
+def test_small_bodies_are_sent_uncompressed(without_brotli):
+    response = response_formats.render(forecast_response(), "columnar", "gzip")
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert json.loads(response.body)["columns"]["Product_ID"] == ["P0", "P1"]
+
+
+def test_large_bodies_are_compressed(without_brotli):
+    resp = forecast_response(products=200)
+    response = response_formats.render(resp, "columnar", "br;q=1, gzip;q=0.5")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.body)) == json.loads(response_formats.dumps(response_formats.columnar(resp)))
+
+
+def test_brotli_when_available(with_brotli):
+    response = response_formats.render(forecast_response(products=200), "columnar", "gzip, br")
+    assert response.headers["Content-Encoding"] == "br" and response.body.startswith(b"br:")
+
+
+# ---- Arrow ----
+def test_arrow_stream_round_trips():
+    pa = pytest.importorskip("pyarrow")
+    resp = forecast_response(products=4)
+    response = response_formats.render(resp, "arrow")
+    assert response.media_type == response_formats.ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.body).read_all()
+    assert table.column_names == response_formats.COLUMNS + ["forecast"]
+    assert table.column("forecast").to_pylist() == [r["Forecasted_Sales"] for r in resp["data"]]
+    assert table.schema.metadata[b"horizon"] == b"3"
+
+
+# ---- JSON without orjson ----
+def test_stdlib_fallback_serializes_numpy(monkeypatch):
+    import numpy as np
+    monkeypatch.setattr(response_formats, "orjson", None)
+    body = {"products": np.int64(2), "price": np.float32(2.5), "forecast": np.array([[1, 2], [3, 4]], dtype=np.int32),
+            "ok": np.bool_(True), "name": "दाल"}
+    assert json.loads(response_formats.dumps(body)) == {"products": 2, "price": 2.5, "forecast": [[1, 2], [3, 4]],
+                                                         "ok": True, "name": "दाल"}
+    with pytest.raises(TypeError, match="set is not JSON serializable"):
+        response_formats.dumps({"x": {1}})
+
+
+def test_fallback_matches_orjson():
+    pytest.importorskip("orjson")
+    import numpy as np
+    body = {"a": np.arange(3), "b": np.float64(1.25), "c": [np.int16(7)]}
+    assert json.loads(response_formats.dumps(body)) == json.loads(
+        json.dumps(body, default=response_formats._json_default))
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import scheduler
+
+START = datetime(2024, 1, 31, 23, 58, 30)   # a Wednesday
+
+
+def brute_force(expr, after):
+    """Walk minute by minute; vixie-cron day / weekday semantics spelled out."""
+    fields = scheduler.ALIASES.get(expr, expr).split()
+    minutes, hours, days, months, weekdays = (scheduler._parse_field(f, name, low, high)
+                                              for f, (name, low, high) in zip(fields, scheduler.FIELDS))
+    both_restricted = fields[2] != "*" and fields[4] != "*"
+
+    t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    while True:
+        day_ok = t.day in days
+        # isoweekday: Monday 1 ... Sunday 7, and cron also accepts 0 for Sunday
+        weekday_ok = t.isoweekday() in weekdays or (t.isoweekday() == 7 and 0 in weekdays)
+        date_ok = (day_ok or weekday_ok) if both_restricted else (day_ok and weekday_ok)
+        if date_ok and t.month in months and t.hour in hours and t.minute in minutes:
+            return t
+        t += timedelta(minutes=1)
+
+
+@pytest.mark.parametrize("expr", [
+    "* * * * *",
+    "*/15 9-17 * * 1-5",
+    "0 6 * * 1",
+    "30 2 1 * *",
+    "0 0 13 * 5",          # the 13th OR any Friday
+    "0 12 1,15 * 0",       # 1st, 15th OR Sunday
+    "0 0 * * 7",           # 7 is Sunday too
+    "5 4 29 2 *",          # leap day only
+    "@weekly",
+    "@monthly",
+])
+def test_next_run_matches_brute_force(expr):
+    after = START
+    for _ in range(4):
+        expected = brute_force(expr, after)
+        assert scheduler.next_run(expr, after) == expected
+        after = expected
+
+
+def test_day_and_weekday_are_ored_when_both_restricted():
+    # Friday 2024-02-02 comes before the 13th
+    assert scheduler.next_run("0 0 13 * 5", START) == datetime(2024, 2, 2)
+    # with either field left at *, the other one alone decides
+    assert scheduler.next_run("0 0 13 * *", START) == datetime(2024, 2, 13)
+    assert scheduler.next_run("0 0 * * 5", START) == datetime(2024, 2, 2)
+
+
+def test_next_run_is_strictly_after():
+    assert scheduler.next_run("0 6 * * *", datetime(2024, 3, 1, 6, 0)) == datetime(2024, 3, 2, 6, 0)
+
+
+@pytest.mark.parametrize("expr", ["* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "5-1 * * * *",
+                                  "*/0 * * * *", "a * * * *"])
+def test_parse_cron_rejects(expr):
+    with pytest.raises(ValueError, match="cron"):
+        scheduler.parse_cron(expr)
+
+
+def test_never_firing_expression():
+    with pytest.raises(ValueError, match="never fires"):
+        scheduler.next_run("0 0 31 2 *", START)
@@ -0,0 +1,35 @@
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from utils import sharded_inference as si
+
+
+@pytest.fixture
+def sharding(monkeypatch):
+    monkeypatch.setattr(si, "INFERENCE_WORKERS", 2)
+    monkeypatch.setattr(si, "SHARD_MIN_ROWS", 100)
+
+
+def test_should_shard_thresholds(sharding, monkeypatch):
+    assert si.should_shard(100)
+    assert not si.should_shard(99)
+    monkeypatch.setattr(si, "INFERENCE_WORKERS", 0)
+    assert not si.should_shard(10 ** 6)
+
+
+def test_pool_workers_never_shard(sharding, monkeypatch):
+    monkeypatch.setattr(si, "_pool_worker", True)
+    assert not si.should_shard(10 ** 6)
+
+
+def _child_should_shard(rows):
+    si.INFERENCE_WORKERS, si.SHARD_MIN_ROWS = 2, 100
+    return si.should_shard(rows)
+
+
+def test_spawned_serving_process_still_shards():
+    # uvicorn --workers / --reload serve from spawned children, which have a parent process
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        assert pool.submit(_child_should_shard, 1000).result(timeout=60)
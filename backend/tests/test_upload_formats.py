@@ -0,0 +1,117 @@
+import gzip
+
+import pandas as pd
+import pytest
+
+from utils import upload_formats
+
+CSV = b"Product_ID,Week,Sales_Quantity\nP1,2024-01-01,5\nP2,2024-01-01,7\n"
+
+
+def frame():
+    return pd.DataFrame({"Product_ID": ["P1", "P2"], "Week": ["2024-01-01", "2024-01-01"], "Sales_Quantity": [5, 7]})
+
+
+def check(df):
+    assert df["Product_ID"].tolist() == ["P1", "P2"]
+    assert df["Sales_Quantity"].tolist() == [5, 7]
+
+
+# ---- Sniffing ----
+def test_plain_csv():
+    assert upload_formats.detect(CSV) == "csv"
+    assert upload_formats.decompress(CSV, "csv") is CSV
+    check(upload_formats.read_frame(CSV))
+
+
+def test_gzip_csv():
+    raw = gzip.compress(CSV)
+    assert upload_formats.detect(raw) == "csv.gz"
+    assert upload_formats.decompress(raw, "csv.gz") == CSV
+    check(upload_formats.read_frame(raw))
+
+
+def test_zstd_csv():
+    zstandard = pytest.importorskip("zstandard")
+    raw = zstandard.ZstdCompressor().compress(CSV)
+    assert upload_formats.detect(raw) == "csv.zst"
+    check(upload_formats.read_frame(raw))
+
+
+def arrow_bytes(kind):
+    pa = pytest.importorskip("pyarrow")
+    table = pa.Table.from_pandas(frame(), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink)
+    elif kind == "arrow":
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+@pytest.mark.parametrize("kind", ["parquet", "arrow", "arrow_stream"])
+def test_columnar_uploads(kind):
+    raw = arrow_bytes(kind)
+    assert upload_formats.detect(raw) == kind
+    check(upload_formats.read_frame(raw))
+
+
+def test_dictionary_columns_arrive_as_plain_values():
+    pa = pytest.importorskip("pyarrow")
+    table = pa.Table.from_pandas(frame(), preserve_index=False)
+    table = table.set_column(0, "Product_ID", table.column("Product_ID").dictionary_encode())
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    df = upload_formats.read_frame(sink.getvalue().to_pybytes())
+    assert not isinstance(df["Product_ID"].dtype, pd.CategoricalDtype)
+    check(df)
+
+
+# ---- Missing optional packages ----
+@pytest.mark.parametrize("magic, kind", [(b"PAR1rest", "parquet"), (b"ARROW1\x00\x00", "arrow"),
+                                         (b"\xff\xff\xff\xff\x00", "arrow_stream")])
+def test_columnar_upload_without_pyarrow(monkeypatch, magic, kind):
+    monkeypatch.setattr(upload_formats, "pa", None)
+    with pytest.raises(upload_formats.UnsupportedUpload, match=f"{kind} uploads need pyarrow"):
+        upload_formats.read_frame(magic)
+
+
+def test_zstd_upload_without_zstandard(monkeypatch):
+    monkeypatch.setattr(upload_formats, "zstandard", None)
+    with pytest.raises(upload_formats.UnsupportedUpload, match="need the zstandard package"):
+        upload_formats.read_frame(b"\x28\xb5\x2f\xfd" + b"\x00" * 8)
+
+
+# ---- Decompression cap ----
+def test_gzip_bomb_is_refused(monkeypatch):
+    monkeypatch.setattr(upload_formats, "MAX_DECOMPRESSED_BYTES", 1024 * 1024)
+    raw = gzip.compress(CSV + b"P1,2024-01-01,5\n" * 100_000)   # ~1.6 MB of CSV, a few KB on the wire
+    assert len(raw) < 64 * 1024
+    with pytest.raises(ValueError) as e:
+        upload_formats.decompress(raw, "csv.gz")
+    assert str(e.value) == "gzip upload expands beyond 1 MB"
+    assert not isinstance(e.value, upload_formats.UnsupportedUpload)
+
+
+def test_exactly_at_the_cap_is_accepted(monkeypatch):
+    monkeypatch.setattr(upload_formats, "MAX_DECOMPRESSED_BYTES", len(CSV))
+    assert upload_formats.decompress(gzip.compress(CSV), "csv.gz") == CSV
+
+
+def test_zstd_bomb_is_refused(monkeypatch):
+    zstandard = pytest.importorskip("zstandard")
+    monkeypatch.setattr(upload_formats, "MAX_DECOMPRESSED_BYTES", 1024 * 1024)
+    raw = zstandard.ZstdCompressor().compress(b"0" * (2 * 1024 * 1024))
+    with pytest.raises(ValueError, match="zstd upload expands beyond 1 MB"):
+        upload_formats.decompress(raw, "csv.zst")
+
+
+def test_corrupt_gzip_is_an_error_not_a_frame():
+    with pytest.raises((OSError, EOFError)):
+        upload_formats.read_frame(gzip.compress(CSV)[:-8] + b"junkjunk")
@@ -0,0 +1,105 @@
+import pandas as pd
+import pytest
+
+from utils import upload_validator as uv
+
+
+def weekly(start, weeks, fmt):
+    return [d.strftime(fmt) for d in pd.date_range(start, periods=weeks, freq="7D")]
+
+
+def frame(weeks, products=("P1",), sales=None, **extra):
+    rows = [{"Product_ID": p, "Product_Name": p, "Category": "Grains", "Week": w}
+            for p in products for w in weeks]
+    df = pd.DataFrame(rows)
+    df["Sales_Quantity"] = sales if sales is not None else 10
+    for col, values in extra.items():
+        df[col] = values
+    return df
+
+
+@pytest.mark.parametrize("fmt", ["%Y-%m-%d", "%d-%m-%Y", "%m/%d/%Y", "%d.%m.%Y", "%d %b %Y"])
+def test_infer_date_format(fmt):
+    assert uv.infer_date_format(weekly("2023-01-02", 20, fmt)) == fmt
+
+
+def test_day_first_vs_month_first_by_weekly_spacing():
+    # every day <= 12, so both formats parse every value; only one spaces them 7 days apart
+    month_first = ["01/02/2023", "01/09/2023", "02/06/2023", "02/13/2023"]
+    assert uv.infer_date_format(month_first) == "%m/%d/%Y"
+    assert uv.infer_date_format(weekly("2023-01-02", 10, "%m/%d/%Y")) == "%m/%d/%Y"
+    assert uv.infer_date_format(weekly("2023-01-02", 10, "%d/%m/%Y")) == "%d/%m/%Y"
+
+
+def test_ambiguous_dates_default_to_day_first():
+    assert uv.infer_date_format(["03/04/2023"]) == "%d/%m/%Y"
+
+
+def test_parse_weeks_handles_mixed_formats_and_garbage():
+    column = pd.Series(weekly("2023-01-02", 6, "%Y-%m-%d") + weekly("2023-03-06", 6, "%d-%m-%Y") + ["soon", None])
+    weeks, formats = uv.parse_weeks(column)
+    assert formats == ["%Y-%m-%d", "%d-%m-%Y"]
+    assert weeks.iloc[6] == pd.Timestamp("2023-03-06")
+    assert weeks.iloc[-2:].isna().all()
+    assert weeks.index.equals(column.index)
+
+
+def test_parse_weeks_passes_datetimes_through():
+    column = pd.Series(pd.date_range("2023-01-02", periods=3, freq="7D"))
+    weeks, formats = uv.parse_weeks(column)
+    assert formats == [] and weeks is column
+
+
+def test_row_level_errors_are_reported_and_dropped():
+    df = frame(weekly("2023-01-02", 40, "%Y-%m-%d"), products=("P1", "P2", "P3"))
+    df["Sales_Quantity"] = df["Sales_Quantity"].astype(object)
+    df.loc[4, "Week"] = "not a date"
+    df.loc[7, "Sales_Quantity"] = "ten"
+    df.loc[9, "Sales_Quantity"] = -3
+    df.loc[11, "Product_ID"] = " "
+    clean, report = uv.validate(df)
+
+    assert report["rows"] == 120 and report["valid_rows"] == 116 == len(clean)
+    assert report["date_formats"] == ["%Y-%m-%d"]
+    # 1-based data row numbers and the offending values
+    assert report["errors"]["invalid_week"] == {"count": 1, "rows": [5], "examples": ["not a date"]}
+    assert report["errors"]["Sales_Quantity_not_a_number"]["rows"] == [8]
+    assert report["errors"]["Sales_Quantity_negative"]["rows"] == [10]
+    assert report["errors"]["missing_product_id"]["rows"] == [12]
+    assert pd.api.types.is_datetime64_any_dtype(clean["Week"])
+    assert pd.api.types.is_numeric_dtype(clean["Sales_Quantity"])
+
+
+def test_duplicates_keep_the_last_row_and_gaps_are_warned():
+    weeks = weekly("2023-01-02", 10, "%Y-%m-%d")
+    df = frame(weeks[:4] + weeks[6:], products=("P1",), sales=list(range(8)))
+    df = pd.concat([df, frame([weeks[0]], sales=[99])], ignore_index=True)
+    clean, report = uv.validate(df)
+
+    assert report["warnings"]["duplicate_product_week"] == {"count": 1, "rows": [1]}
+    assert clean.loc[clean["Week"] == pd.Timestamp(weeks[0]), "Sales_Quantity"].tolist() == [99]
+    assert report["warnings"]["gaps"] == {"products": 1, "missing_weeks": 2, "examples": ["P1"]}
+    assert report["valid_rows"] == 8
+
+
+def test_too_many_errors_rejects_the_upload():
+    df = frame(weekly("2023-01-02", 10, "%Y-%m-%d"), sales=[5, -1, 5, 5, 5, 5, 5, 5, 5, 5])
+    with pytest.raises(uv.UploadRejected) as e:
+        uv.validate(df, max_error_share=0.05)
+    assert e.value.report["errors"]["Sales_Quantity_negative"]["count"] == 1
+    assert uv.validate(df, max_error_share=0.2)[1]["valid_rows"] == 9
+
+
+def test_empty_upload_is_rejected():
+    with pytest.raises(uv.UploadRejected):
+        uv.validate(pd.DataFrame(columns=["Product_ID", "Product_Name", "Category", "Week", "Sales_Quantity"]))
+
+
+def test_revenue_is_coerced_but_never_drops_a_row():
+    df = frame(weekly("2023-01-02", 4, "%Y-%m-%d"), sales=[5, 6, 7, 8])
+    df["Revenue"] = ["50", "n/a", "-12.5", None]
+    clean, report = uv.validate(df)
+    assert report["valid_rows"] == 4 and report["errors"] == {}
+    assert report["warnings"]["Revenue_not_a_number"] == {"count": 1, "rows": [2], "examples": ["n/a"]}
+    assert clean["Revenue"].tolist()[::2] == [50.0, -12.5]
+    assert clean["Revenue"].isna().tolist() == [False, True, False, True]
@@ -0,0 +1,95 @@
+"""
+Latency and accuracy of the direct multi-horizon model vs the recursive loop.
+
+    python -m benchmarks.bench_direct_vs_recursive --horizon 12 --out benchmarks/results/direct_vs_recursive.json
+
+Both paths forecast the same rolling origins (context = model window) from
+each dataset in one batch; accuracy is WAPE / MAPE / bias over all points.
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from lstm.train import load_dataset
+from utils.backtest_engine import history_matrix, rolling_origins, score
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATASETS = [
+    os.path.join(ROOT_DIR, "data", "indian_grocery_store_weekly_sales.csv"),
+    os.path.join(ROOT_DIR, "data", "test2_data.csv"),
+    os.path.join(ROOT_DIR, "data", "test_data.csv"),
+]
+
+
+def _frame(path):
+    df = load_dataset(path)
+    return df.rename(columns={'product_id': 'Product_ID', 'category': 'Category',
+                              'week': 'Week', 'sales': 'Sales_Quantity'})
+
+
+def _timed(fn, repeats):
+    best, out = None, None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return out, best
+
+
+def bench_dataset(path, horizon, repeats):
+    from utils import forecast_engine as fe
+
+    products, _, values, _ = history_matrix(_frame(path))
+    window = fe.active_bundle().window
+    product_idx, inputs, actuals = rolling_origins(values, window, horizon)
+    result = {"dataset": os.path.basename(path), "horizon": horizon, "windows": int(len(inputs))}
+    if not len(inputs):
+        result["skipped"] = f"no product has {window + horizon} weeks of history"
+        return result
+
+    paths = {"recursive": False}
+    if fe.direct_available(horizon):
+        paths["direct"] = True
+
+    names = products[product_idx]
+    for name, direct in paths.items():
+        forecasts, seconds = _timed(lambda: fe.predict_windows(names, inputs, horizon, direct=direct), repeats)
+        mape, wape, bias, points = score(forecasts, actuals, np.zeros(len(inputs), dtype=np.int64), 1)
+        result[name] = {
+            "batch_seconds": round(seconds, 4),
+            "ms_per_window": round(1000 * seconds / len(inputs), 4),
+            "mape": round(float(mape[0]), 3),
+            "wape": round(float(wape[0]), 3),
+            "bias": round(float(bias[0]), 3),
+        }
+    if "direct" in result:
+        result["speedup"] = round(result["recursive"]["batch_seconds"] / result["direct"]["batch_seconds"], 2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--horizon", type=int, default=12)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--data", nargs="*", default=DEFAULT_DATASETS)
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    from utils import forecast_engine as fe
+    if not fe.direct_available(args.horizon):
+        print(f"No direct model for horizon {args.horizon}; timing the recursive path only.")
+
+    results = [bench_dataset(p, args.horizon, args.repeats) for p in args.data]
+    print(json.dumps(results, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
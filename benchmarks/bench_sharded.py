@@ -0,0 +1,107 @@
+"""
+Scaling of sharded inference (utils/sharded_inference.py) with worker count.
+
+    python -m benchmarks.bench_sharded --products 100000 --horizon 4
+    python -m benchmarks.bench_sharded --workers 1 2 4 8 --out benchmarks/results/sharded.json
+    python -m benchmarks.bench_sharded --synthetic-model     # no TensorFlow needed
+
+A synthetic 100k-SKU upload (26 weeks each) is forecast once inline and
+then with each pool size; every sharded result must equal the inline one.
+Pools are warmed (model loaded in every worker) before timing. With
+--synthetic-model the run serves a random-weight NumPy model with the
+production layout instead of the active version.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_histories(products, weeks, seed=0):
+    rng = np.random.default_rng(seed)
+    level = rng.gamma(2.0, 20.0, size=(products, 1))
+    values = rng.poisson(level * (1 + 0.2 * np.sin(np.arange(weeks) / 4.0))).astype(np.float64)
+    return np.array([f"SKU{i:06d}" for i in range(products)]), values
+
+
+def _child(args):
+    from utils import forecast_engine as fe
+    from utils import sharded_inference as si
+
+    bundle = fe.active_bundle()
+    products, windows = synthetic_histories(args.products, args.weeks)
+    si.SHARD_MIN_ROWS = 0
+
+    def timed(workers):
+        si.shutdown()
+        si.INFERENCE_WORKERS = workers
+        if workers:
+            si.warm_pool()
+        best, out = None, None
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            out = fe.predict_windows(products, windows, args.horizon, direct=False, bundle=bundle)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return out, best
+
+    reference, inline = timed(0)
+    runs = [{"workers": 0, "seconds": round(inline, 3)}]
+    for workers in args.workers:
+        out, seconds = timed(workers)
+        runs.append({"workers": workers, "seconds": round(seconds, 3),
+                     "speedup": round(inline / seconds, 2),
+                     "efficiency": round(inline / seconds / workers, 2),
+                     "identical": bool(np.array_equal(out, reference))})
+    si.shutdown()
+    print(json.dumps({"products": args.products, "horizon": args.horizon, "model": bundle.version,
+                      "variant": bundle.variant, "cpus": os.cpu_count(), "runs": runs}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--weeks", type=int, default=26)
+    parser.add_argument("--horizon", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="*",
+                        default=sorted({w for w in (1, 2, 4, 8) if w <= (os.cpu_count() or 1)}))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--synthetic-model", action="store_true")
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args)
+        return
+
+    # the measurement runs in a fresh interpreter so registry env vars apply
+    # before utils.forecast_engine loads (pool workers inherit them)
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic_model:
+            from benchmarks.synthetic import synthetic_registry
+            env.update(synthetic_registry(tmp))
+        cmd = [sys.executable, "-m", "benchmarks.bench_sharded", "--child",
+               "--products", str(args.products), "--weeks", str(args.weeks), "--horizon", str(args.horizon),
+               "--repeats", str(args.repeats), "--workers", *map(str, args.workers)]
+        proc = subprocess.run(cmd, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    print(json.dumps(result, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
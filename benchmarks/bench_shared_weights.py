@@ -0,0 +1,108 @@
+"""
+Memory of N workers holding the NumPy model: private copies vs one mapped file.
+
+    python -m benchmarks.bench_shared_weights --workers 4
+    python -m benchmarks.bench_shared_weights --weights lstm/variants/model.numpy_fp32.npz
+    python -m benchmarks.bench_shared_weights --units 1024 --out benchmarks/results/shared_weights.json
+
+Each worker loads the weights (np.load of the .npz = private, or the .weights
+twin mapped read-only = shared), runs one batch and waits; the parent then
+reads every worker's PSS from /proc/<pid>/smaps_rollup. PSS splits shared
+pages between the processes mapping them, so its sum is the real footprint.
+Without --weights a synthetic model with the production layout (LSTM ->
+Dense(32, relu) -> Dense(1)) and --units LSTM units is written to a temp dir.
+Linux only.
+"""
+import os
+import json
+import shutil
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_weights
+from utils.model_backends import NumpyLSTM, shared_weights_path
+from utils.shared_weights import pack_npz
+
+
+def smaps_rollup(pid):
+    """Rss / Pss / Private_* / Shared_* of a process in MiB."""
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                out[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return out
+
+
+def _worker(path, mode, ready, done):
+    model = NumpyLSTM.load_shared(shared_weights_path(path)) if mode == "shared" else NumpyLSTM.load(path)
+    model.predict(np.zeros((64,) + model.input_shape[1:], dtype=np.float32))
+    ready.set()
+    done.wait()
+
+
+def measure(path, mode, workers):
+    ctx = mp.get_context("spawn")
+    done = ctx.Event()
+    procs, events = [], []
+    for _ in range(workers):
+        ready = ctx.Event()
+        p = ctx.Process(target=_worker, args=(path, mode, ready, done))
+        p.start()
+        procs.append(p)
+        events.append(ready)
+    for p, e in zip(procs, events):
+        while not e.wait(0.5):
+            if not p.is_alive():
+                done.set()
+                raise RuntimeError(f"worker exited with code {p.exitcode} while loading {path}")
+    time.sleep(0.2)
+    stats = [smaps_rollup(p.pid) for p in procs]
+    done.set()
+    for p in procs:
+        p.join()
+    return {
+        "mode": mode,
+        "workers": workers,
+        "pss_total_mib": round(sum(s.get("Pss", 0) for s in stats), 1),
+        "rss_total_mib": round(sum(s.get("Rss", 0) for s in stats), 1),
+        "private_total_mib": round(sum(s.get("Private_Clean", 0) + s.get("Private_Dirty", 0) for s in stats), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--weights", default=None, help="a numpy_*.npz export (default: synthetic)")
+    parser.add_argument("--units", type=int, default=64, help="LSTM units of the synthetic model")
+    parser.add_argument("--precision", default="fp32", choices=["fp32", "fp16", "int8"])
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.weights or synthetic_weights(os.path.join(tmp, f"model.numpy_{args.precision}.npz"),
+                                                 args.units, args.precision)
+        if not os.path.exists(shared_weights_path(path)):
+            if args.weights:  # export without a .weights twin: pack a temp copy
+                path = shutil.copy(path, tmp)
+            pack_npz(path)
+
+        size_mib = os.path.getsize(shared_weights_path(path)) / 2 ** 20
+        results = {"weights": os.path.basename(path), "weights_mib": round(size_mib, 2),
+                   "runs": [measure(path, "private", args.workers), measure(path, "shared", args.workers)]}
+    private, shared = results["runs"]
+    results["pss_saved_mib"] = round(private["pss_total_mib"] - shared["pss_total_mib"], 1)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Accuracy, memory and latency of the model variants (lstm/export_variants.py).
+
+    python -m benchmarks.bench_variants --out benchmarks/results/variants.json
+    python -m benchmarks.bench_variants --variants keras numpy_int8
+
+Every variant runs in a fresh interpreter (NIYOJAN_MODEL_VARIANT set before
+the forecast engine loads), so RSS reflects that variant alone: the process
+baseline after numpy/pandas, after loading the bundle and after serving
+the largest batch. Accuracy is 1-step WAPE on every rolling origin of each
+dataset; deltas are against the float32 keras model.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATASETS = [
+    os.path.join(ROOT_DIR, "data", "test_data.csv"),
+    os.path.join(ROOT_DIR, "data", "test2_data.csv"),
+]
+DEFAULT_VARIANTS = ["keras", "numpy_fp32", "numpy_fp16", "numpy_int8", "tflite_fp16", "tflite_int8"]
+BATCH_SIZES = [1, 64, 1024, 8192]
+
+
+def rss_mib():
+    """Current resident set size (Linux /proc), falling back to the peak."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(variant, datasets, repeats, preds_path):
+    """Runs inside the per-variant interpreter; prints one JSON result."""
+    import pandas  # noqa: F401 -- part of the baseline, not the model
+    baseline = rss_mib()
+    os.environ["NIYOJAN_MODEL_VARIANT"] = variant
+
+    started = time.perf_counter()
+    from utils import forecast_engine as fe
+    bundle = fe.active_bundle()
+    result = {"variant": variant, "loaded": bundle.variant,
+              "load_seconds": round(time.perf_counter() - started, 3),
+              "rss_baseline_mib": round(baseline, 1), "rss_loaded_mib": round(rss_mib(), 1)}
+    if bundle.variant != variant:
+        result["skipped"] = f"{variant} not exported for model {bundle.version}"
+        print(json.dumps(result))
+        return
+
+    from lstm.train import load_dataset
+    from utils.backtest_engine import history_matrix, rolling_origins, score
+
+    shape = tuple(bundle.model.input_shape[1:])
+    latency = {}
+    for n in BATCH_SIZES:
+        x = np.random.default_rng(0).random((n,) + shape, dtype=np.float32)
+        bundle.model.predict(x, verbose=0)  # warm
+        timings = []
+        for _ in range(repeats):
+            t = time.perf_counter()
+            bundle.model.predict(x, verbose=0)
+            timings.append(time.perf_counter() - t)
+        latency[str(n)] = round(1000 * min(timings), 3)
+    result["latency_ms"] = latency
+    result["rss_serving_mib"] = round(rss_mib(), 1)
+
+    preds, accuracy = {}, {}
+    for path in datasets:
+        df = load_dataset(path).rename(columns={'product_id': 'Product_ID', 'category': 'Category',
+                                                'week': 'Week', 'sales': 'Sales_Quantity'})
+        products, _, values, _ = history_matrix(df)
+        product_idx, inputs, actuals = rolling_origins(values, bundle.window, 1)
+        name = os.path.basename(path)
+        if not len(inputs):
+            accuracy[name] = None
+            continue
+        forecasts = fe.predict_windows(products[product_idx], inputs, 1, direct=False, bundle=bundle)
+        _, wape, _, _ = score(forecasts, actuals, np.zeros(len(inputs), dtype=np.int64), 1)
+        accuracy[name] = {"windows": int(len(inputs)), "wape": round(float(wape[0]), 4)}
+        preds[name] = forecasts[:, 0]
+    result["accuracy"] = accuracy
+    np.savez(preds_path, **preds)
+    print(json.dumps(result))
+
+
+def run_variant(variant, datasets, repeats):
+    with tempfile.TemporaryDirectory() as tmp:
+        preds_path = os.path.join(tmp, "preds.npz")
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_variants", "--child", variant,
+             "--repeats", str(repeats), "--preds", preds_path, "--data", *datasets],
+            cwd=ROOT_DIR, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {"variant": variant, "error": proc.stderr.strip().splitlines()[-1:]}, {}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        preds = {}
+        if os.path.exists(preds_path):
+            with np.load(preds_path) as npz:
+                preds = {k: npz[k] for k in npz.files}
+        return result, preds
+
+
+def compare(results, preds):
+    """Prediction and WAPE deltas of each variant against keras float32."""
+    reference = preds.get("keras")
+    ref_result = next((r for r in results if r["variant"] == "keras" and "accuracy" in r), None)
+    if not reference or ref_result is None:
+        return
+    for r in results:
+        if r["variant"] == "keras" or "accuracy" not in r:
+            continue
+        r["delta_vs_keras"] = {}
+        for name, p in preds[r["variant"]].items():
+            ref = reference[name]
+            r["delta_vs_keras"][name] = {
+                "max_abs_diff": round(float(np.abs(p - ref).max()), 4),
+                "mean_abs_diff": round(float(np.abs(p - ref).mean()), 4),
+                "wape_delta_pp": round(r["accuracy"][name]["wape"] - ref_result["accuracy"][name]["wape"], 4),
+            }
+        r["rss_saved_mib"] = round(ref_result["rss_serving_mib"] - r["rss_serving_mib"], 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--variants", nargs="*", default=DEFAULT_VARIANTS)
+    parser.add_argument("--data", nargs="*", default=DEFAULT_DATASETS)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--preds", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child, args.data, args.repeats, args.preds)
+        return
+
+    results, preds = [], {}
+    for variant in args.variants:
+        result, preds[variant] = run_variant(variant, args.data, args.repeats)
+        results.append(result)
+    compare(results, preds)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
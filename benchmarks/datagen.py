@@ -0,0 +1,151 @@
+"""
+Synthetic grocery sales at any scale, in the schema of
+data/indian_grocery_store_weekly_sales.csv.
+
+    python -m benchmarks.datagen --products 10000 --weeks 52 --out /tmp/sales_10k.csv
+    python -m benchmarks.datagen --products 100000 --out /tmp/sales_100k.csv.gz
+    python -m benchmarks.datagen --products 100000 --out /tmp/sales_100k.parquet   # needs pyarrow
+
+Each synthetic SKU is a variant of one of the seed products: it inherits the
+category, a jittered price and demand level, and gets its own yearly
+seasonality, a festive (Oct-Nov) lift, a slow trend and Poisson noise. A
+share of SKUs is intermittent (mostly zero weeks) and a share was launched
+recently (short history), so forecasting routes every method the way a real
+catalog does. Output is deterministic for a given seed.
+"""
+import os
+import io
+import argparse
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_CSV = os.path.join(ROOT_DIR, "data", "indian_grocery_store_weekly_sales.csv")
+COLUMNS = ["Product_ID", "Product_Name", "Category", "Week", "Sales_Quantity", "Price_per_Unit", "Revenue"]
+
+INTERMITTENT_SHARE = 0.08
+NEW_LAUNCH_SHARE = 0.05
+PACK_SIZES = ["", "Small", "Regular", "Large", "Family Pack", "Value Pack", "Premium"]
+
+
+def seed_products(path=SEED_CSV):
+    """Per-product template (name, category, price, mean and std of weekly sales)."""
+    df = pd.read_csv(path)
+    stats = df.groupby(["Product_ID", "Product_Name", "Category"], sort=True).agg(
+        price=("Price_per_Unit", "mean"), level=("Sales_Quantity", "mean"), std=("Sales_Quantity", "std"))
+    return stats.reset_index()
+
+
+def generate_sales(products, weeks=52, seed=0, start="2023-01-02", seeds=None, date_format="%Y-%m-%d"):
+    """
+    Long-format weekly sales for `products` SKUs over `weeks` weeks
+    (rows of new launches start later, so the frame is slightly shorter
+    than products * weeks). Weeks are written with `date_format`; uploads
+    in the wild use day-first dates (see data/test2_data.csv).
+    """
+    rng = np.random.default_rng(seed)
+    templates = seeds if seeds is not None else seed_products()
+    pick = rng.integers(0, len(templates), products)
+    t = templates.iloc[pick].reset_index(drop=True)
+
+    price = np.round(t["price"].to_numpy() * rng.uniform(0.7, 1.4, products)).clip(min=1)
+    level = t["level"].to_numpy() * rng.lognormal(-0.5, 0.8, products)
+    noise_cv = (t["std"] / t["level"]).to_numpy()
+
+    dates = pd.date_range(start, periods=weeks, freq="W-MON")
+    week_of_year = dates.isocalendar().week.to_numpy(dtype=np.float64)
+    phase = rng.uniform(0, 2 * np.pi, (products, 1))
+    amplitude = rng.uniform(0.0, 0.25, (products, 1))
+    seasonal = 1 + amplitude * np.sin(2 * np.pi * week_of_year / 52.0 + phase)
+    festive = 1 + rng.uniform(0.0, 0.2, (products, 1)) * np.isin(dates.month, (10, 11))
+    trend = 1 + rng.normal(0, 0.002, (products, 1)) * np.arange(weeks)
+    mean = level[:, None] * seasonal * festive * trend.clip(min=0.2)
+    mean *= rng.lognormal(0, noise_cv[:, None] * 0.5, (products, weeks))
+    sales = rng.poisson(mean.clip(min=0))
+
+    intermittent = rng.random(products) < INTERMITTENT_SHARE
+    sales[intermittent] = sales[intermittent] * (rng.random((intermittent.sum(), weeks)) < 0.25) // 20
+
+    first_week = np.zeros(products, dtype=np.int64)
+    launched = rng.random(products) < NEW_LAUNCH_SHARE
+    first_week[launched] = rng.integers(max(weeks - 10, 1), weeks, launched.sum())
+    alive = np.arange(weeks)[None, :] >= first_week[:, None]
+
+    row_product, row_week = np.nonzero(alive)
+    ids = np.char.add("P", np.char.zfill(np.arange(1, products + 1).astype(str), 6))
+    size = np.array(PACK_SIZES)[rng.integers(0, len(PACK_SIZES), products)]
+    names = np.char.strip(np.char.add(np.char.add(t["Product_Name"].to_numpy().astype(str), " "), size))
+    qty = sales[row_product, row_week]
+    return pd.DataFrame({
+        "Product_ID": ids[row_product],
+        "Product_Name": names[row_product],
+        "Category": t["Category"].to_numpy()[row_product],
+        "Week": dates.strftime(date_format).to_numpy()[row_week],
+        "Sales_Quantity": qty,
+        "Price_per_Unit": price[row_product].astype(np.int64),
+        "Revenue": qty * price[row_product].astype(np.int64),
+    }, columns=COLUMNS)
+
+
+def sales_csv(products, weeks=52, seed=0, **kwargs):
+    """generate_sales() serialised the way users upload it (CSV bytes)."""
+    buf = io.StringIO()
+    generate_sales(products, weeks, seed, **kwargs).to_csv(buf, index=False)
+    return buf.getvalue().encode("utf-8")
+
+
+UPLOAD_FORMATS = ["csv", "csv.gz", "csv.zst", "parquet", "arrow"]
+
+
+def encode_upload(df, fmt):
+    """generate_sales() output as upload bytes in one of UPLOAD_FORMATS.
+
+    Columnar formats store Week as a date column, the way an export from a
+    warehouse would; CSV keeps the generated strings.
+    """
+    if fmt.startswith("csv"):
+        raw = df.to_csv(index=False).encode("utf-8")
+        if fmt == "csv.gz":
+            import gzip
+            raw = gzip.compress(raw, compresslevel=6)
+        elif fmt == "csv.zst":
+            import zstandard
+            raw = zstandard.ZstdCompressor(level=3).compress(raw)
+        return raw
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df.assign(Week=pd.to_datetime(df["Week"], format="mixed", dayfirst=True)),
+                                 preserve_index=False)
+    sink = pa.BufferOutputStream()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink, compression="zstd")
+    else:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default="2023-01-02", help="first week (a Monday)")
+    parser.add_argument("--date-format", default="%Y-%m-%d", help="e.g. %%d-%%m-%%Y for day-first uploads")
+    parser.add_argument("--out", required=True,
+                        help="CSV path (.gz / .bz2 / .zip compress), or .parquet / .arrow / .feather")
+    args = parser.parse_args(argv)
+
+    df = generate_sales(args.products, args.weeks, args.seed, args.start, date_format=args.date_format)
+    if args.out.endswith((".parquet", ".arrow", ".feather")):
+        with open(args.out, "wb") as f:
+            f.write(encode_upload(df, "parquet" if args.out.endswith(".parquet") else "arrow"))
+    else:
+        df.to_csv(args.out, index=False)
+    print(f"{len(df)} rows, {df['Product_ID'].nunique()} products, "
+          f"{df['Category'].nunique()} categories -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
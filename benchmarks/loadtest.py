@@ -0,0 +1,325 @@
+"""
+Offline load test of the FastAPI app with Gemini and SMTP stand-ins.
+
+    python -m benchmarks.loadtest --users 20 --duration 60                       # in-process (ASGI)
+    python -m benchmarks.loadtest --server uvicorn --workers 4 --users 50 --out benchmarks/results/load.json
+    python -m benchmarks.loadtest --mix alerts=50,insight=20,forecast_small=5 --llm-ms 1200
+    python -m benchmarks.loadtest --url http://staging:8000 --login admin@niyojan.com:secret
+
+Closed-loop virtual users log in, then pick weighted actions (alerts
+polling, forecast uploads of several catalog sizes, report downloads,
+insights, report e-mails, re-logins) with exponential think time. Every
+request is timed client side and reported per action: throughput,
+p50/p95/p99 latency and error rate.
+
+In-process and uvicorn servers run against a throwaway database and reports
+directory with benchmarks/standins.py installed, so no e-mail or Gemini call
+leaves the machine. --url targets a server you started yourself (stand-ins
+are then up to that server). In-process mode shares one interpreter (and the
+GIL) between client and server; use --server uvicorn for capacity numbers.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOADTEST_USER = ("loadtest@niyojan.local", "loadtest")
+
+DEFAULT_UPLOAD_SIZES = {"forecast_small": 100, "forecast_medium": 1_000, "forecast_large": 10_000}
+DEFAULT_MIX = {
+    "alerts": 30,
+    "forecasts": 15,
+    "insight": 12,
+    "forecast_small": 10,
+    "forecast_medium": 3,
+    "forecast_large": 1,
+    "report_download": 4,
+    "login": 4,
+    "send_report": 1,
+}
+PERCENTILES = (50, 95, 99)
+
+
+# -------------------------
+# Server side
+# -------------------------
+def create_app():
+    """
+    uvicorn factory: stand-ins, throwaway DB and reports dir come from the
+    NIYOJAN_LOADTEST_* env the harness sets. Each worker calls it once.
+    """
+    from benchmarks import standins
+    standins.install(float(os.getenv("NIYOJAN_LOADTEST_LLM_MS", "800")),
+                     float(os.getenv("NIYOJAN_LOADTEST_SMTP_MS", "150")),
+                     float(os.getenv("NIYOJAN_LOADTEST_LLM_FAIL", "0")),
+                     float(os.getenv("NIYOJAN_LOADTEST_SMTP_FAIL", "0")))
+
+    from database import db_manager
+    workdir = os.environ["NIYOJAN_LOADTEST_DIR"]
+    db_manager.DB_PATH = os.path.join(workdir, "loadtest.db")  # before main runs init_db()
+
+    from backend.app import main as app_main
+    app_main.REPORTS_DIR = os.path.join(workdir, "reports")
+    os.makedirs(app_main.REPORTS_DIR, exist_ok=True)
+    if not db_manager.find_user_by_email(LOADTEST_USER[0]):
+        try:
+            db_manager.create_user(LOADTEST_USER[0], "Load Test", LOADTEST_USER[1])
+        except Exception:
+            pass  # another worker created it first
+    return app_main.app
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_uvicorn(env, workers):
+    port = _free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "benchmarks.loadtest:create_app", "--factory",
+           "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=ROOT_DIR, env=env)
+    url = f"http://127.0.0.1:{port}"
+    import httpx
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"uvicorn exited with {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    sys.exit("uvicorn did not become healthy within 120s")
+
+
+# -------------------------
+# Client side
+# -------------------------
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # action -> list of (latency_s, ok)
+        self.errors = {}   # action -> {status: count}
+        self.recording = False
+
+    def add(self, action, seconds, status):
+        if not self.recording:
+            return
+        ok = isinstance(status, int) and status < 400
+        self.samples.setdefault(action, []).append((seconds, ok))
+        if not ok:
+            bucket = self.errors.setdefault(action, {})
+            bucket[str(status)] = bucket.get(str(status), 0) + 1
+
+    def summary(self, elapsed):
+        def stats(rows):
+            latencies = np.array([r[0] for r in rows]) * 1000.0
+            errors = sum(1 for r in rows if not r[1])
+            out = {"requests": len(rows), "rps": round(len(rows) / elapsed, 2),
+                   "errors": errors, "error_rate": round(errors / len(rows), 4) if rows else 0.0}
+            for p in PERCENTILES:
+                out[f"p{p}_ms"] = round(float(np.percentile(latencies, p)), 1) if rows else None
+            out["max_ms"] = round(float(latencies.max()), 1) if rows else None
+            return out
+
+        actions = {name: {**stats(rows), "statuses": self.errors.get(name, {})}
+                   for name, rows in sorted(self.samples.items())}
+        everything = [r for rows in self.samples.values() for r in rows]
+        return {"total": stats(everything), "actions": actions}
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, payloads, mix, think_ms, credentials, rng):
+        self.client = client
+        self.recorder = recorder
+        self.payloads = payloads
+        self.actions, self.weights = zip(*mix.items())
+        self.think_ms = think_ms
+        self.credentials = credentials
+        self.rng = rng
+        self.headers = {}
+
+    async def _request(self, action, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            resp = await self.client.request(method, path, headers=self.headers, **kwargs)
+            status = resp.status_code
+        except Exception as e:
+            resp, status = None, f"exc:{type(e).__name__}"
+        self.recorder.add(action, time.perf_counter() - started, status)
+        return resp
+
+    async def login(self):
+        email, password = self.credentials
+        resp = await self._request("login", "POST", "/auth/login",
+                                   data={"username": email, "password": password})
+        if resp is not None and resp.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    async def act(self, action):
+        if action == "login":
+            await self.login()
+        elif action in self.payloads:
+            await self._request(action, "POST", "/forecast", data={"horizon": "4"},
+                                files={"file": ("sales.csv", self.payloads[action], "text/csv")})
+        elif action == "alerts":
+            await self._request(action, "GET", "/alerts")
+        elif action == "forecasts":
+            await self._request(action, "GET", "/forecasts", params={"limit": 200})
+        elif action == "report_download":
+            await self._request(action, "GET", "/report/download")
+        elif action == "insight":
+            stock = self.rng.randint(0, 400)
+            await self._request(action, "POST", "/insight", json={
+                "product_name": f"P{self.rng.randint(1, 10_000):06d}", "current_stock": stock,
+                "forecast_next_week": float(self.rng.randint(0, 500)),
+                "trend": self.rng.choice(["Increasing", "Decreasing", "Stable"])})
+        elif action == "send_report":
+            await self._request(action, "POST", "/send-report", json={"recipients": ["ops@niyojan.local"]})
+        else:
+            raise ValueError(f"unknown action {action!r}")
+
+    async def run(self, stop_at):
+        await self.login()
+        while time.monotonic() < stop_at:
+            await self.act(self.rng.choices(self.actions, self.weights)[0])
+            if self.think_ms:
+                await asyncio.sleep(self.rng.expovariate(1000.0 / self.think_ms))
+
+
+async def drive(client, args, payloads, mix, credentials):
+    recorder = Recorder()
+    started = time.monotonic()
+    stop_at = started + args.warmup + args.duration
+    users = []
+    for i in range(args.users):
+        vu = VirtualUser(client, recorder, payloads, mix, args.think_ms, credentials, random.Random(args.seed + i))
+        users.append(asyncio.create_task(vu.run(stop_at)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.users)
+
+    await asyncio.sleep(max(0.0, started + args.warmup - time.monotonic()))
+    recorder.recording = True
+    measured_from = time.monotonic()
+    await asyncio.gather(*users)
+    return recorder.summary(time.monotonic() - measured_from)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def print_table(summary):
+    cols = ["requests", "rps", "error_rate", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    print(f"{'action':<18}" + "".join(f"{c:>12}" for c in cols))
+    for name, row in list(summary["actions"].items()) + [("TOTAL", summary["total"])]:
+        print(f"{name:<18}" + "".join(f"{row[c] if row[c] is not None else '-':>12}" for c in cols))
+
+
+async def _run(args):
+    import httpx
+    from benchmarks.datagen import sales_csv
+
+    mix = parse_mix(args.mix) if args.mix else dict(DEFAULT_MIX)
+    sizes = dict(zip(DEFAULT_UPLOAD_SIZES, args.upload_sizes))
+    payloads = {name: sales_csv(n, args.weeks, seed=n, date_format="%d-%m-%Y")
+                for name, n in sizes.items() if mix.get(name)}
+    credentials = tuple(args.login.split(":", 1)) if args.login else LOADTEST_USER
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    timeout = httpx.Timeout(args.timeout)
+
+    server, standin_stats = None, None
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, NIYOJAN_LOADTEST_DIR=workdir,
+                   NIYOJAN_LOADTEST_LLM_MS=str(args.llm_ms), NIYOJAN_LOADTEST_SMTP_MS=str(args.smtp_ms),
+                   NIYOJAN_LOADTEST_LLM_FAIL=str(args.llm_fail_rate),
+                   NIYOJAN_LOADTEST_SMTP_FAIL=str(args.smtp_fail_rate))
+        try:
+            if args.url:
+                transport, base_url = None, args.url
+            elif args.server == "uvicorn":
+                server, base_url = _start_uvicorn(env, args.workers)
+                transport = None
+            else:
+                os.environ.update(env)
+                app = create_app()
+                transport, base_url = httpx.ASGITransport(app=app), "http://loadtest"
+            async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits,
+                                         timeout=timeout) as client:
+                summary = await drive(client, args, payloads, mix, credentials)
+            if transport is not None:
+                from benchmarks import standins
+                standin_stats = standins.stats()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    return {
+        "target": args.url or args.server,
+        "workers": args.workers if args.server == "uvicorn" and not args.url else None,
+        "users": args.users,
+        "duration_s": args.duration,
+        "think_ms": args.think_ms,
+        "mix": mix,
+        "upload_sizes": sizes,
+        "llm_ms": args.llm_ms,
+        "smtp_ms": args.smtp_ms,
+        "cpus": os.cpu_count(),
+        "standins": standin_stats,
+        **summary,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds run before measuring")
+    parser.add_argument("--ramp", type=float, default=2, help="seconds over which users start")
+    parser.add_argument("--think-ms", type=float, default=500, help="mean pause between actions")
+    parser.add_argument("--mix", default=None, help=f"action=weight,... (default {DEFAULT_MIX})")
+    parser.add_argument("--upload-sizes", type=int, nargs=3, default=list(DEFAULT_UPLOAD_SIZES.values()),
+                        metavar=("SMALL", "MEDIUM", "LARGE"), help="products per forecast upload")
+    parser.add_argument("--weeks", type=int, default=26, help="weeks of history per uploaded product")
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--url", default=None, help="load an already running server instead")
+    parser.add_argument("--login", default=None, help="email:password for --url targets")
+    parser.add_argument("--llm-ms", type=float, default=800, help="median stand-in Gemini latency")
+    parser.add_argument("--smtp-ms", type=float, default=150, help="median stand-in SMTP latency")
+    parser.add_argument("--llm-fail-rate", type=float, default=0.0)
+    parser.add_argument("--smtp-fail-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(_run(args))
+    print_table(result)
+    if result["standins"]:
+        print(f"stand-ins: {result['standins']}")
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Local stand-ins for Gemini and SMTP, so the app can be exercised offline.
+
+    from benchmarks import standins
+    standins.install(llm_ms=800, smtp_ms=150)   # before backend.app.main is imported
+    from backend.app import main
+
+install_gemini() puts a fake `google.generativeai` in sys.modules (also when
+the real SDK is installed, so nothing leaves the machine); its models answer
+with a valid InsightOutput JSON after a log-normal delay around llm_ms
+(streamed: first chunk after a fifth of it, the rest spread over the remainder).
+install_smtp() swaps smtplib.SMTP for a recorder that accepts every message
+after smtp_ms. Both can fail a share of calls to exercise error paths.
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import asyncio
+import smtplib
+import threading
+
+LATENCY_SIGMA = 0.35  # spread of the log-normal delays
+STREAM_CHUNK_CHARS = 24
+
+STATS = {"llm_calls": 0, "llm_failures": 0, "mails_sent": 0, "mail_failures": 0, "mail_bytes": 0}
+_stats_lock = threading.Lock()
+
+INSIGHT_TEXT = json.dumps({
+    "english": {"summary": "Demand is steady against current stock.",
+                "risk": "Low risk of stock-out this week.",
+                "action": "Hold the current reorder plan."},
+    "hindi": {"summary": "मांग मौजूदा स्टॉक के मुकाबले स्थिर है।",
+              "risk": "इस सप्ताह स्टॉक खत्म होने का जोखिम कम है।",
+              "action": "मौजूदा पुनः ऑर्डर योजना जारी रखें।"},
+}, ensure_ascii=False)
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        STATS[key] += n
+
+
+def _delay(median_ms):
+    return median_ms / 1000.0 * random.lognormvariate(0, LATENCY_SIGMA) if median_ms > 0 else 0.0
+
+
+# -------------------------
+# Gemini
+# -------------------------
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StreamResponse:
+    """Async iterable of text chunks, like the SDK's stream=True response."""
+
+    def __init__(self, text, delay):
+        self.text = text
+        self.delay = delay
+
+    async def __aiter__(self):
+        chunks = [self.text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(self.text), STREAM_CHUNK_CHARS)]
+        await asyncio.sleep(self.delay * 0.2)
+        for chunk in chunks:
+            yield _Response(chunk)
+            await asyncio.sleep(self.delay * 0.8 / len(chunks))
+
+
+class FakeGenerativeModel:
+    latency_ms = 800.0
+    fail_rate = 0.0
+
+    def __init__(self, model_name=None, system_instruction=None, **kwargs):
+        self.model_name = model_name
+
+    def _result(self):
+        if random.random() < self.fail_rate:
+            _count("llm_failures")
+            raise RuntimeError("stand-in Gemini: simulated failure")
+        _count("llm_calls")
+        return _Response(INSIGHT_TEXT)
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        time.sleep(_delay(self.latency_ms))
+        return self._result()
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False, **kwargs):
+        if stream:
+            return _StreamResponse(self._result().text, _delay(self.latency_ms))
+        await asyncio.sleep(_delay(self.latency_ms))
+        return self._result()
+
+
+def install_gemini(latency_ms=800.0, fail_rate=0.0):
+    FakeGenerativeModel.latency_ms = latency_ms
+    FakeGenerativeModel.fail_rate = fail_rate
+    fake = types.ModuleType("google.generativeai")
+    fake.configure = lambda **kwargs: None
+    fake.GenerativeModel = FakeGenerativeModel
+
+    google = sys.modules.get("google")
+    if google is None:
+        try:
+            import google  # namespace package shipped with protobuf & co.
+        except ImportError:
+            google = types.ModuleType("google")
+            google.__path__ = []
+            sys.modules["google"] = google
+    google.generativeai = fake
+    sys.modules["google.generativeai"] = fake
+    os.environ.setdefault("GEMINI_API_KEY", "standin")
+
+    client = sys.modules.get("genai.llm_client")
+    if client is not None:  # already imported: rebind its module handle
+        client.genai = fake
+    return fake
+
+
+# -------------------------
+# SMTP
+# -------------------------
+class FakeSMTP:
+    latency_ms = 150.0
+    fail_rate = 0.0
+    sent = []  # (recipients, size) of the last messages, bounded
+    max_kept = 1000
+
+    def __init__(self, host="", port=0, *args, **kwargs):
+        self.host, self.port = host, port
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def ehlo(self, *args, **kwargs):
+        return (250, b"standin")
+
+    def has_extn(self, name):
+        return name.lower() in ("auth", "starttls", "size")
+
+    def starttls(self, *args, **kwargs):
+        return (220, b"ready")
+
+    def noop(self):
+        return (250, b"ok")
+
+    def login(self, user, password):
+        return (235, b"ok")
+
+    def sendmail(self, from_addr, to_addrs, msg, *args, **kwargs):
+        time.sleep(_delay(self.latency_ms))
+        if random.random() < self.fail_rate:
+            _count("mail_failures")
+            raise smtplib.SMTPServerDisconnected("stand-in SMTP: simulated failure")
+        size = len(msg)
+        _count("mails_sent")
+        _count("mail_bytes", size)
+        FakeSMTP.sent.append((list(to_addrs) if not isinstance(to_addrs, str) else [to_addrs], size))
+        del FakeSMTP.sent[:-self.max_kept]
+        return {}
+
+    def send_message(self, msg, from_addr=None, to_addrs=None, *args, **kwargs):
+        return self.sendmail(from_addr or msg["From"], to_addrs or msg["To"].split(","), msg.as_bytes())
+
+    def quit(self):
+        return (221, b"bye")
+
+    close = quit
+
+
+def install_smtp(latency_ms=150.0, fail_rate=0.0):
+    FakeSMTP.latency_ms = latency_ms
+    FakeSMTP.fail_rate = fail_rate
+    smtplib.SMTP = FakeSMTP
+    smtplib.SMTP_SSL = FakeSMTP
+    os.environ.setdefault("SMTP_EMAIL", "reports@niyojan.local")
+    os.environ.setdefault("SMTP_PASSWORD", "standin")
+    return FakeSMTP
+
+
+def install(llm_ms=800.0, smtp_ms=150.0, llm_fail_rate=0.0, smtp_fail_rate=0.0):
+    install_gemini(llm_ms, llm_fail_rate)
+    install_smtp(smtp_ms, smtp_fail_rate)
+
+
+def stats():
+    with _stats_lock:
+        return dict(STATS)
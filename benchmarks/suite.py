@@ -0,0 +1,211 @@
+"""
+End-to-end pipeline benchmarks at 100 / 1k / 10k / 100k products.
+
+    python -m benchmarks.suite --out benchmarks/results/              # -> suite-<commit>.json
+    python -m benchmarks.suite --sizes 100 1000 --synthetic-model      # no TensorFlow needed
+    python -m benchmarks.suite --compare benchmarks/results/suite-<old>.json benchmarks/results/suite-<new>.json
+
+For every size a synthetic catalog (benchmarks/datagen.py) is uploaded to
+POST /forecast in-process, against a throwaway database. Per-stage times are
+read back from niyojan_stage_seconds, so they cover exactly the code the
+endpoint runs: CSV ingest (upload.*), preprocessing (forecast.group_products),
+inference (forecast.model), the decision engine (forecast.analyze), result
+building and the db.* writes. DB reads, the report payload and PDF rendering
+are timed directly afterwards. Each size runs in a fresh interpreter so peak
+RSS is per size. Stage times are the best of --repeats.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000]
+STAGES = ["pdf"]  # stages --skip can leave out
+NOISE_FLOOR_SECONDS = 0.01
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _run_once(app_main, client, raw, horizon, skip, tmp):
+    from database import db_manager
+    from utils import metrics
+
+    db_manager.DB_PATH = os.path.join(tmp, f"bench-{time.monotonic_ns()}.db")
+    db_manager.init_db()
+    db_manager.create_user("bench@niyojan.local", "bench", "bench")
+    token = app_main.create_access_token("bench@niyojan.local", "admin")
+
+    seconds = {}
+    before = metrics.stage_totals()
+    started = time.perf_counter()
+    resp = client.post("/forecast", files={"file": ("sales.csv", raw, "text/csv")},
+                       data={"horizon": str(horizon)}, headers={"Authorization": f"Bearer {token}"})
+    seconds["forecast.request"] = time.perf_counter() - started
+    if resp.status_code != 200:
+        raise RuntimeError(f"/forecast returned {resp.status_code}: {resp.text[:300]}")
+    after = metrics.stage_totals()
+    seconds.update({k: v - before.get(k, 0.0) for k, v in after.items() if v - before.get(k, 0.0) > 0})
+
+    def timed(name, fn):
+        started = time.perf_counter()
+        out = fn()
+        seconds[name] = time.perf_counter() - started
+        return out
+
+    timed("db.read_sales_history", db_manager.get_sales_history)
+    timed("db.read_forecasts", lambda: db_manager.get_all_forecasts_raw_query(db_manager.get_latest_batch_timestamp()))
+    payload = timed("report.payload", app_main.build_report_payload_from_db)
+    if "pdf" not in skip and app_main.PDF_GEN_AVAILABLE:
+        timed("report.pdf", lambda: app_main.generate_pdf_report(os.path.join(tmp, "report.pdf"), *payload))
+    return seconds, resp.json()
+
+
+def _child(args):
+    from fastapi.testclient import TestClient
+    from benchmarks.datagen import sales_csv
+    from database import db_manager
+
+    # main runs init_db() on import: keep that off the real database too
+    scratch = tempfile.TemporaryDirectory()
+    db_manager.DB_PATH = os.path.join(scratch.name, "import.db")
+    from backend.app import main as app_main
+
+    started = time.perf_counter()
+    raw = sales_csv(args.size, args.weeks, seed=args.seed, date_format="%d-%m-%Y")
+    generate_seconds = time.perf_counter() - started
+
+    client = TestClient(app_main.app)
+    best = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(args.repeats):
+            seconds, body = _run_once(app_main, client, raw, args.horizon, set(args.skip), tmp)
+            for k, v in seconds.items():
+                best[k] = min(best.get(k, v), v)
+    scratch.cleanup()
+
+    methods = {}
+    for row in body["data"]:
+        methods[row["Forecast_Model"]] = methods.get(row["Forecast_Model"], 0) + 1
+    print(json.dumps({
+        "products": args.size,
+        "rows": raw.count(b"\n") - 1,
+        "csv_mb": round(len(raw) / 2 ** 20, 2),
+        "generate_seconds": round(generate_seconds, 3),
+        "forecast_methods": methods,
+        "model": body["model_version"],
+        "seconds": {k: round(v, 4) for k, v in sorted(best.items())},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def run_suite(args):
+    env = dict(os.environ)
+    env["NIYOJAN_METRICS"] = "1"  # stage breakdown comes from the metrics registry
+    env["NIYOJAN_PRERENDER_REPORTS"] = "0"  # TestClient would run it inside the request; timed as report.pdf
+    env.setdefault("GEMINI_API_KEY", "benchmark-unused")  # genai is imported by the app, never called here
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic_model:
+            from benchmarks.synthetic import synthetic_registry
+            env.update(synthetic_registry(tmp))
+        for size in args.sizes:
+            cmd = [sys.executable, "-m", "benchmarks.suite", "--child", "--size", str(size),
+                   "--weeks", str(args.weeks), "--horizon", str(args.horizon), "--repeats", str(args.repeats),
+                   "--seed", str(args.seed), "--skip", *args.skip]
+            proc = subprocess.run(cmd, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                sys.exit(f"size {size} failed:\n{proc.stderr[-3000:]}")
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{size:>7} products: /forecast {result['seconds']['forecast.request']:.3f}s, "
+                  f"peak RSS {result['peak_rss_mb']} MiB", file=sys.stderr)
+            results.append(result)
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "variant": env.get("NIYOJAN_MODEL_VARIANT", "keras"),
+        "synthetic_model": args.synthetic_model,
+        "weeks": args.weeks,
+        "horizon": args.horizon,
+        "repeats": args.repeats,
+        "sizes": results,
+    }
+
+
+def compare(old, new, threshold):
+    """Print per-stage ratios new/old; returns the regressions above threshold."""
+    regressions = []
+    old_sizes = {r["products"]: r for r in old["sizes"]}
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    for r in new["sizes"]:
+        base = old_sizes.get(r["products"])
+        if base is None:
+            continue
+        print(f"\n{r['products']} products")
+        for stage in sorted(set(r["seconds"]) & set(base["seconds"])):
+            a, b = base["seconds"][stage], r["seconds"][stage]
+            ratio = b / a if a else float("inf")
+            flag = ""
+            if ratio > threshold and b > NOISE_FLOOR_SECONDS:
+                flag = "  REGRESSION"
+                regressions.append((r["products"], stage, ratio))
+            print(f"  {stage:<32} {a:>9.4f}s -> {b:>9.4f}s  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES)
+    parser.add_argument("--weeks", type=int, default=26)
+    parser.add_argument("--horizon", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip", nargs="*", default=[], choices=STAGES)
+    parser.add_argument("--synthetic-model", action="store_true")
+    parser.add_argument("--out", default=None, help="JSON file, or a directory for suite-<commit>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), default=None)
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio that counts as a regression")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args)
+        return
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            new = json.load(f)
+        sys.exit(1 if compare(old, new, args.threshold) else 0)
+
+    result = run_suite(args)
+    print(json.dumps(result, indent=2))
+    if args.out:
+        path = args.out
+        if path.endswith(os.sep) or os.path.isdir(path):
+            path = os.path.join(path, f"suite-{result['commit'] or 'local'}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"wrote {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
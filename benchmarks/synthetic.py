@@ -0,0 +1,59 @@
+"""
+Synthetic fixtures for benchmarks that must run without TensorFlow.
+
+synthetic_registry() writes a model version whose only served artifact is a
+NumPy export with the production layout (LSTM -> Dense(32, relu) -> Dense(1))
+and random weights, plus the real scaler / label encoder from lstm/. Point
+the process at it *before* utils.forecast_engine is imported:
+
+    env = synthetic_registry(tmp)
+    os.environ.update(env)
+"""
+import os
+import shutil
+
+import numpy as np
+
+from utils.model_backends import save_numpy_weights
+from utils.model_registry import LEGACY_DIR, ACTIVE_FILE, VARIANTS_DIR, write_manifest
+from utils.shared_weights import pack_npz
+
+SYNTHETIC_VERSION = "synthetic"
+
+
+def synthetic_weights(path, units=64, precision="fp32", window=6, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = {
+        "lstm_kernel": rng.normal(0, 0.1, (2, 4 * units)),
+        "lstm_recurrent": rng.normal(0, 0.1, (units, 4 * units)),
+        "lstm_bias": np.zeros(4 * units),
+        "dense_0_kernel": rng.normal(0, 0.1, (units, 32)),
+        "dense_0_bias": np.zeros(32),
+        "dense_1_kernel": rng.normal(0, 0.1, (32, 1)),
+        "dense_1_bias": np.zeros(1),
+    }
+    weights = {k: v.astype(np.float32) for k, v in weights.items()}
+    save_numpy_weights(path, weights, {"units": units, "dense_activations": ["relu", "linear"],
+                                       "input_shape": [window, 2]}, precision)
+    return path
+
+
+def synthetic_registry(directory, units=64, precision="fp32", window=6):
+    """
+    Create <directory>/synthetic as the ACTIVE version and return the env
+    vars that make the registry serve it.
+    """
+    path = os.path.join(directory, SYNTHETIC_VERSION)
+    # placeholder SavedModel dir: manifests require one, the variant is what gets served
+    os.makedirs(os.path.join(path, "global_lstm_model"), exist_ok=True)
+    open(os.path.join(path, "global_lstm_model", "saved_model.pb"), "wb").close()
+    for name in ("scaler.pkl", "label_encoder.pkl"):
+        shutil.copy(os.path.join(LEGACY_DIR, name), path)
+    os.makedirs(os.path.join(path, VARIANTS_DIR), exist_ok=True)
+    npz = synthetic_weights(os.path.join(path, VARIANTS_DIR, f"model.numpy_{precision}.npz"),
+                            units, precision, window)
+    pack_npz(npz)
+    write_manifest(path, SYNTHETIC_VERSION, [None, window, 2])
+    with open(os.path.join(directory, ACTIVE_FILE), "w", encoding="utf-8") as f:
+        f.write(SYNTHETIC_VERSION)
+    return {"NIYOJAN_MODEL_REGISTRY": directory, "NIYOJAN_MODEL_VARIANT": f"numpy_{precision}"}
@@ -0,0 +1,112 @@
+"""
+Upload parsing cost per format, on the same synthetic catalog.
+
+    python -m benchmarks.uploads --products 10000 --weeks 52
+    python -m benchmarks.uploads --products 100000 --formats csv csv.gz parquet
+
+Every format in benchmarks.datagen.UPLOAD_FORMATS whose library is installed
+is written once, then loaded in a fresh interpreter through
+utils.upload_formats.read_frame plus the Week coercion /forecast applies to
+text dates. Reported: bytes on the wire, best-of-N load time, and the peak
+RSS growth while loading (on top of the raw upload bytes already in memory).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _peak_rss_kb():
+    # VmHWM belongs to this process image; ru_maxrss of a child starts at the
+    # parent's peak on Linux, and the parent holds the whole generated catalog
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _child(path, repeats):
+    import pandas as pd
+    from utils import upload_formats
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    base = _peak_rss_kb()
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        df = upload_formats.read_frame(raw)
+        if not pd.api.types.is_datetime64_any_dtype(df["Week"]):
+            df["Week"] = pd.to_datetime(df["Week"], dayfirst=True, errors="coerce")
+        best = min(best, time.perf_counter() - started)
+        rows = len(df)
+        del df
+    peak = _peak_rss_kb()
+    print(json.dumps({"rows": rows, "seconds": round(best, 4), "rss_growth_mb": round((peak - base) / 1024, 1)}))
+
+
+def run(args):
+    from benchmarks.datagen import generate_sales, encode_upload
+
+    df = generate_sales(args.products, args.weeks, args.seed, date_format=args.date_format)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats:
+            try:
+                raw = encode_upload(df, fmt)
+            except ImportError as e:
+                print(f"{fmt:>8}: skipped ({e.name} not installed)", file=sys.stderr)
+                continue
+            path = os.path.join(tmp, f"sales.{fmt}")
+            with open(path, "wb") as f:
+                f.write(raw)
+            proc = subprocess.run([sys.executable, "-m", "benchmarks.uploads", "--child", path,
+                                   "--repeats", str(args.repeats)], cwd=ROOT_DIR, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{fmt:>8}: failed\n{proc.stderr[-1000:]}", file=sys.stderr)
+                continue
+            results[fmt] = {"bytes": len(raw), **json.loads(proc.stdout.strip().splitlines()[-1])}
+
+    base = results.get("csv")
+    print(f"{args.products} products x {args.weeks} weeks ({len(df)} rows)")
+    print(f"{'format':>8} {'size MB':>9} {'load s':>8} {'vs csv':>7} {'RSS +MB':>8}")
+    for fmt, r in results.items():
+        speedup = f"{base['seconds'] / r['seconds']:.1f}x" if base and r["seconds"] else "-"
+        print(f"{fmt:>8} {r['bytes'] / 1e6:>9.2f} {r['seconds']:>8.3f} {speedup:>7} {r['rss_growth_mb']:>8.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"products": args.products, "weeks": args.weeks, "rows": len(df), "formats": results}, f, indent=2)
+    return results
+
+
+def main(argv=None):
+    from benchmarks.datagen import UPLOAD_FORMATS
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--date-format", default="%d-%m-%Y", help="Week format in the CSV variants")
+    parser.add_argument("--formats", nargs="+", default=UPLOAD_FORMATS, choices=UPLOAD_FORMATS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        _child(args.child, args.repeats)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
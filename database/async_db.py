@@ -0,0 +1,183 @@
+"""
+Awaitable SQLite access for the async endpoints.
+
+    user = await async_db.read(db_manager.find_user_by_email, email)
+    batch_id = await async_db.write(db_manager.save_forecast_batch, forecasts, alerts, horizon=4)
+    async_db.write_sync(db_manager.bulk_upsert_sales_history, rows)   # from worker threads
+
+Reads run on a small dedicated thread pool (NIYOJAN_DB_READ_THREADS), so they
+neither block the event loop nor queue behind CPU-bound work in the shared
+threadpool; with the database in WAL mode they do not wait for writers either.
+
+Writes go through one writer thread that owns this process's only write
+connection. Every db_manager write helper takes a `conn=` argument; the writer
+passes its own, runs each queued write under a SAVEPOINT (a failing write is
+rolled back alone and its caller gets the exception) and commits everything
+that was queued in one transaction: a burst of small writes costs one commit
+instead of one each, and writers of this process never wait on each other's
+locks. NIYOJAN_DB_GROUP_COMMIT_MS lets the writer wait a little for more writes
+before committing (0 = commit whatever had queued up meanwhile).
+
+Every runtime write goes through the writer: forecasts, history, users,
+backtests, the mail queue (enqueue, claim, finish), schedules, scheduler
+leases and distribution lists. The helpers still accept conn=None and then
+commit on their own connection; only startup uses that path (init_db() and
+ensure_default_admin(), which run before the writer or any request exists).
+"""
+import os
+import time
+import queue
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import database.db_manager as db_manager
+from utils import metrics
+
+logger = logging.getLogger("niyojan.db")
+
+READ_THREADS = int(os.getenv("NIYOJAN_DB_READ_THREADS", "4"))
+GROUP_COMMIT_SECONDS = float(os.getenv("NIYOJAN_DB_GROUP_COMMIT_MS", "0")) / 1000
+GROUP_COMMIT_MAX = int(os.getenv("NIYOJAN_DB_GROUP_COMMIT_MAX", "256"))
+BUSY_TIMEOUT_SECONDS = 30
+
+WRITE_GROUP = metrics.histogram("niyojan_db_write_group_size", "Writes committed together by the DB writer",
+                                buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+WRITE_WAIT = metrics.histogram("niyojan_db_write_queue_seconds", "Time a write waited for the DB writer")
+WRITES = metrics.counter("niyojan_db_writes_total", "Writes through the DB writer by outcome", ("result",))
+
+_readers = None
+_readers_lock = threading.Lock()
+
+
+def _read_pool():
+    global _readers
+    with _readers_lock:
+        if _readers is None:
+            _readers = ThreadPoolExecutor(READ_THREADS, thread_name_prefix="niyojan-db-read")
+        return _readers
+
+
+async def read(fn, *args, **kwargs):
+    """Run a db_manager read helper on the read pool and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(_read_pool(), lambda: fn(*args, **kwargs))
+
+
+class DBWriter:
+    def __init__(self, group_seconds=GROUP_COMMIT_SECONDS, group_max=GROUP_COMMIT_MAX):
+        self.group_seconds = group_seconds
+        self.group_max = group_max
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._conn = None
+        self._path = None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="niyojan-db-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=30):
+        """Commit what is queued, then end the thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, conn=<writer connection>, **kwargs); the Future resolves after the commit."""
+        future = Future()
+        self._queue.put((fn, args, kwargs, future, time.perf_counter()))
+        self.start()
+        return future
+
+    def _connection(self):
+        # reopen if the database moved (tests point db_manager.DB_PATH elsewhere)
+        if self._conn is None or self._path != db_manager.DB_PATH:
+            if self._conn is not None:
+                self._conn.close()
+            self._path = db_manager.DB_PATH
+            self._conn = sqlite3.connect(self._path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                                         check_same_thread=False)
+        return self._conn
+
+    def _next_group(self, first):
+        group = [first]
+        deadline = time.perf_counter() + self.group_seconds
+        while len(group) < self.group_max:
+            try:
+                remaining = deadline - time.perf_counter()
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)  # finish this group first, stop afterwards
+                break
+            group.append(job)
+        return group
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            group = self._next_group(job)
+            try:
+                self._commit(group)
+            except Exception as e:
+                logger.exception("DB writer group of %d failed", len(group))
+                for *_, future, _ in group:
+                    if not future.done():
+                        future.set_exception(e)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _commit(self, group):
+        conn = self._connection()
+        done = []
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for fn, args, kwargs, future, queued_at in group:
+                WRITE_WAIT.observe(started - queued_at)
+                conn.execute("SAVEPOINT job")
+                try:
+                    result = fn(*args, conn=conn, **kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    future.set_exception(e)
+                    WRITES.inc(result="error")
+                else:
+                    done.append((future, result))
+                conn.execute("RELEASE job")
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        metrics.record_stage("db.group_commit", time.perf_counter() - started)
+        WRITE_GROUP.observe(len(group))
+        WRITES.inc(len(done), result="ok")
+        for future, result in done:
+            future.set_result(result)
+
+
+writer = DBWriter()
+
+
+async def write(fn, *args, **kwargs):
+    """Queue a db_manager write helper on the writer and await its committed result."""
+    return await asyncio.wrap_future(writer.submit(fn, *args, **kwargs))
+
+
+def write_sync(fn, *args, **kwargs):
+    """write() for code already running in a worker thread: blocks until committed."""
+    return writer.submit(fn, *args, **kwargs).result()
+
+
+def stop():
+    writer.stop()
@@ -1,7 +1,48 @@
-import sqlite3, os, hashlib, secrets
+import sqlite3, os, hashlib, secrets, json, time
+from contextlib import contextmanager
+from datetime import datetime
+
+from utils import metrics
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'niyojan.db')
 SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'schema.sql')
+# WAL lets readers run while a write transaction is open (set NIYOJAN_DB_WAL=0 on network filesystems)
+DB_WAL = os.getenv("NIYOJAN_DB_WAL", "1") == "1"
+
+ROWS_WRITTEN = metrics.counter("niyojan_db_rows_written_total", "Rows written to SQLite", ("table",))
+
+@contextmanager
+def _writing(conn=None):
+    """
+    Connection for a write helper: the caller's (the group-commit writer in
+    database/async_db.py, which commits itself) or a new one committed on exit.
+    """
+    if conn is not None:
+        yield conn
+        return
+    with sqlite3.connect(DB_PATH) as own:
+        yield own
+        own.commit()
+
+# ---- Change Stamps ----
+def _bump(conn, *names):
+    """Advance the data_versions stamp of each table written in this transaction."""
+    now = time.time()
+    conn.executemany(
+        "INSERT INTO data_versions (name, version, updated_at) VALUES (?, 1, ?) "
+        "ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at",
+        [(name, now) for name in names]
+    )
+
+def get_versions(*names):
+    """{name: (version, updated_at epoch seconds)}; (0, 0.0) for tables not written since stamps exist."""
+    with sqlite3.connect(DB_PATH) as conn:
+        rows = conn.execute(
+            f"SELECT name, version, updated_at FROM data_versions WHERE name IN ({','.join('?' * len(names))})",
+            names
+        ).fetchall()
+    found = {name: (version, updated_at) for name, version, updated_at in rows}
+    return {name: found.get(name, (0, 0.0)) for name in names}
 
 # ---- Database Initialization ----
 def init_db():
@@ -44,28 +85,103 @@ def init_db():
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
             ''')
+        _migrate(conn)
         conn.commit()
+        if DB_WAL:
+            conn.execute("PRAGMA journal_mode=WAL")
+
+# Columns added after the first release; CREATE TABLE IF NOT EXISTS does not
+# touch existing databases, so add them in place.
+MIGRATION_COLUMNS = [
+    ("forecasts", "category", "TEXT"),
+    ("forecasts", "last_week_sales", "REAL DEFAULT 0"),
+    ("alerts", "category", "TEXT"),
+    ("forecasts", "batch_id", "INTEGER"),
+    ("alerts", "batch_id", "INTEGER"),
+    ("users", "role", "TEXT DEFAULT 'analyst'"),
+    ("forecast_batches", "history_week", "TEXT"),
+]
+
+def _migrate(conn):
+    for table, column, decl in MIGRATION_COLUMNS:
+        existing = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+        if existing and column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_forecasts_batch ON forecasts(batch_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_batch ON alerts(batch_id)")
+    _adopt_legacy_rows(conn)
+    _backfill_batch_summaries(conn)
+
+# rows of one pre-batch /forecast call were written within this many seconds
+# of each other (the old report query grouped them with the same window)
+LEGACY_RUN_GAP_SECONDS = 60
+
+def _adopt_legacy_rows(conn):
+    """
+    Forecast and alert rows written before forecast_batches existed have no
+    batch_id, so every batch reader skipped them. Give each old run its own
+    batch. /forecast wrote each product's weeks back to back, so a run ends
+    when a product it already has comes round again or the next row is more
+    than LEGACY_RUN_GAP_SECONDS later; alerts go to the run they were written
+    after. Only rows older than the first real batch are adopted.
+    """
+    first_batched = conn.execute("SELECT MIN(id) FROM forecasts WHERE batch_id IS NOT NULL").fetchone()[0]
+    first_batch_at = conn.execute("SELECT MIN(created_at) FROM forecast_batches").fetchone()[0]
+    rows = conn.execute(
+        "SELECT id, product, created_at FROM forecasts WHERE batch_id IS NULL AND (? IS NULL OR id < ?) ORDER BY id",
+        (first_batched, first_batched)
+    ).fetchall()
+    if not rows:
+        return
+
+    runs = []  # [first_id, last_id, started_at, ended_at, products, rows]
+    previous, previous_product = None, None
+    for row_id, product, created_at in rows:
+        at = datetime.fromisoformat(created_at) if created_at else previous
+        if (not runs
+                or (product != previous_product and product in runs[-1][4])
+                or (at and previous and (at - previous).total_seconds() > LEGACY_RUN_GAP_SECONDS)):
+            runs.append([row_id, row_id, created_at, created_at, set(), 0])
+        run = runs[-1]
+        run[1], run[3] = row_id, created_at or run[3]
+        run[4].add(product)
+        run[5] += 1
+        previous, previous_product = at, product
+
+    alerts_until = [r[2] for r in runs[1:]] + [first_batch_at]
+    for (first_id, last_id, started_at, ended_at, products, n), until in zip(runs, alerts_until):
+        batch_id = conn.execute(
+            "INSERT INTO forecast_batches (model_version, horizon, products, created_at) VALUES ('legacy', ?, ?, ?)",
+            (n // len(products), len(products), ended_at)
+        ).lastrowid
+        conn.execute("UPDATE forecasts SET batch_id = ? WHERE batch_id IS NULL AND id BETWEEN ? AND ?",
+                     (batch_id, first_id, last_id))
+        conn.execute(
+            "UPDATE alerts SET batch_id = ? WHERE batch_id IS NULL AND created_at >= ? "
+            "AND (? IS NULL OR created_at < ?)",
+            (batch_id, started_at, until, until)
+        )
+    _bump(conn, "forecast_batches", "forecasts", "alerts")
 
 # ---- Forecast / Alert Operations ----
-# ---- Forecast / Alert Operations ----
-# ---- Forecast / Alert Operations ----
-def insert_forecast(product, forecast, category=None, last_week_sales=0):
+def insert_forecast(product, forecast, category=None, last_week_sales=0, conn=None):
     """Single insert."""
-    with sqlite3.connect(DB_PATH) as conn:
+    with _writing(conn) as conn:
         conn.execute(
             "INSERT INTO forecasts (product, forecast, category, last_week_sales) VALUES (?, ?, ?, ?)",
             (product, float(forecast), category, float(last_week_sales))
         )
-        conn.commit()
+        _bump(conn, "forecasts")
 
-def bulk_insert_forecasts(data_list):
+@metrics.timed("db.bulk_insert_forecasts")
+def bulk_insert_forecasts(data_list, conn=None):
     """
     Bulk insert forecasts.
     data_list: list of tuples (product, forecast, category, last_week_sales)
     """
     if not data_list:
         return
-    with sqlite3.connect(DB_PATH) as conn:
+    with _writing(conn) as conn:
         # Check if length matches 4 columns
         if len(data_list[0]) == 4:
             conn.executemany(
@@ -78,37 +194,86 @@ def bulk_insert_forecasts(data_list):
                 "INSERT INTO forecasts (product, forecast, category) VALUES (?, ?, ?)",
                 data_list
             )
-        conn.commit()
+        _bump(conn, "forecasts")
 
-def insert_alert(product, alert, category=None):
+@metrics.timed("db.save_forecast_batch")
+def save_forecast_batch(forecasts, alerts, model_version=None, horizon=None, created_by=None,
+                        history_week=None, conn=None):
+    """
+    Persist one forecast run in a single transaction.
+    forecasts: list of tuples (product, forecast, category, last_week_sales)
+    alerts: list of tuples (product, forecast, alert, category)
+    history_week: last week ('YYYY-MM-DD') of the history the batch was forecast from
+    Returns the new batch id.
+    """
+    products = len({f[0] for f in forecasts})
+    with _writing(conn) as conn:
+        cur = conn.execute(
+            "INSERT INTO forecast_batches (model_version, horizon, products, created_by, history_week) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (model_version, horizon, products, created_by, history_week)
+        )
+        batch_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO forecasts (batch_id, product, forecast, category, last_week_sales) VALUES (?, ?, ?, ?, ?)",
+            [(batch_id,) + tuple(f) for f in forecasts]
+        )
+        if alerts:
+            conn.executemany(
+                "INSERT INTO alerts (batch_id, product, forecast, alert, category) VALUES (?, ?, ?, ?, ?)",
+                [(batch_id,) + tuple(a) for a in alerts]
+            )
+        _write_batch_summary(conn, batch_id, forecasts, horizon)
+        _bump(conn, "forecast_batches", "forecasts", "alerts")
+    ROWS_WRITTEN.inc(1, table="forecast_batches")
+    ROWS_WRITTEN.inc(len(forecasts), table="forecasts")
+    ROWS_WRITTEN.inc(len(alerts), table="alerts")
+    return batch_id
+
+def get_forecast_batch(batch_id):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM forecast_batches WHERE id = ?", (batch_id,)).fetchone()
+    return dict(row) if row else None
+
+def get_latest_batch():
     with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        # adopted legacy batches get new ids but keep their original time
+        row = conn.execute("SELECT * FROM forecast_batches ORDER BY created_at DESC, id DESC LIMIT 1").fetchone()
+    return dict(row) if row else None
+
+def insert_alert(product, alert, category=None, conn=None):
+    with _writing(conn) as conn:
         conn.execute(
             "INSERT INTO alerts (product, alert, category) VALUES (?, ?, ?)",
             (product, alert, category)
         )
-        conn.commit()
+        _bump(conn, "alerts")
 
-def insert_alert_with_forecast(product, forecast, alert, category=None):
-    with sqlite3.connect(DB_PATH) as conn:
+def insert_alert_with_forecast(product, forecast, alert, category=None, conn=None):
+    with _writing(conn) as conn:
         conn.execute(
             "INSERT INTO alerts (product, forecast, alert, category) VALUES (?, ?, ?, ?)",
             (product, float(forecast), alert, category)
         )
-        conn.commit()
+        _bump(conn, "alerts")
 
-def bulk_insert_alerts(data_list):
+@metrics.timed("db.bulk_insert_alerts")
+def bulk_insert_alerts(data_list, conn=None):
     """
     Bulk insert alerts.
     data_list: list of tuples (product, forecast, alert, category)
     """
     if not data_list:
         return
-    with sqlite3.connect(DB_PATH) as conn:
+    with _writing(conn) as conn:
         conn.executemany(
             "INSERT INTO alerts (product, forecast, alert, category) VALUES (?, ?, ?, ?)",
             data_list
         )
-        conn.commit()
+        _bump(conn, "alerts")
+    ROWS_WRITTEN.inc(len(data_list), table="alerts")
 
 def get_all_alerts():
     with sqlite3.connect(DB_PATH) as conn:
@@ -120,6 +285,23 @@ def get_all_alerts():
         rows = c.fetchall()
     return [dict(r) for r in rows]
 
+def get_all_forecasts(limit=50):
+    """Most recent forecast rows, newest first (ids follow insertion, so no sort on created_at)."""
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT product, forecast, created_at FROM forecasts ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+def get_recent_alerts(limit=10):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT product, forecast, alert, created_at FROM alerts ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return [dict(r) for r in rows]
+
 def get_all_forecasts_raw_query(max_ts):
     """Fetch forecasts created in the given batch window."""
     with sqlite3.connect(DB_PATH) as conn:
@@ -141,20 +323,460 @@ def get_latest_batch_timestamp():
         row = cur.fetchone()
         return row[0] if row else None
 
+# ---- Batch Summaries ----
+def _write_batch_summary(conn, batch_id, forecasts, horizon=None):
+    """
+    Per-batch totals the dashboard and report read instead of scanning forecasts.
+    forecasts: (product, forecast, category, last_week_sales) in insertion order,
+    so a product's first and last rows are its first and last forecast week.
+    A batch that already has a summary is left as it is.
+    """
+    products = {}  # product -> [category, total, first, last, last_week_sales]
+    for product, value, category, last_week in forecasts:
+        value = float(value)
+        p = products.get(product)
+        if p is None:
+            products[product] = [category or "Unknown", value, value, value, float(last_week or 0.0)]
+        else:
+            p[1] += value
+            p[3] = value
+            p[4] = float(last_week or 0.0)
+
+    categories = {}  # category -> [products, total, last_week_total]
+    for category, total, _, _, last_week in products.values():
+        c = categories.setdefault(category, [0, 0.0, 0.0])
+        c[0] += 1
+        c[1] += total
+        c[2] += last_week
+
+    if not horizon:
+        horizon = len(forecasts) // len(products) if products else 0
+    forecast_total = sum(c[1] for c in categories.values())
+    last_week_total = sum(c[2] for c in categories.values())
+    avg_weekly = forecast_total / horizon if horizon else 0.0
+    avg_growth = ((avg_weekly / last_week_total) - 1) * 100 if last_week_total > 0 else 0.0
+
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO batch_summary (batch_id, products, horizon, forecast_total, last_week_total, avg_growth) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (batch_id, len(products), horizon, forecast_total, last_week_total, avg_growth)
+    )
+    if cur.rowcount == 0:
+        return
+    conn.executemany(
+        "INSERT INTO batch_category_summary (batch_id, category, products, total, last_week_total) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [(batch_id, cat, n, total, lw) for cat, (n, total, lw) in categories.items()]
+    )
+    conn.executemany(
+        "INSERT INTO batch_product_summary "
+        "(batch_id, product, category, total, first_forecast, last_forecast, last_week_sales) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(batch_id, pid, *vals) for pid, vals in products.items()]
+    )
+    ROWS_WRITTEN.inc(len(products), table="batch_product_summary")
+
+def _backfill_batch_summaries(conn):
+    """
+    Summaries for batches written before the summary tables existed, built
+    once at startup so the read path never writes.
+    """
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'batch_summary'").fetchone():
+        return
+    missing = conn.execute(
+        "SELECT b.id, b.horizon FROM forecast_batches b "
+        "WHERE NOT EXISTS (SELECT 1 FROM batch_summary s WHERE s.batch_id = b.id) "
+        "AND EXISTS (SELECT 1 FROM forecasts f WHERE f.batch_id = b.id)"
+    ).fetchall()
+    for batch_id, horizon in missing:
+        rows = conn.execute(
+            "SELECT product, forecast, category, last_week_sales FROM forecasts WHERE batch_id = ? ORDER BY id",
+            (batch_id,)
+        ).fetchall()
+        _write_batch_summary(conn, batch_id, rows, horizon)
+
+@metrics.timed("db.read_batch_summary")
+def get_batch_summary(batch_id, top_k=5):
+    """Overview, categories (largest first) and the top_k products of a batch, or None."""
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        overview = conn.execute(
+            "SELECT s.*, b.model_version, b.created_at FROM batch_summary s "
+            "LEFT JOIN forecast_batches b ON b.id = s.batch_id WHERE s.batch_id = ?",
+            (batch_id,)
+        ).fetchone()
+        if overview is None:
+            return None
+        categories = conn.execute(
+            "SELECT category, products, total, last_week_total FROM batch_category_summary "
+            "WHERE batch_id = ? ORDER BY total DESC",
+            (batch_id,)
+        ).fetchall()
+        top = conn.execute(
+            "SELECT product, category, total, first_forecast, last_forecast, last_week_sales "
+            "FROM batch_product_summary WHERE batch_id = ? ORDER BY total DESC LIMIT ?",
+            (batch_id, top_k)
+        ).fetchall()
+    return {
+        "overview": dict(overview),
+        "categories": [dict(r) for r in categories],
+        "top_products": [dict(r) for r in top],
+    }
+
+def get_batch_alerts(batch_id):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT product, category, forecast, alert, created_at FROM alerts WHERE batch_id = ? ORDER BY id",
+            (batch_id,)
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+# ---- Sales History ----
+@metrics.timed("db.bulk_upsert_sales_history")
+def bulk_upsert_sales_history(data_list, conn=None):
+    """
+    Store uploaded history so it can be backtested / re-forecast later.
+    data_list: list of tuples (product, product_name, category, week 'YYYY-MM-DD', sales_quantity, price)
+    """
+    if not data_list:
+        return
+    with _writing(conn) as conn:
+        conn.executemany(
+            """
+            INSERT INTO sales_history (product, product_name, category, week, sales_quantity, price)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(product, week) DO UPDATE SET
+                product_name = excluded.product_name,
+                category = excluded.category,
+                sales_quantity = excluded.sales_quantity,
+                price = excluded.price,
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            data_list
+        )
+        _bump(conn, "sales_history")
+    ROWS_WRITTEN.inc(len(data_list), table="sales_history")
+
+def get_sales_history():
+    """All stored history ordered by product and week."""
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute(
+            "SELECT product, product_name, category, week, sales_quantity, price "
+            "FROM sales_history ORDER BY product, week"
+        )
+        rows = c.fetchall()
+    return [dict(r) for r in rows]
+
+def get_sales_history_frame():
+    """Stored history as a DataFrame (faster than get_sales_history for large catalogs)."""
+    import pandas as pd
+    with sqlite3.connect(DB_PATH) as conn:
+        return pd.read_sql_query(
+            "SELECT product, product_name, category, week, sales_quantity, price "
+            "FROM sales_history ORDER BY product, week",
+            conn
+        )
+
+def get_last_history_week():
+    """Latest stored week ('YYYY-MM-DD') or None."""
+    with sqlite3.connect(DB_PATH) as conn:
+        return conn.execute("SELECT MAX(week) FROM sales_history").fetchone()[0]
+
+@metrics.timed("db.read_weekly_sales")
+def get_weekly_sales(since_week=None, until_week=None, products=None, category=None, by=None, batch_id=None):
+    """
+    (key, week, units) rows of stored history between `since_week` and
+    `until_week` ('YYYY-MM-DD', both optional and inclusive), optionally
+    limited to some products or one category.
+    batch_id limits rows to the products of that batch, with the categories
+    the batch recorded for them (history uploaded later may recategorise).
+    by='product' / 'category' keeps that column as key, None sums all rows per week.
+    """
+    source, category_col = "sales_history h", "COALESCE(h.category, 'Unknown')"
+    clauses, params = [], []
+    if batch_id is not None:
+        source += (" JOIN (SELECT DISTINCT product, COALESCE(category, 'Unknown') AS category "
+                   "FROM forecasts WHERE batch_id = ?) b ON b.product = h.product")
+        category_col = "b.category"
+        params.append(batch_id)
+    if since_week:
+        clauses.append("h.week >= ?")
+        params.append(since_week)
+    if until_week:
+        clauses.append("h.week <= ?")
+        params.append(until_week)
+    if products is not None:
+        products = list(products)
+        if not products:
+            return []
+        clauses.append(f"h.product IN ({','.join('?' * len(products))})")
+        params.extend(products)
+    if category is not None:
+        clauses.append(f"{category_col} = ?")
+        params.append(category)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    key = {"product": "h.product", "category": category_col}.get(by, "'all'")
+    with sqlite3.connect(DB_PATH) as conn:
+        return conn.execute(
+            f"SELECT {key}, h.week, SUM(h.sales_quantity) FROM {source} {where} GROUP BY 1, 2 ORDER BY 1, 2",
+            params
+        ).fetchall()
+
+def get_batch_forecasts(batch_id):
+    """(product, category, forecast) rows of a batch, each product's weeks in order."""
+    with sqlite3.connect(DB_PATH) as conn:
+        return conn.execute(
+            "SELECT product, COALESCE(category, 'Unknown'), forecast FROM forecasts WHERE batch_id = ? ORDER BY id",
+            (batch_id,)
+        ).fetchall()
+
+# ---- Backtests ----
+@metrics.timed("db.save_backtest_run")
+def save_backtest_run(source, params, products, origins, duration_seconds, metrics, conn=None):
+    """
+    Persist one backtest run and its metric rows in a single transaction.
+    metrics: list of tuples (level, key, method, mape, wape, bias, points)
+    Returns the new run id.
+    """
+    with _writing(conn) as conn:
+        cur = conn.execute(
+            "INSERT INTO backtest_runs (source, params, products, origins, duration_seconds) VALUES (?, ?, ?, ?, ?)",
+            (source, params, products, origins, duration_seconds)
+        )
+        run_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO backtest_metrics (run_id, level, key, method, mape, wape, bias, points) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id,) + tuple(m) for m in metrics]
+        )
+    ROWS_WRITTEN.inc(1, table="backtest_runs")
+    ROWS_WRITTEN.inc(len(metrics), table="backtest_metrics")
+    return run_id
+
+def get_backtest_run(run_id, level=None):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute("SELECT * FROM backtest_runs WHERE id = ?", (run_id,))
+        run = c.fetchone()
+        if not run:
+            return None
+        if level:
+            c.execute(
+                "SELECT level, key, method, mape, wape, bias, points FROM backtest_metrics "
+                "WHERE run_id = ? AND level = ? ORDER BY key, method",
+                (run_id, level)
+            )
+        else:
+            c.execute(
+                "SELECT level, key, method, mape, wape, bias, points FROM backtest_metrics "
+                "WHERE run_id = ? ORDER BY level, key, method",
+                (run_id,)
+            )
+        metrics = c.fetchall()
+    return {"run": dict(run), "metrics": [dict(m) for m in metrics]}
+
+# ---- Mail Queue ----
+def enqueue_mail(recipients, subject, body, attachments=None, created_by=None, conn=None):
+    """Queue one message for the mail worker. Returns the delivery id."""
+    with _writing(conn) as conn:
+        cur = conn.execute(
+            "INSERT INTO mail_queue (recipients, subject, body, attachments, created_by) VALUES (?, ?, ?, ?, ?)",
+            (json.dumps(list(recipients)), subject, body, json.dumps(list(attachments or [])), created_by)
+        )
+    ROWS_WRITTEN.inc(1, table="mail_queue")
+    return cur.lastrowid
+
+def claim_mail(limit, lease_seconds, conn=None):
+    """
+    Atomically lease up to `limit` due messages (queued and due, or 'sending'
+    with an expired lease from a worker that died) and count the attempt.
+    One UPDATE ... RETURNING, so two workers never lease the same message.
+    """
+    now = time.time()
+    with _writing(conn) as conn:
+        cur = conn.execute(
+            """
+            UPDATE mail_queue
+            SET status = 'sending', attempts = attempts + 1, locked_until = ?
+            WHERE id IN (
+                SELECT id FROM mail_queue
+                WHERE (status = 'queued' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND locked_until < ?)
+                ORDER BY id LIMIT ?
+            )
+            RETURNING *
+            """,
+            (now + lease_seconds, now, now, limit)
+        )
+        names = [d[0] for d in cur.description]
+        rows = [dict(zip(names, r)) for r in cur.fetchall()]
+    out = []
+    for row in sorted(rows, key=lambda r: r["id"]):
+        row["recipients"] = json.loads(row["recipients"])
+        row["attachments"] = json.loads(row["attachments"] or "[]")
+        out.append(row)
+    return out
+
+def finish_mail(mail_id, status, error=None, next_attempt_at=0, conn=None):
+    """status: 'sent', 'failed', or 'queued' to retry at next_attempt_at."""
+    with _writing(conn) as conn:
+        conn.execute(
+            """
+            UPDATE mail_queue
+            SET status = ?, last_error = ?, next_attempt_at = ?, locked_until = 0,
+                sent_at = CASE WHEN ? = 'sent' THEN CURRENT_TIMESTAMP ELSE sent_at END
+            WHERE id = ?
+            """,
+            (status, error, next_attempt_at, status, mail_id)
+        )
+
+def get_mail(mail_id):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            "SELECT id, recipients, subject, status, attempts, next_attempt_at, last_error, created_by, "
+            "created_at, sent_at FROM mail_queue WHERE id = ?",
+            (mail_id,)
+        ).fetchone()
+    if not row:
+        return None
+    out = dict(row)
+    out["recipients"] = json.loads(out["recipients"])
+    return out
+
+def mail_queue_counts():
+    """Messages per status (for metrics / health)."""
+    with sqlite3.connect(DB_PATH) as conn:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM mail_queue GROUP BY status").fetchall())
+
+# ---- Scheduler ----
+def _schedule_row(row):
+    out = dict(row)
+    out["params"] = json.loads(out["params"] or "{}")
+    out["enabled"] = bool(out["enabled"])
+    return out
+
+def create_schedule(name, cron, job, params, next_run_at, created_by=None, enabled=True, conn=None):
+    with _writing(conn) as conn:
+        cur = conn.execute(
+            "INSERT INTO report_schedules (name, cron, job, params, enabled, next_run_at, created_by) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, cron, job, json.dumps(params or {}), int(enabled), next_run_at, created_by)
+        )
+    return cur.lastrowid
+
+def list_schedules():
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM report_schedules ORDER BY id").fetchall()
+    return [_schedule_row(r) for r in rows]
+
+def get_schedule(schedule_id):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM report_schedules WHERE id = ?", (schedule_id,)).fetchone()
+    return _schedule_row(row) if row else None
+
+def delete_schedule(schedule_id, conn=None):
+    with _writing(conn) as conn:
+        cur = conn.execute("DELETE FROM report_schedules WHERE id = ?", (schedule_id,))
+    return cur.rowcount > 0
+
+def due_schedules(now):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT * FROM report_schedules WHERE enabled = 1 AND next_run_at <= ? ORDER BY next_run_at",
+            (now,)
+        ).fetchall()
+    return [_schedule_row(r) for r in rows]
+
+def mark_schedule_started(schedule_id, next_run_at, conn=None):
+    """Advance next_run_at before the job runs, so a firing is never repeated."""
+    with _writing(conn) as conn:
+        conn.execute(
+            "UPDATE report_schedules SET next_run_at = ?, last_run_at = ?, last_status = 'running' WHERE id = ?",
+            (next_run_at, time.time(), schedule_id)
+        )
+
+def finish_schedule_run(schedule_id, status, detail, duration_seconds, conn=None):
+    with _writing(conn) as conn:
+        conn.execute(
+            "UPDATE report_schedules SET last_status = ?, last_detail = ?, last_duration_seconds = ? WHERE id = ?",
+            (status, detail, duration_seconds, schedule_id)
+        )
+
+def acquire_lease(name, holder, ttl_seconds, conn=None):
+    """
+    Take or renew the named lease. Returns True while `holder` owns it;
+    another holder can only take it over once it has expired.
+    """
+    now = time.time()
+    with _writing(conn) as conn:
+        conn.execute(
+            """
+            INSERT INTO scheduler_leases (name, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+            WHERE scheduler_leases.holder = excluded.holder OR scheduler_leases.expires_at < ?
+            """,
+            (name, holder, now + ttl_seconds, now)
+        )
+        row = conn.execute("SELECT holder FROM scheduler_leases WHERE name = ?", (name,)).fetchone()
+    return bool(row) and row[0] == holder
+
+def release_lease(name, holder, conn=None):
+    with _writing(conn) as conn:
+        conn.execute("DELETE FROM scheduler_leases WHERE name = ? AND holder = ?", (name, holder))
+
+def get_lease(name):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM scheduler_leases WHERE name = ?", (name,)).fetchone()
+    return dict(row) if row else None
+
+def upsert_distribution_list(name, recipients, conn=None):
+    with _writing(conn) as conn:
+        conn.execute(
+            """
+            INSERT INTO distribution_lists (name, recipients) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET recipients = excluded.recipients, updated_at = CURRENT_TIMESTAMP
+            """,
+            (name, json.dumps(list(recipients)))
+        )
+
+def get_distribution_lists():
+    with sqlite3.connect(DB_PATH) as conn:
+        rows = conn.execute("SELECT name, recipients, updated_at FROM distribution_lists ORDER BY name").fetchall()
+    return [{"name": n, "recipients": json.loads(r), "updated_at": u} for n, r, u in rows]
+
+def delete_distribution_list(name, conn=None):
+    with _writing(conn) as conn:
+        cur = conn.execute("DELETE FROM distribution_lists WHERE name = ?", (name,))
+    return cur.rowcount > 0
+
 # ---- Authentication Helpers ----
 def _hash_password(password: str, salt: str) -> str:
     dk = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100_000)
     return dk.hex()
 
-def create_user(email: str, name: str, password: str):
+def hash_new_password(password: str):
+    """(password_hash, salt) for a new password; deliberately slow, so keep it off the DB writer."""
     salt = secrets.token_hex(16)
-    pwd_hash = _hash_password(password, salt)
-    with sqlite3.connect(DB_PATH) as conn:
+    return _hash_password(password, salt), salt
+
+def insert_user(email: str, name: str, password_hash: str, salt: str, role: str = None, conn=None):
+    with _writing(conn) as conn:
         conn.execute(
-            "INSERT INTO users (email, name, password_hash, salt) VALUES (?, ?, ?, ?)",
-            (email, name, pwd_hash, salt)
+            "INSERT INTO users (email, name, password_hash, salt, role) VALUES (?, ?, ?, ?, COALESCE(?, 'analyst'))",
+            (email, name, password_hash, salt, role)
         )
-        conn.commit()
+
+def create_user(email: str, name: str, password: str, role: str = None):
+    pwd_hash, salt = hash_new_password(password)
+    insert_user(email, name, pwd_hash, salt, role)
 
 def find_user_by_email(email: str):
     with sqlite3.connect(DB_PATH) as conn:
@@ -1,6 +1,18 @@
+-- One row per /forecast run; records which model version produced it
+CREATE TABLE IF NOT EXISTS forecast_batches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_version TEXT,
+    horizon INTEGER,
+    products INTEGER DEFAULT 0,
+    created_by TEXT,
+    history_week TEXT,                     -- last week of the history it was forecast from
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Table for forecast results
 CREATE TABLE IF NOT EXISTS forecasts (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER,
     product TEXT NOT NULL,
     category TEXT,
     last_week_sales REAL DEFAULT 0,
@@ -11,6 +23,7 @@ CREATE TABLE IF NOT EXISTS forecasts (
 -- Table for alerts generated from forecasts
 CREATE TABLE IF NOT EXISTS alerts (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER,
     product TEXT NOT NULL,
     category TEXT,
     forecast REAL,
@@ -28,3 +41,131 @@ CREATE TABLE IF NOT EXISTS users (
     role TEXT DEFAULT 'analyst',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+-- Uploaded weekly sales, one row per product and week (latest upload wins)
+CREATE TABLE IF NOT EXISTS sales_history (
+    product TEXT NOT NULL,
+    product_name TEXT,
+    category TEXT,
+    week TEXT NOT NULL,
+    sales_quantity REAL NOT NULL,
+    price REAL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (product, week)
+);
+
+-- Rolling-origin backtests
+CREATE TABLE IF NOT EXISTS backtest_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT,
+    params TEXT,
+    products INTEGER DEFAULT 0,
+    origins INTEGER DEFAULT 0,
+    duration_seconds REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS backtest_metrics (
+    run_id INTEGER NOT NULL,
+    level TEXT NOT NULL,
+    key TEXT NOT NULL,
+    method TEXT NOT NULL,
+    mape REAL,
+    wape REAL,
+    bias REAL,
+    points INTEGER,
+    FOREIGN KEY (run_id) REFERENCES backtest_runs(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_backtest_metrics_run ON backtest_metrics(run_id, level);
+
+-- Outbound e-mail, drained by the worker in utils/mail_queue.py
+CREATE TABLE IF NOT EXISTS mail_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipients TEXT NOT NULL,              -- JSON list
+    subject TEXT NOT NULL,
+    body TEXT,
+    attachments TEXT,                      -- JSON list of file paths
+    status TEXT NOT NULL DEFAULT 'queued', -- queued | sending | sent | failed
+    attempts INTEGER DEFAULT 0,
+    next_attempt_at REAL DEFAULT 0,        -- unix time
+    locked_until REAL DEFAULT 0,           -- lease while a worker is sending
+    last_error TEXT,
+    created_by TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_mail_queue_due ON mail_queue(status, next_attempt_at);
+
+-- Cron-style jobs run by utils/scheduler.py
+CREATE TABLE IF NOT EXISTS report_schedules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    cron TEXT NOT NULL,                    -- minute hour day month weekday (server local time)
+    job TEXT NOT NULL,                     -- forecast_report | report
+    params TEXT,                           -- JSON: horizon, recipients, lists
+    enabled INTEGER DEFAULT 1,
+    next_run_at REAL,                      -- unix time
+    last_run_at REAL,
+    last_status TEXT,
+    last_detail TEXT,
+    last_duration_seconds REAL,
+    created_by TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Single-leader lock: only the holder of a live lease runs schedules
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+
+-- Named recipient lists that schedules fan reports out to
+CREATE TABLE IF NOT EXISTS distribution_lists (
+    name TEXT PRIMARY KEY,
+    recipients TEXT NOT NULL,              -- JSON list
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Dashboard / report summaries, written in the same transaction as each batch
+CREATE TABLE IF NOT EXISTS batch_summary (
+    batch_id INTEGER PRIMARY KEY,
+    products INTEGER DEFAULT 0,
+    horizon INTEGER DEFAULT 0,
+    forecast_total REAL DEFAULT 0,
+    last_week_total REAL DEFAULT 0,
+    avg_growth REAL DEFAULT 0,
+    FOREIGN KEY (batch_id) REFERENCES forecast_batches(id)
+);
+
+CREATE TABLE IF NOT EXISTS batch_category_summary (
+    batch_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    products INTEGER DEFAULT 0,
+    total REAL DEFAULT 0,
+    last_week_total REAL DEFAULT 0,
+    PRIMARY KEY (batch_id, category)
+);
+
+CREATE TABLE IF NOT EXISTS batch_product_summary (
+    batch_id INTEGER NOT NULL,
+    product TEXT NOT NULL,
+    category TEXT,
+    total REAL DEFAULT 0,
+    first_forecast REAL,
+    last_forecast REAL,
+    last_week_sales REAL DEFAULT 0
+);
+
+-- one row per (batch_id, product) by construction; only the top-k lookup needs an index
+CREATE INDEX IF NOT EXISTS idx_batch_product_top ON batch_product_summary(batch_id, total DESC);
+
+-- Change stamps for conditional GETs (ETag / Last-Modified), bumped in the
+-- same transaction as every write to the named table
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL DEFAULT 0
+);
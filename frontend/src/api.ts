@@ -35,6 +35,103 @@ export async function forecast(token: string, file: File, horizon: number) {
   return res.json();
 }
 
+// 🟢 FORECAST, columnar wire format (much smaller for large uploads; the
+// browser negotiates gzip/br itself). Resolves to the same shape as forecast().
+export async function forecastColumnar(token: string, file: File, horizon: number) {
+  const form = new FormData();
+  form.append("file", file);
+  form.append("horizon", String(horizon));
+
+  const res = await fetch(`${API_BASE}/forecast?format=columnar`, {
+    method: "POST",
+    headers: {
+      Authorization: `Bearer ${token}`,
+    },
+    body: form,
+  });
+
+  if (!res.ok) throw new Error(await res.text());
+  const payload = await res.json();
+  const cols = payload.columns;
+  const data = payload.forecast.map((sales: number[], i: number) => ({
+    Product_ID: cols.Product_ID[i],
+    Product_Name: cols.Product_Name[i],
+    Category: cols.Category[i],
+    Price: cols.Price[i],
+    Trend_Symbol: cols.Trend_Symbol[i],
+    Last_Week: cols.Last_Week[i],
+    Last_Week_Sales: cols.Last_Week_Sales[i],
+    Forecasted_Sales: sales,
+    Forecasted_Revenue: sales.map((v) => Math.round(v * cols.Price[i] * 100) / 100),
+    Final_Forecasted_Sales: sales,
+    Forecast_Model: cols.Forecast_Model[i],
+  }));
+  return {
+    products: payload.products,
+    horizon: payload.horizon,
+    model_version: payload.model_version,
+    batch_id: payload.batch_id,
+    data,
+  };
+}
+
+// 🟢 FORECAST, streamed (Server-Sent Events over fetch, since EventSource
+// cannot POST a file). onEvent receives start / products / progress / done as
+// they arrive; resolves with the "done" data.
+export async function forecastStream(
+  token: string,
+  file: File,
+  horizon: number,
+  onEvent: (event: string, data: any) => void
+) {
+  const form = new FormData();
+  form.append("file", file);
+  form.append("horizon", String(horizon));
+
+  const res = await fetch(`${API_BASE}/forecast/stream`, {
+    method: "POST",
+    headers: {
+      Authorization: `Bearer ${token}`,
+      Accept: "text/event-stream",
+    },
+    body: form,
+  });
+
+  const result = await readEvents(res, onEvent);
+  if (!result) throw new Error("Forecast stream ended early");
+  return result;
+}
+
+// Reads a Server-Sent Events response, calling onEvent per event;
+// resolves with the "done" payload (null if the stream ended without one).
+async function readEvents(res: Response, onEvent: (event: string, data: any) => void) {
+  if (!res.ok || !res.body) throw new Error(await res.text());
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  let result: any = null;
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let end;
+    while ((end = buffer.indexOf("\n\n")) >= 0) {
+      const message = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let event = "message";
+      let data = "";
+      for (const line of message.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      const payload = JSON.parse(data);
+      if (event === "error") throw new Error(payload.detail);
+      if (event === "done") result = payload;
+      onEvent(event, payload);
+    }
+  }
+  return result;
+}
+
 // 🟢 DOWNLOAD CSV (Protected route)
 export async function downloadCsv(token: string, file: File, horizon: number) {
   const form = new FormData();
@@ -53,9 +150,44 @@ export async function downloadCsv(token: string, file: File, horizon: number) {
   return res.blob();
 }
 
+// Conditional GET: repeat requests send the last ETag and reuse the cached
+// body on 304, so polling an unchanged endpoint costs no query on the server
+const etagCache = new Map<string, { etag: string; body: any }>();
+
+async function getWithETag(path: string, token: string) {
+  const cached = etagCache.get(path);
+  const headers: Record<string, string> = { Authorization: `Bearer ${token}` };
+  if (cached) headers["If-None-Match"] = cached.etag;
+
+  // no-store: revalidate here, not in the browser cache, so a 304 reaches this code
+  const res = await fetch(`${API_BASE}${path}`, { headers, cache: "no-store" });
+  if (res.status === 304 && cached) return cached.body;
+  if (!res.ok) throw new Error(await res.text());
+  const body = await res.json();
+  const etag = res.headers.get("ETag");
+  if (etag) etagCache.set(path, { etag, body });
+  return body;
+}
+
 // 🟢 ALERTS (Protected route)
 export async function getAlerts(token: string) {
-  const res = await fetch(`${API_BASE}/alerts`, {
+  return getWithETag("/alerts", token);
+}
+
+// 🟢 FORECASTS (Protected route): most recent forecast rows
+export async function getForecasts(token: string, limit = 50) {
+  return getWithETag(`/forecasts?limit=${limit}`, token);
+}
+
+// 🟢 REPORT (Protected route)
+export async function getReport(token: string) {
+  return getWithETag("/report", token);
+}
+
+// 🟢 DASHBOARD SUMMARY (Protected route): overview, category totals and top
+// products of the latest batch, precomputed server-side
+export async function getDashboardSummary(token: string, topK = 5) {
+  const res = await fetch(`${API_BASE}/dashboard/summary?top_k=${topK}`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -65,9 +197,41 @@ export async function getAlerts(token: string) {
   return res.json();
 }
 
-// 🟢 REPORT (Protected route)
-export async function getReport(token: string) {
-  const res = await fetch(`${API_BASE}/report`, {
+// 🟢 CHARTS (Protected route): demand heatmap (rows x weeks, history then
+// forecast from forecast_start) of the latest batch, computed and cached server-side
+export async function getHeatmap(
+  token: string,
+  opts: { by?: "product" | "category"; topK?: number; historyWeeks?: number; order?: "total" | "name" | "cluster" } = {}
+) {
+  const params = new URLSearchParams({
+    by: opts.by ?? "product",
+    top_k: String(opts.topK ?? 50),
+    history_weeks: String(opts.historyWeeks ?? 12),
+    order: opts.order ?? "total",
+  });
+  const res = await fetch(`${API_BASE}/charts/heatmap?${params}`, {
+    headers: {
+      Authorization: `Bearer ${token}`,
+    },
+  });
+
+  if (!res.ok) throw new Error(await res.text());
+  return res.json();
+}
+
+// 🟢 CHARTS (Protected route): history + forecast line of a product, a
+// category or the whole catalog, downsampled to at most `points` points
+export async function getSeries(
+  token: string,
+  opts: { product?: string; category?: string; points?: number; method?: "lttb" | "minmax" } = {}
+) {
+  const params = new URLSearchParams({
+    points: String(opts.points ?? 200),
+    method: opts.method ?? "lttb",
+  });
+  if (opts.product) params.set("product", opts.product);
+  if (opts.category) params.set("category", opts.category);
+  const res = await fetch(`${API_BASE}/charts/series?${params}`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -111,3 +275,25 @@ export async function getInsight(
   if (!res.ok) throw new Error(await res.text());
   return res.json();
 }
+
+// 🟢 STREAMED INSIGHTS: "delta" events carry text appended to
+// data.language / data.field, "field" a finished field; resolves with the insight
+export async function insightStream(
+  token: string,
+  payload: { product_name: string; current_stock: number; forecast_next_week: number; trend: string },
+  onEvent: (event: string, data: any) => void
+) {
+  const res = await fetch(`${API_BASE}/insight/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Authorization: `Bearer ${token}`,
+      Accept: "text/event-stream",
+    },
+    body: JSON.stringify(payload),
+  });
+
+  const result = await readEvents(res, onEvent);
+  if (!result) throw new Error("Insight stream ended early");
+  return result.insight;
+}
@@ -2,7 +2,7 @@ import React, { useState } from "react";
 import { useNavigate } from "react-router-dom";
 import Layout from "../components/Layout";
 import {
-  forecast as apiForecast,
+  forecastStream,
   downloadCsv,
   getAlerts,
   getReport,
@@ -15,6 +15,7 @@ export default function Dashboard() {
   const [file, setFile] = useState<File | null>(null);
   const [horizon, setHorizon] = useState(4);
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState<{ done: number; total: number } | null>(null);
   const [result, setResult] = useState<any | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [alerts, setAlerts] = useState<any[] | null>(null);
@@ -88,9 +89,20 @@ export default function Dashboard() {
     setResult(null);
     setAlerts(null);
     try {
-      const res = await apiForecast(token, file, horizon);
-      setResult(res);
-      setActiveTab("results");
+      // results render shard by shard while the rest of the catalog is forecast
+      await forecastStream(token, file, horizon, (event, data) => {
+        if (event === "start") {
+          setResult({ products: data.products, horizon: data.horizon, model_version: data.model_version, data: [] });
+          setProgress({ done: 0, total: data.products });
+          setActiveTab("results");
+        } else if (event === "products") {
+          setResult((prev: any) => ({ ...prev, data: [...prev.data, ...data.data] }));
+        } else if (event === "progress") {
+          setProgress({ done: data.done, total: data.total });
+        } else if (event === "done") {
+          setResult((prev: any) => ({ ...prev, products: data.products, batch_id: data.batch_id }));
+        }
+      });
       // Fetch alerts generated by backend side-effect
       const alertsRes = await getAlerts(token);
       setAlerts(alertsRes.data || []);
@@ -98,6 +110,7 @@ export default function Dashboard() {
       setError(err.message || "Forecast failed");
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -166,10 +179,10 @@ export default function Dashboard() {
       <div className="card mb-8 p-8">
         <div className="flex flex-col md:flex-row items-end gap-6">
           <label className="flex-1 w-full">
-            <span className="text-sm font-semibold text-gray-400 mb-2 block uppercase tracking-wider pl-1">CSV Data File</span>
+            <span className="text-sm font-semibold text-gray-400 mb-2 block uppercase tracking-wider pl-1">Sales Data File</span>
             <input
               type="file"
-              accept=".csv"
+              accept=".csv,.csv.gz,.csv.zst,.parquet,.arrow,.feather"
               className="w-full file:mr-4 file:py-3 file:px-6 file:rounded-xl file:border-0 file:text-sm file:font-bold file:bg-emerald-600 file:text-white hover:file:bg-emerald-500 hover:file:translate-y-[-1px] transition-all cursor-pointer text-gray-300 bg-black/20 rounded-xl border border-white/5 p-2"
               onChange={(e) => setFile(e.target.value ? e.target.files?.[0] || null : null)}
             />
@@ -222,7 +235,11 @@ export default function Dashboard() {
         <div className="card text-center py-12">
           <div className="animate-spin text-4xl mb-4">🌀</div>
           <div className="text-xl font-semibold text-emerald-400">AI is analyzing your data...</div>
-          <p className="text-gray-400 mt-2">Training LSTM models and generating predictions.</p>
+          <p className="text-gray-400 mt-2">
+            {progress && progress.total
+              ? `Forecast ${progress.done.toLocaleString()} of ${progress.total.toLocaleString()} products...`
+              : "Training LSTM models and generating predictions."}
+          </p>
         </div>
       )}
 
@@ -799,7 +816,7 @@ export default function Dashboard() {
                           }
                         );
                         if (res.ok) {
-                          alert(`✅ Report sent successfully to ${email}`);
+                          alert(`✅ Report queued for delivery to ${email}`);
                           setEmail("");
                         } else {
                           const data = await res.json();
@@ -1,8 +1,31 @@
+import os
 import json
 import re
-from genai.schemas import InsightInput, InsightOutput
-from genai.prompt_templates import SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
-from genai.llm_client import call_llm
+import time
+import logging
+from genai.schemas import InsightInput, InsightOutput, LanguageInsight
+from genai.prompt_templates import SYSTEM_PROMPT, USER_PROMPT_TEMPLATE, COMPACT_KEYS
+from genai.llm_client import call_llm, estimate_tokens
+
+logger = logging.getLogger("niyojan.genai")
+
+# Output budget from the schema: every LanguageInsight field is one or two
+# sentences; Devanagari costs about three times the tokens of English.
+FIELD_TOKENS = {"english": 80, "hindi": 240}
+JSON_OVERHEAD_TOKENS = 40
+# flash-latest models think before answering, and thinking counts against max_output_tokens
+THINKING_TOKENS = int(os.getenv("NIYOJAN_LLM_THINKING_TOKENS", "1024"))
+
+
+def output_budget() -> int:
+    override = os.getenv("NIYOJAN_INSIGHT_MAX_OUTPUT_TOKENS")
+    if override:
+        return int(override)
+    answer = sum(FIELD_TOKENS[lang] for lang in InsightOutput.model_fields) * len(LanguageInsight.model_fields)
+    return int((answer + JSON_OVERHEAD_TOKENS) * 1.5) + THINKING_TOKENS
+
+
+MAX_OUTPUT_TOKENS = output_budget()
 
 
 def extract_json(text: str) -> dict:
@@ -12,7 +35,7 @@ def extract_json(text: str) -> dict:
     text = text.strip()
     start = text.find('{')
     end = text.rfind('}')
-    
+
     if start != -1 and end != -1 and end > start:
         json_str = text[start : end + 1]
         try:
@@ -20,18 +43,130 @@ def extract_json(text: str) -> dict:
         except json.JSONDecodeError as e:
             # Try to fix common issues if needed, or just fail
             raise ValueError(f"JSON Decode Error: {e} in {json_str[:50]}...")
-            
+
     raise ValueError(f"No JSON object found in LLM output. Raw: {text[:100]}...")
 
 
-def generate_insights(insight_input: InsightInput) -> InsightOutput:
-    input_json = insight_input.model_dump_json(indent=2)
+def encode_input(insight_input: InsightInput) -> str:
+    """
+    One flat, minified JSON line with the short keys SYSTEM_PROMPT explains;
+    about half the tokens of model_dump_json(indent=2).
+    """
+    flat = {**insight_input.model_dump(exclude={"forecast_summary", "inventory_status"}),
+            **insight_input.forecast_summary.model_dump(),
+            **insight_input.inventory_status.model_dump()}
+    compact = {short: round(flat[name], 1) if isinstance(flat[name], float) else flat[name]
+               for name, short in COMPACT_KEYS.items()}
+    return json.dumps(compact, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_prompt(insight_input: InsightInput) -> str:
+    user_prompt = USER_PROMPT_TEMPLATE.format(data=encode_input(insight_input))
+    logger.info("insight prompt for %s: ~%d tokens in (estimate), %d max out",
+                insight_input.product_name, estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(user_prompt),
+                MAX_OUTPUT_TOKENS)
+    return user_prompt
+
+
+class InsightStream:
+    """
+    Incremental reader for InsightOutput JSON arriving in chunks. feed()
+    returns the events it can already tell about:
+
+    - ("delta", language, field, text): text appended to a field
+    - ("field", language, field, text): a field is complete and non-empty
+
+    Anything outside english/hindi × LanguageInsight fields is ignored here
+    and left to result(), which validates the whole answer.
+    """
 
-    user_prompt = USER_PROMPT_TEMPLATE.format(data=input_json)
+    FIELDS = {(lang, field) for lang in InsightOutput.model_fields for field in LanguageInsight.model_fields}
+
+    def __init__(self):
+        self.chunks = []
+        self.fields = {}
+        self._stack = []        # key of each open object ("" for the root)
+        self._key = None        # last key read in the innermost object
+        self._expect_key = False
+        self._string = None     # raw characters of the open string, None outside strings
+        self._escape = False
+        self._sent = 0          # decoded characters of the open string already sent as delta
+
+    def _open_field(self):
+        if self._string is None or self._expect_key or len(self._stack) != 2:
+            return None
+        path = (self._stack[1], self._key)
+        return path if path in self.FIELDS else None
+
+    def feed(self, chunk: str):
+        self.chunks.append(chunk)
+        events = []
+        for ch in chunk:
+            if self._string is not None:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    events.extend(self._close_string())
+                    continue
+                self._string.append(ch)
+            elif ch == "{":
+                self._stack.append(self._key or "")
+                self._key, self._expect_key = None, True
+            elif not self._stack:
+                continue            # before the root object, or after it closed
+            elif ch == "}":
+                self._stack.pop()
+                self._key, self._expect_key = None, False
+            elif ch == '"':
+                self._string, self._sent = [], 0
+            elif ch == ":":
+                self._expect_key = False
+            elif ch == ",":
+                self._expect_key = True
+
+        path = self._open_field()
+        if path:
+            text = self._decode("".join(self._string[:-1] if self._escape else self._string))
+            if text is not None and len(text) > self._sent:
+                events.append(("delta", *path, text[self._sent:]))
+                self._sent = len(text)
+        return events
+
+    def _close_string(self):
+        path = self._open_field()
+        value = self._decode("".join(self._string)) or ""
+        self._string = None
+        if self._expect_key:
+            self._key = value
+            return []
+        if not path:
+            return []
+        events = [("delta", *path, value[self._sent:])] if len(value) > self._sent else []
+        if value.strip():
+            self.fields[path] = value
+            events.append(("field", *path, value))
+        return events
+
+    @staticmethod
+    def _decode(raw):
+        try:
+            return json.loads('"' + raw + '"')
+        except json.JSONDecodeError:
+            return None             # cut inside a \\u escape: wait for the next chunk
+
+    def result(self) -> InsightOutput:
+        return InsightOutput(**extract_json("".join(self.chunks)))
+
+
+def generate_insights(insight_input: InsightInput) -> InsightOutput:
+    user_prompt = build_prompt(insight_input)
 
     raw_response = call_llm(
         system_prompt=SYSTEM_PROMPT,
-        user_prompt=user_prompt
+        user_prompt=user_prompt,
+        max_output_tokens=MAX_OUTPUT_TOKENS
     )
 
     parsed_json = extract_json(raw_response)
@@ -42,16 +177,42 @@ def generate_insights(insight_input: InsightInput) -> InsightOutput:
 
 async def generate_insights_async(insight_input: InsightInput) -> InsightOutput:
     from genai.llm_client import call_llm_async
-    
-    input_json = insight_input.model_dump_json(indent=2)
-    user_prompt = USER_PROMPT_TEMPLATE.format(data=input_json)
+
+    user_prompt = build_prompt(insight_input)
 
     raw_response = await call_llm_async(
         system_prompt=SYSTEM_PROMPT,
-        user_prompt=user_prompt
+        user_prompt=user_prompt,
+        max_output_tokens=MAX_OUTPUT_TOKENS
     )
 
     parsed_json = extract_json(raw_response)
     validated_output = InsightOutput(**parsed_json)
 
     return validated_output
+
+
+async def stream_insights(insight_input: InsightInput):
+    """
+    generate_insights_async as (event, data) pairs: start, then delta/field
+    as Gemini's chunks arrive, then done with the validated InsightOutput.
+    """
+    from genai.llm_client import call_llm_stream
+
+    started = time.perf_counter()
+    user_prompt = build_prompt(insight_input)
+    yield "start", {"product": insight_input.product_name,
+                    "prompt_tokens": estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(user_prompt),
+                    "max_output_tokens": MAX_OUTPUT_TOKENS}
+
+    stream = InsightStream()
+    first = None
+    async for chunk in call_llm_stream(SYSTEM_PROMPT, user_prompt, MAX_OUTPUT_TOKENS):
+        if first is None:
+            first = time.perf_counter() - started
+        for event, language, field, text in stream.feed(chunk):
+            yield event, {"language": language, "field": field, "text": text}
+
+    insight = stream.result()
+    yield "done", {"insight": insight.model_dump(), "first_chunk": round(first, 3),
+                   "elapsed": round(time.perf_counter() - started, 3)}
@@ -1,7 +1,12 @@
 import os
+import time
+import math
+import logging
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from utils import metrics
+
 # Load environment variables
 load_dotenv()
 
@@ -16,8 +21,49 @@ genai.configure(api_key=GEMINI_API_KEY)
 # Use a stable text model
 MODEL_NAME = "gemini-flash-latest"  # stable & fast (1.5-flash equivalent)
 
+LLM_CALLS = metrics.counter("niyojan_llm_calls_total", "Gemini calls by mode and outcome", ("mode", "status"))
+LLM_SECONDS = metrics.histogram("niyojan_llm_call_seconds", "Gemini call latency", ("mode",))
+LLM_CHARS = metrics.counter("niyojan_llm_chars_total", "Characters sent to / received from Gemini", ("direction",))
+LLM_TOKENS = metrics.counter("niyojan_llm_tokens_total", "Tokens billed by Gemini (usage metadata)", ("direction",))
+
+logger = logging.getLogger("niyojan.llm")
+
+DEFAULT_MAX_OUTPUT_TOKENS = 8000
 
-def call_llm(system_prompt: str, user_prompt: str) -> str:
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer round trip: ~4 bytes of UTF-8 per
+    token, so Devanagari (3 bytes a character) is not undercounted.
+    """
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+def _generation_config(max_output_tokens):
+    return {
+        "temperature": 0.2,     # low = deterministic
+        "top_p": 0.9,
+        "max_output_tokens": max_output_tokens,
+        # JSON mode: no prose or code fences around the object
+        "response_mime_type": "application/json",
+    }
+
+
+def _record_call(mode, started, prompt_chars, response_chars=0, usage=None):
+    LLM_SECONDS.observe(time.perf_counter() - started, mode=mode)
+    LLM_CALLS.inc(mode=mode, status="ok" if response_chars else "error")
+    LLM_CHARS.inc(prompt_chars, direction="prompt")
+    if response_chars:
+        LLM_CHARS.inc(response_chars, direction="response")
+    if usage is not None:
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        LLM_TOKENS.inc(prompt_tokens, direction="prompt")
+        LLM_TOKENS.inc(output_tokens, direction="response")
+        logger.info("gemini %s call: %d prompt tokens, %d output tokens", mode, prompt_tokens, output_tokens)
+
+
+def call_llm(system_prompt: str, user_prompt: str, max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS) -> str:
     """
     Calls Gemini and returns raw text output.
     No parsing, no validation here.
@@ -28,22 +74,25 @@ def call_llm(system_prompt: str, user_prompt: str) -> str:
         system_instruction=system_prompt
     )
 
-    response = model.generate_content(
-        user_prompt,
-        generation_config={
-            "temperature": 0.2,     # low = deterministic
-            "top_p": 0.9,
-            "max_output_tokens": 8000
-        }
-    )
-
-    if not response.text:
+    started, text, usage = time.perf_counter(), None, None
+    try:
+        response = model.generate_content(
+            user_prompt,
+            generation_config=_generation_config(max_output_tokens)
+        )
+        text = response.text
+        usage = getattr(response, "usage_metadata", None)
+    finally:
+        _record_call("sync", started, len(system_prompt) + len(user_prompt), len(text or ""), usage)
+
+    if not text:
         raise RuntimeError("Empty response from Gemini")
 
-    return response.text
+    return text
 
 
-async def call_llm_async(system_prompt: str, user_prompt: str) -> str:
+async def call_llm_async(system_prompt: str, user_prompt: str,
+                         max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS) -> str:
     """
     Async version of call_llm
     """
@@ -52,16 +101,52 @@ async def call_llm_async(system_prompt: str, user_prompt: str) -> str:
         system_instruction=system_prompt
     )
 
-    response = await model.generate_content_async(
-        user_prompt,
-        generation_config={
-            "temperature": 0.2,
-            "top_p": 0.9,
-            "max_output_tokens": 8000
-        }
+    started, text, usage = time.perf_counter(), None, None
+    try:
+        response = await model.generate_content_async(
+            user_prompt,
+            generation_config=_generation_config(max_output_tokens)
+        )
+        text = response.text
+        usage = getattr(response, "usage_metadata", None)
+    finally:
+        _record_call("async", started, len(system_prompt) + len(user_prompt), len(text or ""), usage)
+
+    if not text:
+        raise RuntimeError("Empty response from Gemini")
+
+    return text
+
+
+async def call_llm_stream(system_prompt: str, user_prompt: str,
+                          max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS):
+    """
+    Streaming version of call_llm_async: yields the text chunks as Gemini
+    produces them.
+    """
+    model = genai.GenerativeModel(
+        model_name=MODEL_NAME,
+        system_instruction=system_prompt
     )
 
-    if not response.text:
+    started, chars, response = time.perf_counter(), 0, None
+    try:
+        response = await model.generate_content_async(
+            user_prompt,
+            generation_config=_generation_config(max_output_tokens),
+            stream=True
+        )
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:  # chunk without text parts (e.g. the closing finish_reason)
+                continue
+            if text:
+                chars += len(text)
+                yield text
+    finally:
+        _record_call("stream", started, len(system_prompt) + len(user_prompt), chars,
+                     getattr(response, "usage_metadata", None))
+
+    if not chars:
         raise RuntimeError("Empty response from Gemini")
-
-    return response.text
@@ -0,0 +1,98 @@
+"""
+Export reduced-precision variants of a trained model version.
+
+    python lstm/export_variants.py                       # legacy lstm/ artifacts
+    python lstm/export_variants.py --version 20260101-120000
+    python lstm/export_variants.py --skip-tflite         # NumPy exports only
+
+Writes <version>/variants/<model|direct_model>.<variant>.<ext>:
+    numpy_fp32.npz / numpy_fp16.npz / numpy_int8.npz
+                      weights for utils/model_backends.NumpyLSTM; int8 kernels
+                      use per-column symmetric scales, biases stay float32;
+                      each gets a .weights twin that workers map read-only
+    tflite_fp16.tflite  float16 weight quantization
+    tflite_int8.tflite  dynamic-range quantization (int8 weights, float
+                        activations; no calibration data needed)
+and refreshes manifest.json so the registry can serve them
+(NIYOJAN_MODEL_VARIANT=<variant>). Accuracy / memory / latency of each
+variant: python -m benchmarks.bench_variants
+"""
+import os
+import sys
+import json
+import argparse
+
+LSTM_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(LSTM_DIR)
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from utils.model_backends import extract_weights, save_numpy_weights  # noqa: E402
+from utils.shared_weights import pack_npz  # noqa: E402
+from utils.model_registry import (  # noqa: E402
+    LEGACY_DIR, LEGACY_VERSION, REGISTRY_DIR, VARIANTS_DIR, build_manifest, write_manifest,
+)
+
+MODEL_DIRS = {"model": "global_lstm_model", "direct_model": "global_lstm_direct_model"}
+
+
+def export_tflite(model, path, precision):
+    import tensorflow as tf
+
+    # concrete function with a dynamic batch dimension so the interpreter can be resized per request
+    fn = tf.function(lambda x: model(x, training=False))
+    concrete = fn.get_concrete_function(tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32))
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if precision == "fp16":
+        converter.target_spec.supported_types = [tf.float16]
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_version(directory, skip_tflite=False):
+    from tensorflow.keras.models import load_model
+
+    out_dir = os.path.join(directory, VARIANTS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for key, model_dir in MODEL_DIRS.items():
+        if not os.path.isdir(os.path.join(directory, model_dir)):
+            continue
+        model = load_model(os.path.join(directory, model_dir), compile=False)
+        weights, layout = extract_weights(model)
+        for precision in ("fp32", "fp16", "int8"):
+            path = os.path.join(out_dir, f"{key}.numpy_{precision}.npz")
+            save_numpy_weights(path, weights, layout, precision)
+            mapped = pack_npz(path)
+            written[path] = os.path.getsize(path)
+            written[mapped] = os.path.getsize(mapped)
+        if not skip_tflite:
+            for precision in ("fp16", "int8"):
+                path = os.path.join(out_dir, f"{key}.tflite_{precision}.tflite")
+                export_tflite(model, path, precision)
+                written[path] = os.path.getsize(path)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export fp16 / int8 variants of a model version")
+    parser.add_argument("--version", default=LEGACY_VERSION, help="registry version (default: legacy lstm/)")
+    parser.add_argument("--model-dir", default=REGISTRY_DIR)
+    parser.add_argument("--skip-tflite", action="store_true")
+    args = parser.parse_args(argv)
+
+    directory = LEGACY_DIR if args.version == LEGACY_VERSION else os.path.join(args.model_dir, args.version)
+    written = export_version(directory, args.skip_tflite)
+    for path, size in written.items():
+        print(f"{os.path.relpath(path, ROOT_DIR)}: {size / 1024:.1f} KiB")
+
+    if args.version == LEGACY_VERSION:
+        manifest = build_manifest(directory, LEGACY_VERSION)  # legacy manifests are built on load
+    else:
+        manifest = write_manifest(directory, args.version)
+    print(json.dumps(manifest["variants"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Training pipeline for the global LSTM demand model.
+
+Replaces the notebook workflow (lstm/global_lstm_demand_forecasting.ipynb)
+with a reproducible, vectorized script:
+
+    python lstm/train.py --data data/indian_grocery_store_weekly_sales.csv
+    python lstm/train.py --timing-only        # windowing benchmark vs the notebook
+    python lstm/train.py --horizon 12 --reuse-preprocessors lstm   # direct 12-week model
+    python lstm/train.py --horizon 12 --into <version>   # add a direct model to an existing version
+
+Artifacts are written to <model-dir>/<version>/:
+    global_lstm_model/   TensorFlow SavedModel (global_lstm_direct_model/ with --horizon > 1)
+    scaler.pkl           MinMaxScaler on sales
+    label_encoder.pkl    LabelEncoder on product_id
+    metadata.json        data fingerprint, hyper-parameters and metrics
+    manifest.json        registry manifest (see utils/model_registry.py)
+
+With --into, only global_lstm_direct_model/ and direct_metadata.json are
+added to that version (trained on its scaler / encoder) and its manifest is
+rewritten.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+
+LSTM_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(LSTM_DIR)
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+DEFAULT_DATA = os.path.join(ROOT_DIR, "data", "indian_grocery_store_weekly_sales.csv")
+DEFAULT_MODEL_DIR = os.path.join(LSTM_DIR, "models")
+
+
+# -------------------------
+# Data preparation
+# -------------------------
+def load_dataset(path):
+    """Read a sales CSV and clean it the same way the notebook does."""
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
+    # the bundled files mix ISO (2020-01-06) and day-first (03-03-2024) dates
+    week = pd.to_datetime(df['week'], format='ISO8601', errors='coerce')
+    day_first = week.isna()
+    if day_first.any():
+        week[day_first] = pd.to_datetime(df.loc[day_first, 'week'], dayfirst=True, errors='coerce')
+    df['week'] = week
+    df = df.dropna(subset=['week'])
+    df = df.rename(columns={'sales_quantity': 'sales'})
+    df['sales'] = df['sales'].fillna(0).astype(float)
+    return df
+
+
+def fit_preprocessors(df):
+    """Fit encoder and scaler; adds product_encoded / sales_scaled columns."""
+    label_encoder = LabelEncoder()
+    df['product_encoded'] = label_encoder.fit_transform(df['product_id'])
+    df = df.sort_values(['product_id', 'week']).reset_index(drop=True)
+
+    scaler = MinMaxScaler()
+    df['sales_scaled'] = scaler.fit_transform(df[['sales']]).flatten()
+    return df, label_encoder, scaler
+
+
+def load_preprocessors(df, directory):
+    """
+    Reuse an existing scaler / label encoder (e.g. the served global model's)
+    so a direct model trained later shares its scaling.
+    """
+    with open(os.path.join(directory, "scaler.pkl"), "rb") as f:
+        scaler = pickle.load(f)
+    with open(os.path.join(directory, "label_encoder.pkl"), "rb") as f:
+        label_encoder = pickle.load(f)
+    df = df[df['product_id'].isin(label_encoder.classes_)].copy()
+    df['product_encoded'] = label_encoder.transform(df['product_id'])
+    df = df.sort_values(['product_id', 'week']).reset_index(drop=True)
+    df['sales_scaled'] = scaler.transform(df[['sales']]).flatten()
+    return df, label_encoder, scaler
+
+
+def create_sequences(df, sequence_length, horizon=1):
+    """
+    Vectorized replacement for the notebook's create_sequences.
+    One sliding_window_view runs over the product-sorted feature array and
+    windows whose span (inputs + targets) crosses a product boundary are
+    masked out, so the output matches the per-product loop row for row.
+    With horizon > 1 the targets are the next `horizon` weeks, shape (m, horizon),
+    for training a direct multi-output model.
+    """
+    df = df.sort_values(['product_id', 'week'], kind='mergesort')
+    features = df[['sales_scaled', 'product_encoded']].to_numpy(dtype=np.float64)
+    codes = pd.factorize(df['product_id'], sort=True)[0]
+    if len(features) < sequence_length + horizon:
+        return np.zeros((0, sequence_length, 2)), np.zeros((0,) if horizon == 1 else (0, horizon))
+
+    # windows[i] = features[i : i + sequence_length], targets = sales[i + sequence_length : + horizon]
+    windows = sliding_window_view(features[:len(features) - horizon], sequence_length, axis=0)  # (N, 2, seq)
+    targets = sliding_window_view(features[sequence_length:, 0], horizon)
+    same_product = codes[:len(codes) - sequence_length - horizon + 1] == codes[sequence_length + horizon - 1:]
+    X = np.ascontiguousarray(windows[same_product].transpose(0, 2, 1))
+    y = targets[same_product]
+    return X, (y[:, 0] if horizon == 1 else np.ascontiguousarray(y))
+
+
+def create_sequences_notebook(df, sequence_length):
+    """The original notebook implementation, kept only for the timing report."""
+    sequences = []
+    targets = []
+    for product_id in df['product_id'].unique():
+        product_data = df[df['product_id'] == product_id].sort_values('week')
+        if len(product_data) < sequence_length + 1:
+            continue
+        for i in range(len(product_data) - sequence_length):
+            seq = []
+            for j in range(i, i + sequence_length):
+                seq.append([product_data.iloc[j]['sales_scaled'],
+                            product_data.iloc[j]['product_encoded']])
+            sequences.append(seq)
+            targets.append(product_data.iloc[i + sequence_length]['sales_scaled'])
+    return np.array(sequences), np.array(targets)
+
+
+def timing_report(df, sequence_length, repeats=3):
+    """Time notebook vs vectorized windowing on the same frame and check they agree."""
+    started = time.perf_counter()
+    X_nb, y_nb = create_sequences_notebook(df, sequence_length)
+    notebook_s = time.perf_counter() - started
+
+    vectorized = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        X, y = create_sequences(df, sequence_length)
+        vectorized.append(time.perf_counter() - started)
+    vectorized_s = min(vectorized)
+
+    return {
+        "rows": int(len(df)),
+        "products": int(df['product_id'].nunique()),
+        "sequence_length": sequence_length,
+        "samples": int(len(X)),
+        "notebook_seconds": round(notebook_s, 4),
+        "vectorized_seconds": round(vectorized_s, 6),
+        "speedup": round(notebook_s / vectorized_s, 1) if vectorized_s > 0 else None,
+        "identical": bool(X.shape == X_nb.shape and np.allclose(X, X_nb) and np.allclose(y, y_nb)),
+    }
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# -------------------------
+# Model
+# -------------------------
+def build_lstm_model(input_shape, learning_rate=0.001, outputs=1):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+    from tensorflow.keras.optimizers import Adam
+
+    model = Sequential([
+        LSTM(64, return_sequences=False, input_shape=input_shape),
+        Dropout(0.2),
+        Dense(32, activation='relu'),
+        Dense(outputs)
+    ])
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse', metrics=['mae'])
+    return model
+
+
+def make_datasets(X, y, batch_size, val_split, seed):
+    """
+    tf.data pipelines with prefetching. Like Keras' validation_split, the
+    last `val_split` share of samples is held out before shuffling.
+    """
+    import tensorflow as tf
+
+    n_val = int(len(X) * val_split)
+    n_train = len(X) - n_val
+    train = (tf.data.Dataset.from_tensor_slices((X[:n_train].astype(np.float32), y[:n_train].astype(np.float32)))
+             .shuffle(min(n_train, 10_000), seed=seed, reshuffle_each_iteration=True)
+             .batch(batch_size)
+             .prefetch(tf.data.AUTOTUNE))
+    val = None
+    if n_val:
+        val = (tf.data.Dataset.from_tensor_slices((X[n_train:].astype(np.float32), y[n_train:].astype(np.float32)))
+               .batch(batch_size)
+               .prefetch(tf.data.AUTOTUNE))
+    return train, val
+
+
+def output_dir(args):
+    """
+    Where train() saves: (directory, version, model name). A new version
+    directory unless --into names an existing one to add the direct model to.
+    """
+    model_name = "global_lstm_model" if args.horizon == 1 else "global_lstm_direct_model"
+    if args.into:
+        if args.horizon == 1:
+            raise ValueError("--into adds a direct model: use --horizon > 1")
+        directory = os.path.join(args.model_dir, args.into)
+        if not os.path.isdir(os.path.join(directory, "global_lstm_model")):
+            raise FileNotFoundError(f"No model version with a global_lstm_model/ at {directory}")
+        if os.path.exists(os.path.join(directory, model_name)):
+            raise FileExistsError(f"{directory} already has a {model_name}/")
+        return directory, args.into, model_name
+
+    version = args.version or datetime.now().strftime("%Y%m%d_%H%M%S")
+    directory = os.path.join(args.model_dir, version)
+    if os.path.exists(directory):
+        raise FileExistsError(f"Model version already exists: {directory}")
+    return directory, version, model_name
+
+
+def train(args):
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    tf.keras.utils.set_random_seed(args.seed)
+    if args.deterministic:
+        tf.config.experimental.enable_op_determinism()
+
+    # fail before training, not after
+    out_dir, version, model_name = output_dir(args)
+    if args.into:
+        # the direct model is served with the version's scaler and encoder
+        args.reuse_preprocessors = args.reuse_preprocessors or out_dir
+
+    df = load_dataset(args.data)
+    if args.reuse_preprocessors:
+        df, label_encoder, scaler = load_preprocessors(df, args.reuse_preprocessors)
+    else:
+        df, label_encoder, scaler = fit_preprocessors(df)
+
+    started = time.perf_counter()
+    X, y = create_sequences(df, args.sequence_length, args.horizon)
+    windowing_s = time.perf_counter() - started
+    print(f"Created {len(X)} sequences of length {args.sequence_length} in {windowing_s:.3f}s")
+
+    train_ds, val_ds = make_datasets(X, y, args.batch_size, args.val_split, args.seed)
+    model = build_lstm_model((X.shape[1], X.shape[2]), args.learning_rate, outputs=args.horizon)
+
+    callbacks = []
+    if val_ds is not None:
+        callbacks.append(EarlyStopping(monitor='val_loss', patience=args.patience, restore_best_weights=True))
+
+    started = time.perf_counter()
+    history = model.fit(train_ds, validation_data=val_ds, epochs=args.epochs, callbacks=callbacks, verbose=args.verbose)
+    training_s = time.perf_counter() - started
+
+    os.makedirs(out_dir, exist_ok=bool(args.into))
+    model.save(os.path.join(out_dir, model_name), save_format="tf")
+    if not args.into:
+        with open(os.path.join(out_dir, "scaler.pkl"), "wb") as f:
+            pickle.dump(scaler, f)
+        with open(os.path.join(out_dir, "label_encoder.pkl"), "wb") as f:
+            pickle.dump(label_encoder, f)
+
+    metadata = {
+        "version": version,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "data": {"path": os.path.relpath(args.data, ROOT_DIR), "sha256": file_sha256(args.data),
+                 "rows": int(len(df)), "products": int(len(label_encoder.classes_))},
+        "model": model_name,
+        "input_shape": [None, int(X.shape[1]), int(X.shape[2])],
+        "horizon": args.horizon,
+        "features": ["sales_scaled", "product_encoded"],
+        "params": {"sequence_length": args.sequence_length, "horizon": args.horizon, "epochs": args.epochs, "batch_size": args.batch_size,
+                   "val_split": args.val_split, "patience": args.patience, "learning_rate": args.learning_rate,
+                   "seed": args.seed, "deterministic": args.deterministic},
+        "metrics": {k: float(v[-1]) for k, v in history.history.items()},
+        "epochs_run": len(history.history.get("loss", [])),
+        "timing": {"windowing_seconds": round(windowing_s, 4), "training_seconds": round(training_s, 2)},
+        "tensorflow": tf.__version__,
+    }
+    if args.timing_report:
+        metadata["timing"]["notebook_comparison"] = timing_report(df, args.sequence_length)
+
+    # metadata.json stays the one-step model's when the direct model joins a version
+    metadata_name = "direct_metadata.json" if args.into else "metadata.json"
+    with open(os.path.join(out_dir, metadata_name), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    # manifest (fingerprint, artifacts, input shape) makes the directory a registry version
+    from utils.model_registry import write_manifest
+    write_manifest(out_dir, version, metadata["input_shape"])
+
+    print(f"Artifacts written to {out_dir}")
+    print(json.dumps(metadata["metrics"], indent=2))
+    return out_dir
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the global LSTM demand model")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="training CSV")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="where versioned artifacts are written")
+    parser.add_argument("--version", default=None, help="artifact version (default: timestamp)")
+    parser.add_argument("--into", default=None, metavar="VERSION",
+                        help="add the direct model (--horizon > 1) to this existing version instead")
+    parser.add_argument("--sequence-length", type=int, default=6)
+    parser.add_argument("--horizon", type=int, default=1,
+                        help="weeks predicted per forward pass; > 1 trains a direct multi-output model")
+    parser.add_argument("--reuse-preprocessors", default=None,
+                        help="directory with scaler.pkl / label_encoder.pkl to reuse instead of fitting")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--val-split", type=float, default=0.2)
+    parser.add_argument("--patience", type=int, default=10)
+    parser.add_argument("--learning-rate", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--deterministic", action="store_true", help="enable TF op determinism (slower)")
+    parser.add_argument("--timing-report", action="store_true", help="also time the notebook windowing")
+    parser.add_argument("--timing-only", action="store_true", help="only run the windowing timing report")
+    parser.add_argument("--verbose", type=int, default=2)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.timing_only:
+        frame, _, _ = fit_preprocessors(load_dataset(args.data))
+        print(json.dumps(timing_report(frame, args.sequence_length), indent=2))
+        sys.exit(0)
+    train(args)
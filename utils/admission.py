@@ -0,0 +1,210 @@
+"""
+Admission control for the expensive endpoints, as pure ASGI middleware.
+
+Heavy routes belong to a pool; everything else (/health, /alerts,
+/auth/login, dashboards, ...) is never queued or limited, so it keeps its
+latency when uploads pile up. Per pool:
+
+- concurrency:  requests running at once in this worker
+- queue / wait: requests allowed to wait for a slot, and for how long
+- per_user:     requests one user may have queued or running
+- rate / burst: token bucket per user (JWT `sub`, client address when
+                anonymous), in requests per second
+
+A request that cannot be admitted gets 429 with Retry-After, before its
+upload is read. Pools are configured with NIYOJAN_ADMIT_<POOL> specs such as
+"concurrency=2,per_user=1,queue=8,wait=30,rate=0.1,burst=3";
+NIYOJAN_ADMISSION=0 turns the layer off.
+"""
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+from collections import deque, defaultdict
+
+from utils import metrics
+
+logger = logging.getLogger("niyojan.admission")
+
+ADMISSION_ENABLED = os.getenv("NIYOJAN_ADMISSION", "1") == "1"
+MAX_TRACKED_USERS = 10_000
+
+DEFAULT_POOLS = {
+    "forecast": "concurrency=2,per_user=1,queue=8,wait=30,rate=0.1,burst=3",
+    "insight": "concurrency=8,per_user=2,queue=32,wait=10,rate=0.5,burst=5",
+    "report": "concurrency=2,per_user=1,queue=8,wait=30,rate=0.2,burst=4",
+}
+
+# (method, path) -> pool
+ROUTES = {
+    ("POST", "/forecast"): "forecast",
+    ("POST", "/forecast/stream"): "forecast",
+    ("POST", "/download"): "forecast",
+    ("POST", "/backtest"): "forecast",
+    ("POST", "/insight"): "insight",
+    ("POST", "/insight/stream"): "insight",
+    ("GET", "/report/view"): "report",
+    ("GET", "/report/download"): "report",
+    ("POST", "/send-report"): "report",
+}
+
+IN_FLIGHT = metrics.gauge("niyojan_admission_in_flight", "Admitted requests running per pool", ("pool",))
+QUEUE_DEPTH = metrics.gauge("niyojan_admission_queue_depth", "Requests waiting for a slot per pool", ("pool",))
+WAIT_SECONDS = metrics.histogram("niyojan_admission_wait_seconds", "Time admitted requests waited for a slot", ("pool",))
+DECISIONS = metrics.counter("niyojan_admission_total", "Admission decisions by pool and result", ("pool", "result"))
+
+
+def parse_spec(spec, base=None):
+    """'concurrency=2,rate=0.1' -> dict of floats, on top of `base`."""
+    out = dict(base or {})
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        key, _, value = part.partition("=")
+        out[key.strip()] = float(value)
+    return out
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Pool:
+    def __init__(self, name, concurrency, per_user, queue, wait, rate, burst):
+        self.name = name
+        self.concurrency = int(concurrency)
+        self.per_user = int(per_user)
+        self.queue = int(queue)
+        self.wait = wait
+        self.rate = rate
+        self.burst = burst
+        self.active = 0
+        self.waiters = deque()
+        self.user_requests = defaultdict(int)
+        self.buckets = {}                  # user -> (tokens, updated)
+        self.avg_seconds = 1.0             # EWMA of admitted request durations
+
+    @classmethod
+    def from_env(cls, name):
+        spec = parse_spec(DEFAULT_POOLS[name])
+        return cls(name, **parse_spec(os.getenv(f"NIYOJAN_ADMIT_{name.upper()}", ""), spec))
+
+    def retry_after(self):
+        """Rough seconds until a slot frees up: queue ahead of us times the average run, spread over the slots."""
+        return self.avg_seconds * (len(self.waiters) + 1) / max(self.concurrency, 1)
+
+    def take_token(self, user, now):
+        tokens, updated = self.buckets.get(user, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self.buckets[user] = (tokens, now)
+            raise Rejected("rate_limited", (1 - tokens) / self.rate if self.rate > 0 else 60)
+        self.buckets[user] = (tokens - 1, now)
+        if len(self.buckets) > MAX_TRACKED_USERS:
+            # forget users whose bucket has refilled anyway
+            full = [u for u, (t, at) in self.buckets.items() if t + (now - at) * self.rate >= self.burst]
+            for u in full:
+                del self.buckets[u]
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            return 0.0
+        if len(self.waiters) >= self.queue:
+            raise Rejected("queue_full", self.retry_after())
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        QUEUE_DEPTH.set(len(self.waiters), pool=self.name)
+        try:
+            await asyncio.wait_for(waiter, self.wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as we gave up
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise Rejected("timeout", self.retry_after())
+        finally:
+            QUEUE_DEPTH.set(len(self.waiters), pool=self.name)
+        return time.perf_counter() - started
+
+    def release(self):
+        # hand the slot straight to the next waiter, so late arrivals cannot overtake the queue
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def finished(self, seconds):
+        self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * seconds
+
+
+class AdmissionMiddleware:
+    """
+    `identify(scope)` returns the caller's user id (JWT sub) or None; the
+    token is only used as a key here, authentication still happens in the
+    route's dependencies.
+    """
+
+    def __init__(self, app, identify, routes=None, pools=None):
+        self.app = app
+        self.identify = identify
+        self.routes = routes or ROUTES
+        self.pools = pools or {name: Pool.from_env(name) for name in set(self.routes.values())}
+
+    async def __call__(self, scope, receive, send):
+        pool = self.pools.get(self.routes.get((scope.get("method"), scope.get("path")))) \
+            if scope["type"] == "http" and ADMISSION_ENABLED else None
+        if pool is None:
+            await self.app(scope, receive, send)
+            return
+
+        user = self.identify(scope) or "ip:" + ((scope.get("client") or ("anonymous",))[0])
+        try:
+            if pool.user_requests.get(user, 0) >= pool.per_user:
+                raise Rejected("user_busy", pool.retry_after())
+            pool.take_token(user, time.monotonic())
+        except Rejected as r:
+            await self._reject(send, pool, r)
+            return
+
+        pool.user_requests[user] += 1
+        try:
+            try:
+                waited = await pool.acquire()
+            except Rejected as r:
+                await self._reject(send, pool, r)
+                return
+            DECISIONS.inc(pool=pool.name, result="admitted")
+            WAIT_SECONDS.observe(waited, pool=pool.name)
+            IN_FLIGHT.set(pool.active, pool=pool.name)
+            started = time.perf_counter()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                pool.finished(time.perf_counter() - started)
+                pool.release()
+                IN_FLIGHT.set(pool.active, pool=pool.name)
+        finally:
+            pool.user_requests[user] -= 1
+            if not pool.user_requests[user]:
+                del pool.user_requests[user]
+
+    async def _reject(self, send, pool, rejected):
+        DECISIONS.inc(pool=pool.name, result=rejected.reason)
+        retry_after = max(1, math.ceil(rejected.retry_after))
+        body = json.dumps({"detail": f"Too many {pool.name} requests ({rejected.reason.replace('_', ' ')}), "
+                                     f"retry in {retry_after}s", "reason": rejected.reason}).encode()
+        await send({"type": "http.response.start", "status": 429, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
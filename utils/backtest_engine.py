@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.baseline_engine import BASELINES, METHOD_LSTM, run_baseline
+from utils import upload_validator
+from utils import sharded_inference
+
+logger = logging.getLogger("niyojan.backtest")
+
+DEFAULT_CONTEXT = int(os.getenv("NIYOJAN_BACKTEST_CONTEXT", "26"))
+# chunks to split a run into; they run on the shared inference pool (0: inline)
+DEFAULT_WORKERS = int(os.getenv("NIYOJAN_BACKTEST_WORKERS", str(sharded_inference.INFERENCE_WORKERS)))
+# windows per inference call inside a worker
+CHUNK_SIZE = int(os.getenv("NIYOJAN_BACKTEST_CHUNK", "20000"))
+
+ALL_METHODS = [METHOD_LSTM] + list(BASELINES)
+
+
+# -------------------------
+# History → rolling origins
+# -------------------------
+def history_matrix(df):
+    """
+    Pivot a long sales frame (Product_ID, Category, Week, Sales_Quantity)
+    into a right-aligned (n_products, T) matrix without a per-product loop.
+    Returns (products, categories, values, lengths).
+    """
+    df = df.sort_values(['Product_ID', 'Week'], kind='mergesort')
+    codes, products = pd.factorize(df['Product_ID'].astype(str), sort=False)
+    lengths = np.bincount(codes, minlength=len(products))
+    width = int(lengths.max()) if len(lengths) else 0
+
+    pos = df.groupby(codes, sort=False).cumcount().to_numpy()
+    cols = width - lengths[codes] + pos
+    values = np.full((len(products), max(width, 1)), np.nan)
+    values[codes, cols] = df['Sales_Quantity'].fillna(0).astype(float).to_numpy()
+
+    categories = (
+        df.groupby(codes, sort=True)['Category'].last().fillna("Unknown").astype(str).to_numpy()
+        if 'Category' in df.columns else np.full(len(products), "Unknown", dtype=object)
+    )
+    return np.asarray(products, dtype=object), categories, values, lengths
+
+
+def rolling_origins(values, context, horizon, stride=1, max_origins=None):
+    """
+    Every rolling origin as a strided view over the history matrix.
+    Returns (product_idx, inputs (m, context), actuals (m, horizon)); windows
+    that reach into a product's NaN padding are dropped.
+    """
+    span = context + horizon
+    if values.shape[1] < span:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, context)), np.zeros((0, horizon))
+
+    view = sliding_window_view(values, span, axis=1)  # (n, O, span), no copy
+    origin_idx = np.arange(view.shape[1] - 1, -1, -stride)[::-1]
+    if max_origins:
+        origin_idx = origin_idx[-max_origins:]
+    view = view[:, origin_idx]
+
+    valid = ~np.isnan(view).any(axis=2)
+    product_idx, origin = np.nonzero(valid)
+    windows = view[product_idx, origin]
+    return product_idx, windows[:, :context], windows[:, context:]
+
+
+# -------------------------
+# Batched scoring (process pool)
+# -------------------------
+def _forecast_chunk(products, inputs, horizon, methods):
+    lengths = np.full(len(inputs), inputs.shape[1], dtype=np.int64)
+    out = {}
+    for method in methods:
+        if method == METHOD_LSTM:
+            from utils.forecast_engine import predict_windows
+            out[method] = predict_windows(products, inputs, horizon)
+        else:
+            out[method] = run_baseline(method, inputs, lengths, horizon)
+    return out
+
+
+def forecast_origins(products, inputs, horizon, methods, workers=DEFAULT_WORKERS):
+    """
+    Forecast every origin with every method. Work is cut into large chunks;
+    with workers > 0 the chunks run on the persistent inference pool
+    (utils.sharded_inference), whose workers already hold the model, so a
+    run neither spawns processes nor reloads TensorFlow, and backtests and
+    /forecast shards share the same CPUs.
+    """
+    workers = min(workers or 0, sharded_inference.INFERENCE_WORKERS)
+    size = CHUNK_SIZE
+    if workers > 0:
+        # spread evenly when there are fewer chunks than workers
+        size = max(1, min(CHUNK_SIZE, -(-len(inputs) // workers)))
+    chunks = [(products[b:b + size], inputs[b:b + size]) for b in range(0, len(inputs), size)]
+
+    if workers > 0 and len(chunks) > 1:
+        parts = list(sharded_inference.get_pool().map(
+            _forecast_chunk, [c[0] for c in chunks], [c[1] for c in chunks],
+            [horizon] * len(chunks), [methods] * len(chunks)))
+    else:
+        parts = [_forecast_chunk(p, x, horizon, methods) for p, x in chunks]
+
+    return {m: np.concatenate([part[m] for part in parts]) for m in methods}
+
+
+# -------------------------
+# Metrics
+# -------------------------
+def score(forecasts, actuals, groups, n_groups):
+    """
+    MAPE / WAPE / bias (all in %) per group id, vectorized with bincount.
+    MAPE ignores weeks with zero actual demand.
+    """
+    g = np.repeat(groups, actuals.shape[1])
+    err = (forecasts - actuals).ravel()
+    act = actuals.ravel()
+    abs_err = np.abs(err)
+
+    sum_abs = np.bincount(g, abs_err, minlength=n_groups)
+    sum_err = np.bincount(g, err, minlength=n_groups)
+    sum_act = np.bincount(g, act, minlength=n_groups)
+    points = np.bincount(g, minlength=n_groups)
+
+    nz = act > 0
+    ape_sum = np.bincount(g[nz], abs_err[nz] / act[nz], minlength=n_groups)
+    ape_cnt = np.bincount(g[nz], minlength=n_groups)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mape = np.where(ape_cnt > 0, 100.0 * ape_sum / ape_cnt, np.nan)
+        wape = np.where(sum_act > 0, 100.0 * sum_abs / sum_act, np.nan)
+        bias = np.where(sum_act > 0, 100.0 * sum_err / sum_act, np.nan)
+    return mape, wape, bias, points
+
+
+def _metric_rows(level, keys, method, mape, wape, bias, points):
+    rows = []
+    for i, key in enumerate(keys):
+        if points[i] == 0:
+            continue
+        rows.append((level, str(key), method,
+                     None if np.isnan(mape[i]) else round(float(mape[i]), 4),
+                     None if np.isnan(wape[i]) else round(float(wape[i]), 4),
+                     None if np.isnan(bias[i]) else round(float(bias[i]), 4),
+                     int(points[i])))
+    return rows
+
+
+def run_backtest(df=None, horizon=4, context=None, stride=1, max_origins=None,
+                 methods=None, workers=DEFAULT_WORKERS, persist=True, source=None):
+    """
+    Rolling-origin backtest over uploaded (df) or stored history.
+    Scores every method per product, per category and overall and, when
+    persist is set, writes the run to SQLite. Returns a summary dict.
+    """
+    started = time.perf_counter()
+    methods = methods or ALL_METHODS
+    unknown = [m for m in methods if m not in ALL_METHODS]
+    if unknown:
+        raise ValueError(f"Unknown methods: {', '.join(unknown)}")
+
+    if df is None:
+        import database.db_manager as db_manager
+        df = db_manager.get_sales_history_frame()
+        if df.empty:
+            raise ValueError("No stored sales history to backtest")
+        df = df.rename(columns={
+            'product': 'Product_ID', 'category': 'Category',
+            'week': 'Week', 'sales_quantity': 'Sales_Quantity'})
+        df['Week'] = pd.to_datetime(df['Week'], format='%Y-%m-%d')
+        source = source or "stored"
+
+    products, categories, values, lengths = history_matrix(df)
+    # shrink the context so the longest product still yields an origin
+    context = min(context or DEFAULT_CONTEXT, max(int(lengths.max(initial=0)) - horizon, 1))
+
+    product_idx, inputs, actuals = rolling_origins(values, context, horizon, stride, max_origins)
+    if not len(inputs):
+        raise ValueError(f"Not enough history for a {horizon}-week backtest")
+
+    forecasts = forecast_origins(products[product_idx], inputs, horizon, methods, workers)
+
+    cat_keys, cat_idx = np.unique(categories, return_inverse=True)
+    window_cats = cat_idx[product_idx]
+    overall = np.zeros(len(product_idx), dtype=np.int64)
+
+    metrics = []
+    for method in methods:
+        f = forecasts[method]
+        metrics += _metric_rows("product", products, method, *score(f, actuals, product_idx, len(products)))
+        metrics += _metric_rows("category", cat_keys, method, *score(f, actuals, window_cats, len(cat_keys)))
+        metrics += _metric_rows("overall", ["all"], method, *score(f, actuals, overall, 1))
+
+    duration = round(time.perf_counter() - started, 3)
+    params = {"horizon": horizon, "context": context, "stride": stride,
+              "max_origins": max_origins, "methods": methods}
+    summary = {
+        "products": int(len(np.unique(product_idx))),
+        "origins": int(len(inputs)),
+        "duration_seconds": duration,
+        "params": params,
+        "overall": [dict(zip(("level", "key", "method", "mape", "wape", "bias", "points"), m))
+                    for m in metrics if m[0] == "overall"],
+    }
+    if persist:
+        import database.async_db as async_db
+        import database.db_manager as db_manager
+        summary["run_id"] = async_db.write_sync(
+            db_manager.save_backtest_run,
+            source or "upload", json.dumps(params), summary["products"], summary["origins"], duration, metrics
+        )
+    logger.info("backtest: %d origins over %d products in %.2fs",
+                summary["origins"], summary["products"], duration)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest")
+    parser.add_argument("--csv", help="history CSV (defaults to stored history)")
+    parser.add_argument("--horizon", type=int, default=4)
+    parser.add_argument("--context", type=int, default=None)
+    parser.add_argument("--stride", type=int, default=1)
+    parser.add_argument("--max-origins", type=int, default=None)
+    parser.add_argument("--methods", default=",".join(ALL_METHODS))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--no-persist", action="store_true")
+    args = parser.parse_args()
+
+    frame = None
+    if args.csv:
+        frame = pd.read_csv(args.csv)
+        frame.columns = frame.columns.str.strip()
+        frame['Week'] = upload_validator.parse_weeks(frame['Week'])[0]
+        frame = frame.dropna(subset=['Week'])
+
+    result = run_backtest(frame, horizon=args.horizon, context=args.context, stride=args.stride,
+                          max_origins=args.max_origins, methods=args.methods.split(","),
+                          workers=args.workers, persist=not args.no_persist,
+                          source=args.csv and os.path.basename(args.csv))
+    print(json.dumps(result, indent=2))
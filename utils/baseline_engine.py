@@ -0,0 +1,168 @@
+import os
+import numpy as np
+
+# -------------------------
+# Vectorized statistical baselines
+# -------------------------
+# Every forecaster works on a right-aligned history matrix of shape
+# (n_products, T) where shorter histories are NaN-padded on the left
+# (see stack_histories). All products are forecast in one array pass and
+# the result is always (n_products, horizon).
+
+SEASON_LENGTH = int(os.getenv("NIYOJAN_SEASON_LENGTH", "52"))
+MOVING_AVERAGE_WINDOW = int(os.getenv("NIYOJAN_MA_WINDOW", "4"))
+SES_ALPHA = float(os.getenv("NIYOJAN_SES_ALPHA", "0.3"))
+CROSTON_ALPHA = float(os.getenv("NIYOJAN_CROSTON_ALPHA", "0.1"))
+
+# Router thresholds
+ROUTING_ENABLED = os.getenv("NIYOJAN_BASELINE_ROUTING", "1") != "0"
+INTERMITTENT_ZERO_SHARE = float(os.getenv("NIYOJAN_INTERMITTENT_ZERO_SHARE", "0.4"))
+LOW_VOLUME_THRESHOLD = float(os.getenv("NIYOJAN_LOW_VOLUME_THRESHOLD", "5"))
+
+METHOD_LSTM = "lstm"
+METHOD_SEASONAL_NAIVE = "seasonal_naive"
+METHOD_MOVING_AVERAGE = "moving_average"
+METHOD_SES = "ses"
+METHOD_CROSTON = "croston"
+
+
+def stack_histories(histories):
+    """
+    Stack a list of 1-D sales histories into a right-aligned matrix.
+    Returns (values, lengths) where values is float64 (n, T) padded with NaN.
+    """
+    lengths = np.fromiter((len(h) for h in histories), dtype=np.int64, count=len(histories))
+    width = int(lengths.max()) if len(lengths) else 0
+    values = np.full((len(histories), max(width, 1)), np.nan, dtype=np.float64)
+    for i, h in enumerate(histories):
+        if len(h):
+            values[i, width - len(h):] = h
+    return values, lengths
+
+
+def _last_values(values):
+    return values[:, -1]
+
+
+def seasonal_naive(values, lengths, horizon, season=SEASON_LENGTH):
+    """
+    y[T+h] = y[T+h-season]. Products with less than one full season of
+    history fall back to the naive last value.
+    """
+    n, width = values.shape
+    steps = np.arange(horizon)
+    if width >= season:
+        cols = width - season + (steps % season)
+        out = values[:, cols]
+    else:
+        out = np.repeat(_last_values(values)[:, None], horizon, axis=1)
+    short = lengths < season
+    if short.any():
+        out[short] = _last_values(values[short])[:, None]
+    return out
+
+
+def moving_average(values, lengths, horizon, window=MOVING_AVERAGE_WINDOW):
+    """Flat forecast at the mean of the last `window` observed weeks (0 with no history)."""
+    recent = values[:, -window:]
+    observed = (~np.isnan(recent)).sum(axis=1)
+    level = np.nansum(recent, axis=1) / np.maximum(observed, 1)
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+def simple_exponential_smoothing(values, lengths, horizon, alpha=SES_ALPHA):
+    """
+    Flat SES forecast. The smoothed level is the closed form
+        l_T = (1-a)^(L-1) * y_first + sum_k a * (1-a)^(T-1-k) * y_k
+    so the whole batch reduces to one weighted row sum. Rows without
+    history forecast 0.
+    """
+    n, width = values.shape
+    decay = (1.0 - alpha) ** np.arange(width - 1, -1, -1)
+    filled = np.nan_to_num(values, nan=0.0)
+    level = (filled * (alpha * decay)).sum(axis=1)
+
+    # the first observation carries (1-a)^(L-1) instead of a * (1-a)^(L-1)
+    empty = lengths == 0
+    first_idx = np.where(empty, width - 1, width - lengths)
+    first_val = np.where(empty, 0.0, filled[np.arange(n), first_idx])
+    first_decay = (1.0 - alpha) ** np.maximum(lengths - 1, 0)
+    level += first_val * first_decay * (1.0 - alpha)
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+def croston(values, lengths, horizon, alpha=CROSTON_ALPHA):
+    """
+    Croston's method for intermittent demand: smooth non-zero demand sizes
+    and inter-demand intervals separately, forecast size / interval.
+    Iterates over time columns; each step updates every product at once.
+    """
+    n, width = values.shape
+    size = np.full(n, np.nan)
+    interval = np.full(n, np.nan)
+    since_last = np.ones(n)
+
+    for t in range(width):
+        col = values[:, t]
+        observed = ~np.isnan(col)
+        demand = observed & (col > 0)
+
+        first = demand & np.isnan(size)
+        update = demand & ~first
+        size[first] = col[first]
+        interval[first] = since_last[first]
+        size[update] += alpha * (col[update] - size[update])
+        interval[update] += alpha * (since_last[update] - interval[update])
+
+        since_last[demand] = 1.0
+        since_last[observed & ~demand] += 1.0
+
+    rate = np.where(np.isnan(size), 0.0, size / np.where(np.isnan(interval), 1.0, interval))
+    return np.repeat(rate[:, None], horizon, axis=1)
+
+
+BASELINES = {
+    METHOD_SEASONAL_NAIVE: seasonal_naive,
+    METHOD_MOVING_AVERAGE: moving_average,
+    METHOD_SES: simple_exponential_smoothing,
+    METHOD_CROSTON: croston,
+}
+
+
+def run_baseline(method, values, lengths, horizon):
+    """
+    Forecast every row of `values` with one baseline; negatives are clipped
+    and rows without history (NaN from the last-value fallbacks) get 0.
+    """
+    return np.clip(np.nan_to_num(BASELINES[method](values, lengths, horizon), nan=0.0), 0.0, None)
+
+
+# -------------------------
+# Router
+# -------------------------
+def route_products(values, lengths, lstm_window, season=SEASON_LENGTH):
+    """
+    Decide per product whether the LSTM is worth its cost.
+    - fewer than 3 weeks               -> moving_average
+    - shorter than the LSTM window     -> ses (instead of edge-padding)
+    - share of zero weeks >= threshold -> croston
+    - low average volume               -> seasonal_naive / ses
+    - everything else                  -> lstm
+    Returns an object array of method names, one per row.
+    """
+    n = len(lengths)
+    methods = np.full(n, METHOD_LSTM, dtype=object)
+    if not ROUTING_ENABLED or n == 0:
+        return methods
+
+    observed = ~np.isnan(values)
+    zero_share = ((values == 0) & observed).sum(axis=1) / np.maximum(lengths, 1)
+    mean_volume = np.nanmean(values, axis=1)
+
+    low_volume = mean_volume < LOW_VOLUME_THRESHOLD
+    methods[low_volume] = METHOD_SES
+    methods[low_volume & (lengths >= 2 * season)] = METHOD_SEASONAL_NAIVE
+    methods[zero_share >= INTERMITTENT_ZERO_SHARE] = METHOD_CROSTON
+    methods[lengths < lstm_window] = METHOD_SES
+    methods[lengths < 3] = METHOD_MOVING_AVERAGE
+    return methods
@@ -0,0 +1,255 @@
+"""
+Chart payloads computed server-side, so the dashboard never has to pull the
+whole batch to draw it.
+
+- heatmap(batch_id, ...): demand matrix, products or categories x weeks
+  (recent stored history followed by the batch's forecast weeks), pivoted
+  with NumPy; rows limited to the top-k by forecast volume and optionally
+  ordered so products with a similar weekly shape sit next to each other.
+- series(batch_id, ...): weekly history + forecast of one product, one
+  category or the whole catalog, downsampled to at most `points` points
+  (LTTB keeps the visual shape, min-max keeps every peak and trough).
+
+History is read for the batch's own products (with the categories the batch
+recorded) and up to the week it was forecast from, so later uploads do not
+leak into older batches. Results are kept in a small LRU keyed by batch,
+the sales_history change stamp and parameters (NIYOJAN_CHART_CACHE_SIZE
+entries): a batch never changes once written, but an upload can revise the
+weeks it was forecast from.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from database import db_manager
+from utils import metrics
+
+try:
+    from scipy.cluster.hierarchy import linkage, leaves_list
+except ImportError:
+    linkage = leaves_list = None
+
+CACHE_SIZE = int(os.getenv("NIYOJAN_CHART_CACHE_SIZE", "64"))
+MAX_HEATMAP_ROWS = 500
+MAX_HISTORY_WEEKS = 104
+MIN_POINTS, MAX_POINTS = 10, 2000
+ORDERS = ("total", "name", "cluster")
+METHODS = ("lttb", "minmax")
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cached(key, build):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            metrics.cache_lookup("charts", True)
+            return _cache[key]
+    metrics.cache_lookup("charts", False)
+    value = build()
+    with _cache_lock:
+        _cache[key] = value
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+# ---- Downsampling ----
+def lttb(x, y, points):
+    """Indices kept by Largest-Triangle-Three-Buckets (first and last always kept)."""
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    keep = np.empty(points, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    prev = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
+
+
+def minmax(y, points):
+    """Indices of the min and max of each of points/2 buckets, plus the endpoints."""
+    n = len(y)
+    if points >= n or points < 4:
+        return np.arange(n)
+    edges = np.linspace(0, n, (points - 2) // 2 + 1).astype(int)
+    keep = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            keep += [lo + int(np.argmin(y[lo:hi])), lo + int(np.argmax(y[lo:hi]))]
+    return np.unique(keep)
+
+
+def downsample(x, y, points, method="lttb"):
+    idx = lttb(x, y, points) if method == "lttb" else minmax(y, points)
+    return x[idx], y[idx]
+
+
+# ---- Batch data ----
+def _forecast_matrix(batch_id):
+    """(products, categories, products x horizon matrix) of a batch."""
+    rows = db_manager.get_batch_forecasts(batch_id)
+    if not rows:
+        return np.array([], dtype=object), np.array([], dtype=object), np.zeros((0, 0))
+    frame = pd.DataFrame(rows, columns=["product", "category", "forecast"])
+    codes, products = pd.factorize(frame["product"])
+    step = frame.groupby(codes).cumcount().to_numpy()  # rows of a product were written week by week
+    matrix = np.zeros((len(products), int(step.max()) + 1))
+    matrix[codes, step] = frame["forecast"].to_numpy(dtype=float)
+    categories = frame["category"].to_numpy()[np.unique(codes, return_index=True)[1]]
+    return np.asarray(products, dtype=object), categories, matrix
+
+
+def _history_week(batch_id):
+    """Last history week the batch was forecast from (the latest stored one for older batches)."""
+    batch = db_manager.get_forecast_batch(batch_id) or {}
+    return batch.get("history_week") or db_manager.get_last_history_week()
+
+
+def _history_version():
+    return db_manager.get_versions("sales_history")["sales_history"][0]
+
+
+def _week_labels(last_week, offsets):
+    base = np.datetime64(last_week, "D")
+    return [str(base + np.timedelta64(7 * int(o), "D")) for o in offsets]
+
+
+def _history_matrix(keys, last_week, weeks, **filters):
+    """len(keys) x weeks matrix of stored units for the `weeks` weeks ending at last_week."""
+    out = np.zeros((len(keys), weeks))
+    if not weeks or not last_week:
+        return out
+    since = _week_labels(last_week, [1 - weeks])[0]
+    rows = db_manager.get_weekly_sales(since_week=since, until_week=last_week, **filters)
+    if not rows:
+        return out
+    key, week, units = zip(*rows)
+    r = pd.Index(keys).get_indexer(list(key))
+    day = pd.to_datetime(pd.Series(week), errors="coerce").to_numpy().astype("datetime64[D]")
+    c = weeks - 1 - (np.datetime64(last_week, "D") - day).astype(np.int64) // 7
+    ok = (r >= 0) & (c >= 0) & (c < weeks)
+    np.add.at(out, (r[ok], c[ok]), np.asarray(units, dtype=float)[ok])
+    return out
+
+
+def _cluster_order(values):
+    """Row order grouping similar weekly profiles (shape, not volume)."""
+    if len(values) < 3:
+        return np.arange(len(values))
+    peak = values.max(axis=1, keepdims=True)
+    profiles = np.divide(values, peak, out=np.zeros_like(values), where=peak > 0)
+    if linkage is None:
+        # no scipy: sort by the week demand peaks, then by volume
+        return np.lexsort((-values.sum(axis=1), profiles.argmax(axis=1)))
+    return leaves_list(linkage(profiles, method="average", metric="euclidean"))
+
+
+# ---- Payloads ----
+def heatmap(batch_id, by="product", top_k=50, history_weeks=12, order="total"):
+    key = ("heatmap", batch_id, _history_version(), by, top_k, history_weeks, order)
+    return _cached(key, lambda: _build_heatmap(batch_id, by, top_k, history_weeks, order))
+
+
+def _build_heatmap(batch_id, by, top_k, history_weeks, order):
+    with metrics.stage("charts.heatmap"):
+        products, categories, forecast = _forecast_matrix(batch_id)
+        if by == "category":
+            codes, keys = pd.factorize(categories)
+            grouped = np.zeros((len(keys), forecast.shape[1]))
+            np.add.at(grouped, codes, forecast)
+            keys, forecast = np.asarray(keys, dtype=object), grouped
+        else:
+            keys = products
+        top = np.argsort(-forecast.sum(axis=1), kind="stable")[:top_k]
+        keys, forecast = keys[top], forecast[top]
+
+        last_week = _history_week(batch_id)
+        filters = {"by": by, "products": keys.tolist()} if by == "product" else {"by": by, "batch_id": batch_id}
+        history = _history_matrix(keys.tolist(), last_week, history_weeks if last_week else 0, **filters)
+        values = np.hstack([history, forecast])
+
+        if order == "name":
+            rank = np.argsort(keys.astype(str), kind="stable")
+        elif order == "cluster":
+            rank = _cluster_order(values)
+        else:
+            rank = np.arange(len(keys))
+
+        offsets = range(1 - history.shape[1], forecast.shape[1] + 1)
+        payload = {
+            "batch_id": batch_id,
+            "by": by,
+            "order": order,
+            "weeks": _week_labels(last_week, offsets) if last_week else [f"W+{i + 1}" for i in range(forecast.shape[1])],
+            "forecast_start": history.shape[1],
+            "rows": keys[rank].tolist(),
+            "values": np.round(values[rank], 1).tolist(),
+            "max": round(float(values.max()), 1) if values.size else 0.0,
+        }
+        if by == "product":
+            payload["categories"] = categories[top][rank].tolist()
+        return payload
+
+
+def series(batch_id, product=None, category=None, points=200, method="lttb"):
+    key = ("series", batch_id, _history_version(), product, category, points, method)
+    return _cached(key, lambda: _build_series(batch_id, product, category, points, method))
+
+
+def _build_series(batch_id, product, category, points, method):
+    """None when the product / category is not part of the batch."""
+    with metrics.stage("charts.series"):
+        products, categories, forecast = _forecast_matrix(batch_id)
+        if product is not None:
+            mask, filters = products == product, {"products": [product]}
+        elif category is not None:
+            mask, filters = categories == category, {"category": category, "batch_id": batch_id}
+        else:
+            mask, filters = np.ones(len(products), dtype=bool), {"batch_id": batch_id}
+        if not mask.any():
+            return None
+        future = forecast[mask].sum(axis=0)
+
+        last_week = _history_week(batch_id)
+        rows = db_manager.get_weekly_sales(until_week=last_week, **filters)
+        hist_x = pd.to_datetime(pd.Series([r[1] for r in rows], dtype=object), errors="coerce").to_numpy()
+        hist_y = np.asarray([r[2] for r in rows], dtype=float)
+        ok = ~np.isnat(hist_x)
+        hist_x, hist_y = hist_x[ok].astype("datetime64[D]"), hist_y[ok]
+        last = hist_x[-1] if len(hist_x) else np.datetime64(last_week or "today", "D")
+        fut_x = last + np.timedelta64(7, "D") * np.arange(1, len(future) + 1)
+
+        # the forecast keeps every week unless it alone exceeds half the budget
+        fut_points = min(len(future), points // 2)
+        fx, fy = downsample(fut_x.astype(np.int64), future, fut_points, method)
+        hx, hy = downsample(hist_x.astype(np.int64), hist_y, points - len(fx), method)
+
+        def part(x, y):
+            return {"weeks": [str(d) for d in x.astype("datetime64[D]")], "values": np.round(y, 2).tolist()}
+
+        return {
+            "batch_id": batch_id,
+            "product": product,
+            "category": category,
+            "method": method,
+            "raw_points": int(len(hist_y) + len(future)),
+            "history": part(hx, hy),
+            "forecast": part(fx, fy),
+        }
@@ -1,5 +1,6 @@
 import smtplib
 import os
+import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
@@ -7,28 +8,27 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-def send_email_report(recipients, subject, body, attachments=None):
-    """
-    Sends an email with optional attachments.
-    recipients: list of email strings
-    subject: str
-    body: str
-    attachments: list of file paths (optional)
-    """
-    sender_email = os.getenv("SMTP_EMAIL")
-    sender_password = os.getenv("SMTP_PASSWORD")
-    smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", 587))
+logger = logging.getLogger("niyojan.email")
 
-    if not sender_email or not sender_password:
-        print("Email sending disabled: SMTP_EMAIL or SMTP_PASSWORD not set.")
-        return False
+def smtp_settings():
+    """SMTP configuration from the environment (read per call so .env changes apply)."""
+    return {
+        "sender": os.getenv("SMTP_EMAIL"),
+        "password": os.getenv("SMTP_PASSWORD"),
+        "server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        "port": int(os.getenv("SMTP_PORT", 587)),
+        # plain local relays (e.g. `python -m aiosmtpd -n`) do not offer STARTTLS
+        "starttls": os.getenv("SMTP_STARTTLS", "1") == "1",
+        "timeout": float(os.getenv("SMTP_TIMEOUT", "30")),
+    }
 
+def build_message(sender, recipients, subject, body, attachments=None):
+    """MIME message with the body as text/plain and every readable attachment."""
     msg = MIMEMultipart()
-    msg["From"] = sender_email
+    msg["From"] = sender
     msg["To"] = ", ".join(recipients)
     msg["Subject"] = subject
-    
+
     msg.attach(MIMEText(body, "plain", "utf-8"))
 
     if attachments:
@@ -39,15 +39,46 @@ def send_email_report(recipients, subject, body, attachments=None):
                 part['Content-Disposition'] = f'attachment; filename="{os.path.basename(filepath)}"'
                 msg.attach(part)
             except Exception as e:
-                print(f"Failed to attach {filepath}: {e}")
+                logger.warning("failed to attach %s: %s", filepath, e)
+    return msg
+
+def open_session(settings=None):
+    """
+    Connected (and, when configured, STARTTLS-wrapped) SMTP session, logged
+    in only when SMTP_PASSWORD is set, so unauthenticated relays work.
+    """
+    settings = settings or smtp_settings()
+    server = smtplib.SMTP(settings["server"], settings["port"], timeout=settings["timeout"])
+    server.ehlo()
+    if settings["starttls"]:
+        server.starttls()
+        server.ehlo()
+    if settings["password"] and server.has_extn("auth"):
+        server.login(settings["sender"], settings["password"])
+    return server
+
+def send_email_report(recipients, subject, body, attachments=None):
+    """
+    Sends an email with optional attachments.
+    recipients: list of email strings
+    subject: str
+    body: str
+    attachments: list of file paths (optional)
+    """
+    settings = smtp_settings()
+    sender_email = settings["sender"]
+
+    if not sender_email:
+        logger.warning("email sending disabled: SMTP_EMAIL not set")
+        return False
+
+    msg = build_message(sender_email, recipients, subject, body, attachments)
 
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
+        with open_session(settings) as server:
             server.sendmail(sender_email, recipients, msg.as_string())
-        print(f"Report sent to {', '.join(recipients)}")
+        logger.info("report sent to %s", ", ".join(recipients))
         return True
     except Exception as e:
-        print(f"Email sending failed: {e}")
+        logger.error("email sending failed: %s", e)
         return False
@@ -1,41 +1,213 @@
 import numpy as np
-from tensorflow.keras.models import load_model
-import pickle, os
+import os
+import time
+import logging
 
-# Load model and scaler
-base = os.path.dirname(__file__)
-model = load_model(
-    os.path.join(base, "../lstm/global_lstm_model"),
-    compile=False
-)
+from utils.baseline_engine import stack_histories, route_products, run_baseline, METHOD_LSTM
+from utils.model_registry import registry
+from utils import sharded_inference
+from utils import metrics
 
-with open(os.path.join(base, "../lstm/scaler.pkl"), "rb") as f:
-    scaler = pickle.load(f)
+# Load the active model version (lstm/models/ACTIVE, or the legacy lstm/
+# artifacts) at import so workers fail fast and start warm. Every request
+# takes one bundle up front via active_bundle(); a hot swap only affects
+# requests that start after it.
+registry.active()
+
+PREDICT_BATCH_SIZE = int(os.getenv("NIYOJAN_PREDICT_BATCH_SIZE", "1024"))
+
+logger = logging.getLogger("niyojan.forecast")
+
+PREDICT_CALLS = metrics.counter("niyojan_model_predict_calls_total", "model.predict calls", ("model",))
+PREDICT_SECONDS = metrics.histogram("niyojan_model_predict_seconds", "Time per model.predict call", ("model",))
+WINDOWS_PREDICTED = metrics.counter("niyojan_windows_predicted_total", "Model input windows forecast", ("path",))
+PRODUCTS_FORECAST = metrics.counter("niyojan_products_forecast_total", "Products forecast by method", ("method",))
+
+
+def active_bundle():
+    """The model bundle new forecasts should use (follows hot swaps)."""
+    registry.refresh()
+    return registry.active()
+
+
+def _scale(bundle, values):
+    """MinMax-scale an array of any shape with the single-feature scaler."""
+    return values * bundle.scaler.scale_[0] + bundle.scaler.min_[0]
+
+
+def _unscale(bundle, values):
+    return (values - bundle.scaler.min_[0]) / bundle.scaler.scale_[0]
+
+
+def encode_products(bundle, products):
+    """
+    Second model feature: the product code the model was trained with
+    (label_encoder.pkl), looked up for the whole batch at once. Unseen
+    products get the index fallback (see utils/product_index.py).
+    """
+    if bundle.product_index is None:
+        return np.zeros(len(products), dtype=np.float32)
+    codes, unseen = bundle.product_index.encode(products)
+    if unseen.any():
+        logger.info("%d of %d products unknown to model %s; using fallback code %.1f",
+                    int(unseen.sum()), len(products), bundle.version, bundle.product_index.fallback)
+    return codes
+
+
+def _build_windows(bundle, histories, products):
+    """
+    Turn a list of histories into one (n, timesteps, 2) model input of
+    [sales_scaled, product_encoded]. Short histories are edge-padded, long
+    ones keep their last `timesteps`; an empty history reads as zero sales.
+    """
+    expected_timesteps = bundle.window
+    x = np.zeros((len(histories), expected_timesteps, 2), dtype=np.float32)
+    for i, h in enumerate(histories):
+        h = np.asarray(h, dtype=np.float64)[-expected_timesteps:]
+        if not len(h):
+            h = np.zeros(expected_timesteps)
+        elif len(h) < expected_timesteps:
+            h = np.pad(h, (expected_timesteps - len(h), 0), mode="edge")
+        x[i, :, 0] = _scale(bundle, h)
+    x[:, :, 1] = encode_products(bundle, products)[:, None]
+    return x
+
+
+def _windows_from_matrix(bundle, windows, products):
+    """
+    Vectorized variant of _build_windows for an (n, T) array of complete
+    histories (no NaN), e.g. rolling backtest origins.
+    """
+    expected_timesteps = bundle.window
+    windows = np.asarray(windows, dtype=np.float64)[:, -expected_timesteps:]
+    if windows.shape[1] < expected_timesteps:
+        windows = np.pad(windows, ((0, 0), (expected_timesteps - windows.shape[1], 0)), mode="edge")
+    x = np.zeros((len(windows), expected_timesteps, 2), dtype=np.float32)
+    x[:, :, 0] = _scale(bundle, windows)
+    x[:, :, 1] = encode_products(bundle, products)[:, None]
+    return x
 
-def predict_demand(product, sales_history):
-    if not sales_history:
-        return 0.0
 
-    # Convert to array and scale
-    sales_history = np.array(sales_history).reshape(-1, 1)
-    sales_history = scaler.transform(sales_history)
+def _model_predict(model, x, name):
+    started = time.perf_counter()
+    out = model.predict(x, batch_size=PREDICT_BATCH_SIZE, verbose=0)
+    PREDICT_SECONDS.observe(time.perf_counter() - started, model=name)
+    PREDICT_CALLS.inc(model=name)
+    return out
 
-    # Model expects 2 features → create a dummy second column (zeros)
-    second_feature = np.zeros((len(sales_history), 1))
-    combined = np.hstack([sales_history, second_feature])
 
-    expected_timesteps = model.input_shape[1]
+def _predict_recursive(bundle, x, horizon):
+    """
+    Roll the model forward `horizon` steps over a prepared input batch.
+    Each step is one model.predict call over the whole batch; predictions
+    are clipped at zero before being fed back (the product code column is
+    constant per row, so rolling the window keeps it intact).
+    """
+    out = np.zeros((len(x), horizon), dtype=np.float64)
+    if not len(x):
+        return out
 
-    # Pad or trim sequence to match model’s expected length
-    if len(combined) < expected_timesteps:
-        pad_width = expected_timesteps - len(combined)
-        combined = np.pad(combined, ((pad_width, 0), (0, 0)), mode="edge")
-    elif len(combined) > expected_timesteps:
-        combined = combined[-expected_timesteps:]
+    for step in range(horizon):
+        scaled = _model_predict(bundle.model, x, "global").reshape(-1)
+        preds = np.maximum(_unscale(bundle, scaled), 0.0)
+        out[:, step] = preds
+        if step + 1 < horizon:
+            x = np.roll(x, -1, axis=1)
+            x[:, -1, 0] = _scale(bundle, preds)
+    return out
 
-    # Reshape for LSTM input: (1, timesteps, features)
-    x_input = np.reshape(combined, (1, expected_timesteps, 2))
 
-    # Predict and inverse transform
-    forecast = model.predict(x_input)
-    return float(scaler.inverse_transform(forecast)[0][0])
+def _predict_direct(bundle, x, horizon):
+    """All `horizon` steps from a single forward pass of the direct model."""
+    scaled = _model_predict(bundle.direct_model, x, "direct")[:, :horizon]
+    return np.maximum(_unscale(bundle, scaled.astype(np.float64)), 0.0)
+
+
+def direct_available(horizon, bundle=None):
+    """Optional direct multi-horizon model (lstm/train.py --horizon N) covering `horizon`."""
+    bundle = bundle or registry.active()
+    return bundle.direct_model is not None and horizon <= bundle.direct_horizon
+
+
+def _predict_local(bundle, x, horizon, direct):
+    """Run a prepared batch in this process (also the per-shard worker entry point)."""
+    if direct and len(x):
+        return _predict_direct(bundle, x, horizon)
+    return _predict_recursive(bundle, x, horizon)
+
+
+def _predict(bundle, x, horizon, direct=None):
+    """
+    direct=None picks the direct model whenever it covers the horizon,
+    True / False force one path (benchmarks compare both). Very large
+    batches are sharded over the inference pool (utils/sharded_inference.py).
+    """
+    if direct is None:
+        direct = direct_available(horizon, bundle)
+    if direct and len(x) and not direct_available(horizon, bundle):
+        raise ValueError(f"No direct model covering a {horizon}-week horizon")
+    if sharded_inference.should_shard(len(x)):
+        WINDOWS_PREDICTED.inc(len(x), path="sharded")
+        with metrics.stage("engine.sharded_predict"):
+            return sharded_inference.predict(bundle, x, horizon, direct)
+    WINDOWS_PREDICTED.inc(len(x), path="inline")
+    return _predict_local(bundle, x, horizon, direct)
+
+
+def predict_demand_batch(products, histories, horizon=1, direct=None, bundle=None):
+    """
+    Multi-step LSTM forecast for many products at once (direct model when
+    available, recursive otherwise).
+    Returns an array of shape (n_products, horizon) in original units.
+    """
+    if not len(histories):
+        return np.zeros((0, horizon), dtype=np.float64)
+    bundle = bundle or active_bundle()
+    with metrics.stage("engine.build_windows"):
+        x = _build_windows(bundle, histories, products)
+    return _predict(bundle, x, horizon, direct)
+
+
+def predict_windows(products, windows, horizon=1, direct=None, bundle=None):
+    """
+    Same as predict_demand_batch for a dense (n, T) array of histories;
+    products[i] is the product the i-th window belongs to.
+    """
+    if not len(windows):
+        return np.zeros((0, horizon), dtype=np.float64)
+    bundle = bundle or active_bundle()
+    return _predict(bundle, _windows_from_matrix(bundle, windows, products), horizon, direct)
+
+
+def forecast_products(products, histories, horizon, bundle=None):
+    """
+    Route every product to a statistical baseline or the LSTM and forecast
+    `horizon` weeks. Each method runs once over its whole group.
+    Returns (forecasts (n, horizon), methods) where methods[i] names the
+    forecaster that produced row i.
+    """
+    bundle = bundle or active_bundle()
+    with metrics.stage("engine.route"):
+        values, lengths = stack_histories(histories)
+        methods = route_products(values, lengths, bundle.window)
+    forecasts = np.zeros((len(histories), horizon), dtype=np.float64)
+
+    for method in np.unique(methods):
+        idx = np.flatnonzero(methods == method)
+        if method == METHOD_LSTM:
+            forecasts[idx] = predict_demand_batch(
+                [products[i] for i in idx], [histories[i] for i in idx], horizon, bundle=bundle
+            )
+            if direct_available(horizon, bundle):
+                methods[idx] = METHOD_LSTM + "_direct"
+        else:
+            with metrics.stage("engine.baseline"):
+                forecasts[idx] = run_baseline(method, values[idx], lengths[idx], horizon)
+        PRODUCTS_FORECAST.inc(len(idx), method=str(methods[idx[0]]))
+    return forecasts, methods.tolist()
+
+
+def predict_demand(product, sales_history):
+    if not sales_history:
+        return 0.0
+    return float(predict_demand_batch([product], [sales_history], horizon=1)[0, 0])
@@ -0,0 +1,214 @@
+"""
+Durable outbound e-mail: messages go into the SQLite `mail_queue` table and a
+background worker delivers them.
+
+    delivery_id = mail_queue.enqueue(["ops@example.com"], subject, body, [pdf_path])
+    mail_queue.status(delivery_id)      # queued / sending / sent / failed
+
+The worker claims due messages in batches under a lease, so several gunicorn
+workers can drain one queue without double sends, and a crashed worker's
+messages are picked up again once the lease expires. All messages of a batch
+(and of later batches, until the session has been idle for
+NIYOJAN_SMTP_IDLE_SECONDS) go over one SMTP session, so STARTTLS and login
+happen once instead of per message. Failures are retried with exponential
+backoff; 5xx answers other than authentication are final.
+
+For local testing point SMTP_SERVER/SMTP_PORT at a sink such as
+`python -m aiosmtpd -n -l localhost:1025` with SMTP_STARTTLS=0.
+"""
+import os
+import time
+import random
+import smtplib
+import logging
+import threading
+
+import database.async_db as async_db
+import database.db_manager as db_manager
+from utils import metrics
+from utils.email_handler import smtp_settings, build_message, open_session
+
+logger = logging.getLogger("niyojan.mail")
+
+MAIL_BATCH = int(os.getenv("NIYOJAN_MAIL_BATCH", "20"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("NIYOJAN_MAIL_MAX_ATTEMPTS", "6"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("NIYOJAN_MAIL_RETRY_BASE_SECONDS", "30"))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("NIYOJAN_MAIL_RETRY_MAX_SECONDS", "3600"))
+MAIL_POLL_SECONDS = float(os.getenv("NIYOJAN_MAIL_POLL_SECONDS", "5"))
+MAIL_LEASE_SECONDS = float(os.getenv("NIYOJAN_MAIL_LEASE_SECONDS", "300"))
+SMTP_IDLE_SECONDS = float(os.getenv("NIYOJAN_SMTP_IDLE_SECONDS", "60"))
+
+MAILS = metrics.counter("niyojan_mail_messages_total", "Queued e-mail by outcome", ("status",))
+MAIL_SECONDS = metrics.histogram("niyojan_mail_send_seconds", "SMTP send time per message")
+SMTP_CONNECTS = metrics.counter("niyojan_smtp_connections_total", "SMTP sessions opened")
+
+
+def backoff_seconds(attempts):
+    """Delay before attempt `attempts + 1`: base * 2^(attempts-1), capped, +-10% jitter."""
+    delay = min(MAIL_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), MAIL_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def is_permanent(error):
+    """Errors that retrying cannot fix (rejected recipients / content)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False  # credentials can be fixed without touching the queue
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class SMTPSession:
+    """One reusable SMTP connection; reconnects once if the server dropped it."""
+
+    def __init__(self, idle_seconds=SMTP_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._server = None
+        self._settings = None
+        self._last_used = 0.0
+
+    def _connect(self, settings):
+        self.close()
+        self._server = open_session(settings)
+        self._settings = settings
+        SMTP_CONNECTS.inc()
+
+    def send(self, settings, recipients, message):
+        """sendmail over the pooled session. Returns the refused-recipients dict."""
+        if self._server is None or settings != self._settings:
+            self._connect(settings)
+        try:
+            refused = self._server.sendmail(settings["sender"], recipients, message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # idle connections get closed by the server: reconnect and retry once
+            self._connect(settings)
+            refused = self._server.sendmail(settings["sender"], recipients, message)
+        self._last_used = time.monotonic()
+        return refused
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+class MailWorker:
+    def __init__(self, batch=MAIL_BATCH, poll_seconds=MAIL_POLL_SECONDS):
+        self.batch = batch
+        self.poll_seconds = poll_seconds
+        self.session = SMTPSession()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._warned_unconfigured = False
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="niyojan-mail", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.session.close()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.drain_once()
+            except Exception:
+                logger.exception("mail worker iteration failed")
+                sent = 0
+            if sent < self.batch:  # queue drained for now
+                self.session.close_if_idle()
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def drain_once(self):
+        """Claim and deliver one batch. Returns the number of messages handled."""
+        settings = smtp_settings()
+        # the password is optional: relays without AUTH only need a sender
+        if not settings["sender"]:
+            if not self._warned_unconfigured:
+                logger.warning("mail queue paused: SMTP_EMAIL not set")
+                self._warned_unconfigured = True
+            return 0
+        self._warned_unconfigured = False
+        rows = async_db.write_sync(db_manager.claim_mail, self.batch, MAIL_LEASE_SECONDS)
+        for row in rows:
+            self._deliver(row, settings)
+        return len(rows)
+
+    def _deliver(self, row, settings):
+        started = time.perf_counter()
+        try:
+            msg = build_message(settings["sender"], row["recipients"], row["subject"], row["body"] or "",
+                                row["attachments"])
+            refused = self.session.send(settings, row["recipients"], msg.as_string())
+        except Exception as e:
+            self.session.close()
+            error = f"{type(e).__name__}: {e}"
+            if is_permanent(e) or row["attempts"] >= MAIL_MAX_ATTEMPTS:
+                async_db.write_sync(db_manager.finish_mail, row["id"], "failed", error)
+                MAILS.inc(status="failed")
+                logger.error("mail %s failed after %d attempt(s): %s", row["id"], row["attempts"], error)
+            else:
+                retry_at = time.time() + backoff_seconds(row["attempts"])
+                async_db.write_sync(db_manager.finish_mail, row["id"], "queued", error, next_attempt_at=retry_at)
+                MAILS.inc(status="retry")
+                logger.warning("mail %s attempt %d failed, retrying: %s", row["id"], row["attempts"], error)
+            return
+        MAIL_SECONDS.observe(time.perf_counter() - started)
+        async_db.write_sync(db_manager.finish_mail, row["id"], "sent",
+                            f"refused: {sorted(refused)}" if refused else None)
+        MAILS.inc(status="sent")
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = MailWorker()
+        return _worker
+
+
+def start():
+    """Start this process's worker (idempotent; call after forking)."""
+    worker().start()
+
+
+def stop():
+    if _worker is not None:
+        _worker.stop()
+
+
+def enqueue(recipients, subject, body, attachments=None, created_by=None):
+    """Persist a message and nudge the worker. Returns the delivery id."""
+    delivery_id = async_db.write_sync(db_manager.enqueue_mail, recipients, subject, body, attachments, created_by)
+    MAILS.inc(status="queued")
+    w = worker()
+    w.start()
+    w.wake()
+    return delivery_id
+
+
+def status(delivery_id):
+    return db_manager.get_mail(delivery_id)
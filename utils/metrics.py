@@ -0,0 +1,263 @@
+"""
+In-process metrics with Prometheus text exposition (GET /metrics).
+
+    from utils import metrics
+    with metrics.stage("forecast.model"):          # niyojan_stage_seconds{stage=...}
+        ...
+    metrics.counter("niyojan_products_forecast_total", "...", ("method",)).inc(n, method="lstm")
+
+Counters, gauges and histograms live in one registry per process; with
+several gunicorn workers each one exposes its own series. NIYOJAN_METRICS=0
+turns every record call into a no-op.
+"""
+import os
+import time
+import bisect
+import threading
+import functools
+import inspect
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("NIYOJAN_METRICS", "1") == "1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, value=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, value=1, **labels):
+        self.inc(-value, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels):
+        """(count, sum) for one label set."""
+        state = self._values.get(self._key(labels))
+        return (state[2], state[1]) if state else (0, 0.0)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted((k, [list(s[0]), s[1], s[2]]) for k, s in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="' + _fmt_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def _get_or_create(cls, name, help_text, labelnames, **kwargs):
+    metric = _registry.get(name)
+    if metric is None:
+        with _registry_lock:
+            metric = _registry.get(name)
+            if metric is None:
+                metric = _registry[name] = cls(name, help_text, labelnames, **kwargs)
+    if not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+        raise ValueError(f"metric {name} already registered with a different type or labels")
+    return metric
+
+
+def counter(name, help_text, labelnames=()):
+    return _get_or_create(Counter, name, help_text, labelnames)
+
+
+def gauge(name, help_text, labelnames=()):
+    return _get_or_create(Gauge, name, help_text, labelnames)
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+
+def render():
+    """All metrics in Prometheus text format 0.0.4."""
+    with _registry_lock:
+        metrics = [_registry[name] for name in sorted(_registry)]
+    lines = []
+    for m in metrics:
+        lines += m.render()
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# Stage timers / caches
+# -------------------------
+STAGE_SECONDS = histogram("niyojan_stage_seconds", "Wall time per pipeline stage", ("stage",))
+CACHE_REQUESTS = counter("niyojan_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+
+
+@contextmanager
+def stage(name):
+    """Time a block into niyojan_stage_seconds{stage=name}."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+
+
+def record_stage(name, seconds):
+    """Observe a stage whose time was accumulated elsewhere (e.g. over a loop)."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def timed(name):
+    """Decorator form of stage() for sync and async functions."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stage_totals():
+    """Cumulative seconds recorded per stage name (diff two calls to time a run)."""
+    with STAGE_SECONDS._lock:
+        return {key[0]: state[1] for key, state in STAGE_SECONDS._values.items()}
+
+
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+# -------------------------
+# HTTP middleware
+# -------------------------
+HTTP_REQUESTS = counter("niyojan_http_requests_total", "HTTP requests by route and status",
+                        ("method", "route", "status"))
+HTTP_SECONDS = histogram("niyojan_http_request_seconds", "HTTP request latency until the response body is sent",
+                         ("method", "route"))
+HTTP_IN_PROGRESS = gauge("niyojan_http_requests_in_progress", "HTTP requests currently being served")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (streaming responses pass straight through).
+    Routes are labelled with their template (/backtest/{run_id}) so label
+    cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            HTTP_REQUESTS.inc(method=scope["method"], route=route, status=str(status["code"]))
+            HTTP_SECONDS.observe(time.perf_counter() - started, method=scope["method"], route=route)
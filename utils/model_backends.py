@@ -0,0 +1,227 @@
+"""
+Alternative inference backends for the global LSTM.
+
+Both classes mimic the small part of the Keras model API the forecast
+engine uses (input_shape, output_shape, predict(x, batch_size, verbose)),
+so a ModelBundle can serve them in place of the TensorFlow SavedModel:
+
+    NumpyLSTM    pure NumPy forward pass; weights stored as float32, float16
+                 or int8 (per-column symmetric scales) in an .npz file, or
+                 mapped read-only from the matching .weights file so all
+                 workers share one copy (utils/shared_weights.py).
+                 Needs no TensorFlow runtime at all.
+    TFLiteModel  TFLite interpreter (tflite_runtime if installed, else tf.lite);
+                 the interpreter maps the .tflite file itself
+"""
+import os
+import threading
+
+import numpy as np
+
+from utils.shared_weights import open_mapped
+
+try:
+    from tflite_runtime.interpreter import Interpreter as _TFLiteInterpreter  # type: ignore
+except Exception:
+    _TFLiteInterpreter = None
+
+# map <variant>.weights instead of reading the .npz into every worker
+SHARED_WEIGHTS = os.getenv("NIYOJAN_SHARED_WEIGHTS", "1") == "1"
+
+# variant name -> (backend, precision); "keras" is the float32 SavedModel
+VARIANTS = {
+    "keras": ("keras", "fp32"),
+    "numpy_fp32": ("numpy", "fp32"),
+    "numpy_fp16": ("numpy", "fp16"),
+    "numpy_int8": ("numpy", "int8"),
+    "tflite_fp16": ("tflite", "fp16"),
+    "tflite_int8": ("tflite", "int8"),
+}
+
+
+# -------------------------
+# Weight extraction / quantization
+# -------------------------
+def _quantize_int8(w):
+    """Symmetric per-output-column int8 quantization."""
+    scale = np.abs(w).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    return np.clip(np.round(w / scale), -127, 127).astype(np.int8), scale.astype(np.float32)
+
+
+def extract_weights(keras_model):
+    """
+    Pull LSTM + Dense weights out of a Sequential(LSTM, Dropout, Dense...) model.
+    Returns a flat dict of float32 arrays plus the layer layout.
+    """
+    weights, dense_acts, units = {}, [], None
+    for layer in keras_model.layers:
+        kind = type(layer).__name__
+        if kind == "LSTM":
+            kernel, recurrent, bias = layer.get_weights()
+            weights.update(lstm_kernel=kernel, lstm_recurrent=recurrent, lstm_bias=bias)
+            units = layer.units
+        elif kind == "Dense":
+            i = len(dense_acts)
+            kernel, bias = layer.get_weights()
+            weights[f"dense_{i}_kernel"] = kernel
+            weights[f"dense_{i}_bias"] = bias
+            dense_acts.append(layer.activation.__name__)
+        elif kind not in ("Dropout", "InputLayer"):
+            raise ValueError(f"Unsupported layer for NumPy export: {kind}")
+    if units is None:
+        raise ValueError("Model has no LSTM layer")
+    weights = {k: np.asarray(v, dtype=np.float32) for k, v in weights.items()}
+    layout = {"units": units, "dense_activations": dense_acts,
+              "input_shape": [int(d) for d in keras_model.input_shape[1:]]}
+    return weights, layout
+
+
+def save_numpy_weights(path, weights, layout, precision="fp32"):
+    """Write weights as .npz; kernels are cast / quantized, biases stay float32."""
+    arrays = {"layout_units": np.int64(layout["units"]),
+              "layout_input_shape": np.asarray(layout["input_shape"], dtype=np.int64),
+              "layout_dense_activations": np.asarray(layout["dense_activations"]),
+              "layout_precision": np.asarray(precision)}
+    for name, w in weights.items():
+        if name.endswith("_bias") or precision == "fp32":
+            arrays[name] = w.astype(np.float32)
+        elif precision == "fp16":
+            arrays[name] = w.astype(np.float16)
+        else:
+            arrays[name], arrays[name + "__scale"] = _quantize_int8(w)
+    np.savez(path, **arrays)
+
+
+# -------------------------
+# NumPy backend
+# -------------------------
+def _sigmoid(z):
+    return 0.5 * (np.tanh(0.5 * z) + 1.0)
+
+
+_ACTIVATIONS = {
+    "linear": lambda z: z,
+    "relu": lambda z: np.maximum(z, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+}
+
+
+class NumpyLSTM:
+    """
+    Keras-compatible LSTM forward pass (gate order i, f, c, o; tanh /
+    sigmoid activations) over a batch. Reduced-precision kernels stay in
+    their stored dtype and are widened to float32 per call, so the resident
+    copy is the small one.
+    """
+
+    def __init__(self, arrays, source=None):
+        self.source = source
+        self._arrays = arrays
+        self.units = int(arrays["layout_units"])
+        self.precision = str(arrays["layout_precision"])
+        self.dense_activations = [str(a) for a in arrays["layout_dense_activations"]]
+        input_shape = tuple(int(d) for d in arrays["layout_input_shape"])
+        self.input_shape = (None,) + input_shape
+        last = len(self.dense_activations) - 1
+        self.output_shape = (None, int(arrays[f"dense_{last}_bias"].shape[0]))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            return cls({k: npz[k] for k in npz.files}, source=path)
+
+    @classmethod
+    def load_shared(cls, path):
+        """Read-only views over a mapped .weights file; nothing is copied."""
+        return cls(open_mapped(path), source=path)
+
+    def _w(self, name):
+        w = self._arrays[name]
+        scale = self._arrays.get(name + "__scale")
+        if scale is not None:
+            return w.astype(np.float32) * scale
+        return w.astype(np.float32, copy=False)
+
+    def predict(self, x, batch_size=None, verbose=0):
+        x = np.asarray(x, dtype=np.float32)
+        if batch_size and len(x) > batch_size:
+            # bound the (n, steps, 4u) gate buffer like Keras bounds its batches
+            return np.concatenate([self._forward(x[i:i + batch_size])
+                                   for i in range(0, len(x), batch_size)])
+        return self._forward(x)
+
+    def _forward(self, x):
+        n, steps, _ = x.shape
+        u = self.units
+        kernel, recurrent, bias = self._w("lstm_kernel"), self._w("lstm_recurrent"), self._w("lstm_bias")
+
+        # input projection for every timestep in one matmul
+        xz = x @ kernel + bias  # (n, steps, 4u)
+        h = np.zeros((n, u), dtype=np.float32)
+        c = np.zeros((n, u), dtype=np.float32)
+        for t in range(steps):
+            z = xz[:, t] + h @ recurrent
+            i = _sigmoid(z[:, :u])
+            f = _sigmoid(z[:, u:2 * u])
+            g = np.tanh(z[:, 2 * u:3 * u])
+            o = _sigmoid(z[:, 3 * u:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+
+        out = h
+        for i, act in enumerate(self.dense_activations):
+            out = _ACTIVATIONS[act](out @ self._w(f"dense_{i}_kernel") + self._w(f"dense_{i}_bias"))
+        return out
+
+
+# -------------------------
+# TFLite backend
+# -------------------------
+class TFLiteModel:
+    """
+    TFLite interpreter with a Keras-like predict(). The input tensor is
+    resized to the batch size when it changes; calls are serialized because
+    an interpreter is not thread-safe.
+    """
+
+    def __init__(self, path, num_threads=None):
+        interpreter_cls = _TFLiteInterpreter
+        if interpreter_cls is None:
+            import tensorflow as tf
+            interpreter_cls = tf.lite.Interpreter
+        self.source = path
+        self._interpreter = interpreter_cls(model_path=path, num_threads=num_threads)
+        self._lock = threading.Lock()
+        self._interpreter.allocate_tensors()
+        inp = self._interpreter.get_input_details()[0]
+        out = self._interpreter.get_output_details()[0]
+        self._in_index, self._out_index = inp["index"], out["index"]
+        self.input_shape = (None,) + tuple(int(d) for d in inp["shape"][1:])
+        self.output_shape = (None,) + tuple(int(d) for d in out["shape"][1:])
+        self._batch = int(inp["shape"][0])
+
+    def predict(self, x, batch_size=None, verbose=0):
+        x = np.asarray(x, dtype=np.float32)
+        with self._lock:
+            if x.shape[0] != self._batch:
+                self._interpreter.resize_tensor_input(self._in_index, list(x.shape), strict=False)
+                self._interpreter.allocate_tensors()
+                self._batch = x.shape[0]
+            self._interpreter.set_tensor(self._in_index, x)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._out_index).copy()
+
+
+def shared_weights_path(path):
+    return os.path.splitext(path)[0] + ".weights"
+
+
+def load_variant(path, kind, shared=SHARED_WEIGHTS):
+    """Open a variant file written by lstm/export_variants.py."""
+    if kind.startswith("tflite"):
+        return TFLiteModel(path)
+    if shared and os.path.exists(shared_weights_path(path)):
+        return NumpyLSTM.load_shared(shared_weights_path(path))
+    return NumpyLSTM.load(path)
@@ -0,0 +1,433 @@
+"""
+Versioned model registry with hot swapping.
+
+Layout:
+    lstm/models/<version>/manifest.json
+    lstm/models/<version>/global_lstm_model/          (+ optional global_lstm_direct_model/)
+    lstm/models/<version>/scaler.pkl, label_encoder.pkl
+    lstm/models/<version>/variants/                    optional fp16 / int8 exports (lstm/export_variants.py)
+    lstm/models/ACTIVE                                 name of the version to serve
+
+Without an ACTIVE pointer the original artifacts in lstm/ are served as
+version "legacy". Swaps load and warm the new bundle first and then replace
+a single reference, so in-flight requests finish on the bundle they started
+with. Every worker polls the ACTIVE pointer and follows it in the background.
+
+NIYOJAN_MODEL_VARIANT picks which export of a version is served: "keras"
+(float32 SavedModel, default) or one of the reduced-precision variants in
+utils/model_backends.VARIANTS. A missing variant falls back to keras.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from utils.product_index import ProductIndex
+from utils.model_backends import VARIANTS, load_variant, shared_weights_path
+
+logger = logging.getLogger("niyojan.models")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEGACY_DIR = os.path.join(ROOT_DIR, "lstm")
+REGISTRY_DIR = os.getenv("NIYOJAN_MODEL_REGISTRY", os.path.join(LEGACY_DIR, "models"))
+ACTIVE_FILE = "ACTIVE"
+MANIFEST_FILE = "manifest.json"
+LEGACY_VERSION = "legacy"
+POINTER_POLL_SECONDS = float(os.getenv("NIYOJAN_MODEL_POLL_SECONDS", "5"))
+VARIANTS_DIR = "variants"
+MODEL_VARIANT = os.getenv("NIYOJAN_MODEL_VARIANT", "keras")
+
+
+# -------------------------
+# Manifests
+# -------------------------
+def _artifact_files(path):
+    """Every file below `path` (file or directory), sorted for hashing."""
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for root, _, names in os.walk(path):
+        files += [os.path.join(root, n) for n in names]
+    return sorted(files)
+
+
+def fingerprint(directory, artifacts):
+    """sha256 over relative path + content of every artifact file."""
+    h = hashlib.sha256()
+    for name in artifacts:
+        for fp in _artifact_files(os.path.join(directory, name)):
+            h.update(os.path.relpath(fp, directory).replace(os.sep, "/").encode())
+            with open(fp, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+    return h.hexdigest()
+
+
+def _artifact_names(manifest):
+    names = [a for a in (manifest.get("model"), manifest.get("direct_model"),
+                         manifest.get("scaler"), manifest.get("label_encoder")) if a]
+    if manifest.get("variants"):
+        names.append(VARIANTS_DIR)
+    return names
+
+
+def _find_variants(directory):
+    """variants/<model|direct_model>.<variant>.<ext> -> {"model": {variant: relpath}, ...}"""
+    found = {}
+    variants_dir = os.path.join(directory, VARIANTS_DIR)
+    if not os.path.isdir(variants_dir):
+        return found
+    for name in sorted(os.listdir(variants_dir)):
+        parts = name.split(".")
+        # .weights files are the mapped twins of the .npz exports, not variants of their own
+        if len(parts) == 3 and parts[1] in VARIANTS and parts[2] != "weights":
+            found.setdefault(parts[0], {})[parts[1]] = f"{VARIANTS_DIR}/{name}"
+    return found
+
+
+def build_manifest(directory, version=None, input_shape=None):
+    """Describe the artifacts found in `directory` (does not write anything)."""
+    manifest = {
+        "version": version or os.path.basename(os.path.normpath(directory)),
+        "model": "global_lstm_model" if os.path.isdir(os.path.join(directory, "global_lstm_model")) else None,
+        "direct_model": ("global_lstm_direct_model"
+                         if os.path.isdir(os.path.join(directory, "global_lstm_direct_model")) else None),
+        "scaler": "scaler.pkl",
+        "label_encoder": "label_encoder.pkl",
+        "input_shape": input_shape,
+        "variants": _find_variants(directory),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    metadata_path = os.path.join(directory, "metadata.json")
+    if os.path.exists(metadata_path):
+        with open(metadata_path, encoding="utf-8") as f:
+            metadata = json.load(f)
+        manifest["input_shape"] = manifest["input_shape"] or metadata.get("input_shape")
+        manifest["created_at"] = metadata.get("created_at", manifest["created_at"])
+    if not manifest["model"] and not manifest["direct_model"]:
+        raise FileNotFoundError(f"No global_lstm_model/ or global_lstm_direct_model/ in {directory}")
+    manifest["fingerprint"] = fingerprint(directory, _artifact_names(manifest))
+    return manifest
+
+
+def write_manifest(directory, version=None, input_shape=None):
+    manifest = build_manifest(directory, version, input_shape)
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+# -------------------------
+# Bundles
+# -------------------------
+class ModelBundle:
+    """Everything one model version needs to serve: models, scaler, encoder."""
+
+    def __init__(self, version, path, manifest, model, scaler, label_encoder, direct_model=None,
+                 variant="keras"):
+        self.version = version
+        self.variant = variant
+        self.path = path
+        self.manifest = manifest
+        self.model = model
+        self.scaler = scaler
+        self.label_encoder = label_encoder
+        self.direct_model = direct_model
+        # Product_ID -> code lookup for the model's second input feature
+        self.product_index = ProductIndex.from_label_encoder(label_encoder) if label_encoder is not None else None
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+
+    @property
+    def window(self):
+        return int(self.model.input_shape[1])
+
+    @property
+    def direct_horizon(self):
+        return int(self.direct_model.output_shape[-1]) if self.direct_model is not None else 0
+
+    def warm_up(self, batch_sizes=(1, 64)):
+        """Run dummy batches so graph tracing happens before the swap."""
+        for n in batch_sizes:
+            x = np.zeros((n,) + tuple(self.model.input_shape[1:]), dtype=np.float32)
+            self.model.predict(x, verbose=0)
+            if self.direct_model is not None:
+                self.direct_model.predict(x, verbose=0)
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "fingerprint": self.manifest.get("fingerprint"),
+            "variant": self.variant,
+            "input_shape": list(self.model.input_shape),
+            "direct_horizon": self.direct_horizon,
+            "products_encoded": len(self.product_index) if self.product_index is not None else 0,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def _load_keras(path):
+    from tensorflow.keras.models import load_model
+    return load_model(path, compile=False)
+
+
+def _load_model(path, manifest, key, variant):
+    """
+    Load manifest[key] ("model" / "direct_model") as `variant`; returns
+    (model, variant actually loaded). NumPy variants never import TensorFlow.
+    """
+    if variant != "keras":
+        relpath = manifest.get("variants", {}).get(key, {}).get(variant)
+        if relpath:
+            return load_variant(os.path.join(path, relpath), variant), variant
+        logger.warning("model %s has no %s export of %s; serving keras",
+                       manifest.get("version"), variant, key)
+    return _load_keras(os.path.join(path, manifest[key])), "keras"
+
+
+def load_bundle(version, registry_dir=REGISTRY_DIR, verify=True, variant=None):
+    """Load a registry version (or the legacy lstm/ artifacts)."""
+    variant = variant or MODEL_VARIANT
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown model variant {variant!r}; expected one of {sorted(VARIANTS)}")
+    if version == LEGACY_VERSION:
+        path = LEGACY_DIR
+        manifest = build_manifest(path, LEGACY_VERSION)
+        # the legacy direct model only applies when explicitly enabled
+        if os.getenv("NIYOJAN_DIRECT_MODEL", "1") == "0":
+            manifest["direct_model"] = None
+    else:
+        path = os.path.join(registry_dir, version)
+        manifest = read_manifest(path)
+        if verify:
+            actual = fingerprint(path, _artifact_names(manifest))
+            if actual != manifest.get("fingerprint"):
+                raise ValueError(f"Fingerprint mismatch for model {version}")
+    if not manifest.get("model"):
+        # the window size and horizons beyond the direct one come from the one-step model
+        raise ValueError(f"Model {version} has only a direct model; train it with "
+                         f"`lstm/train.py --into <version>` to add it to a servable version")
+
+    model, loaded_variant = _load_model(path, manifest, "model", variant)
+    direct_model = None
+    if manifest.get("direct_model"):
+        direct_model, _ = _load_model(path, manifest, "direct_model", variant)
+        if direct_model.input_shape[1:] != model.input_shape[1:]:
+            logger.warning("direct model input %s does not match global model %s; ignoring it",
+                           direct_model.input_shape, model.input_shape)
+            direct_model = None
+
+    with open(os.path.join(path, manifest["scaler"]), "rb") as f:
+        scaler = pickle.load(f)
+    label_encoder = None
+    encoder_path = os.path.join(path, manifest.get("label_encoder") or "label_encoder.pkl")
+    if os.path.exists(encoder_path):
+        with open(encoder_path, "rb") as f:
+            label_encoder = pickle.load(f)
+
+    expected = manifest.get("input_shape")
+    if expected and list(expected[1:]) != list(model.input_shape[1:]):
+        raise ValueError(f"Model {version} input shape {model.input_shape} != manifest {expected}")
+    return ModelBundle(version, path, manifest, model, scaler, label_encoder, direct_model,
+                       variant=loaded_variant)
+
+
+# -------------------------
+# Registry
+# -------------------------
+class ModelRegistry:
+    def __init__(self, registry_dir=REGISTRY_DIR):
+        self.registry_dir = registry_dir
+        self._active = None
+        self._lock = threading.Lock()
+        self._loading = None
+        self._last_error = None
+        self._pointer_mtime = None
+        self._pointer_checked = 0.0
+
+    # ---- pointer file ----
+    def _pointer_path(self):
+        return os.path.join(self.registry_dir, ACTIVE_FILE)
+
+    def _read_pointer(self):
+        try:
+            with open(self._pointer_path(), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _write_pointer(self, version):
+        os.makedirs(self.registry_dir, exist_ok=True)
+        tmp = self._pointer_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp, self._pointer_path())
+        self._pointer_mtime = os.path.getmtime(self._pointer_path())
+
+    # ---- queries ----
+    def list_versions(self):
+        versions = [{"version": LEGACY_VERSION, "path": LEGACY_DIR}]
+        if os.path.isdir(self.registry_dir):
+            for name in sorted(os.listdir(self.registry_dir)):
+                path = os.path.join(self.registry_dir, name)
+                if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+                    manifest = read_manifest(path)
+                    versions.append({"version": name, "path": path,
+                                     "fingerprint": manifest.get("fingerprint"),
+                                     "input_shape": manifest.get("input_shape"),
+                                     "direct_model": bool(manifest.get("direct_model")),
+                                     "variants": sorted(manifest.get("variants", {}).get("model", {})),
+                                     "created_at": manifest.get("created_at")})
+        return versions
+
+    def variant_files(self, variant=None):
+        """
+        Files the pointed-to version will be served from under `variant`
+        (mapped .weights when present); used to warm the page cache before
+        workers start. Empty for keras or a missing export.
+        """
+        variant = variant or MODEL_VARIANT
+        version = self._read_pointer() or LEGACY_VERSION
+        path = LEGACY_DIR if version == LEGACY_VERSION else os.path.join(self.registry_dir, version)
+        manifest = build_manifest(path, version) if version == LEGACY_VERSION else read_manifest(path)
+        files = []
+        for relpath in (manifest.get("variants", {}).get(key, {}).get(variant)
+                        for key in ("model", "direct_model")):
+            if not relpath:
+                continue
+            full = os.path.join(path, relpath)
+            mapped = shared_weights_path(full)
+            files.append(mapped if variant.startswith("numpy") and os.path.exists(mapped) else full)
+        return files
+
+    def status(self):
+        return {
+            "active": self._active.describe() if self._active else None,
+            "loading": self._loading,
+            "last_error": self._last_error,
+            "pointer": self._read_pointer(),
+        }
+
+    # ---- loading / swapping ----
+    def active(self):
+        """The bundle new requests should use; loads the initial one on first call."""
+        if self._active is None:
+            with self._lock:
+                if self._active is None:
+                    self._active = load_bundle(self._read_pointer() or LEGACY_VERSION, self.registry_dir)
+                    if os.path.exists(self._pointer_path()):
+                        self._pointer_mtime = os.path.getmtime(self._pointer_path())
+                    logger.info("serving model version %s", self._active.version)
+        return self._active
+
+    def _load_and_swap(self, version, persist, pointer_mtime=None):
+        started = time.perf_counter()
+        try:
+            bundle = load_bundle(version, self.registry_dir)
+            bundle.warm_up()
+            previous = self._active
+            self._active = bundle  # single reference swap; in-flight requests keep their bundle
+            if persist:
+                self._write_pointer(version)
+            elif pointer_mtime is not None:
+                self._pointer_mtime = pointer_mtime
+            self._last_error = None
+            logger.info("swapped model %s -> %s in %.2fs",
+                        previous.version if previous else None, version, time.perf_counter() - started)
+        except Exception as e:
+            self._last_error = f"{version}: {e}"
+            logger.exception("loading model %s failed", version)
+            raise
+        finally:
+            self._loading = None
+
+    def activate(self, version, background=True, persist=True, pointer_mtime=None):
+        """
+        Load, warm up and swap in `version`. With background=True returns at
+        once; poll status() for progress. persist writes the ACTIVE pointer
+        so the other workers follow; pointer_mtime (from refresh) is recorded
+        as followed only once the swap succeeded.
+        """
+        if version != LEGACY_VERSION and not os.path.exists(
+                os.path.join(self.registry_dir, version, MANIFEST_FILE)):
+            raise FileNotFoundError(f"Unknown model version: {version}")
+        with self._lock:
+            if self._loading:
+                raise RuntimeError(f"Model {self._loading} is already loading")
+            self._loading = version
+        if background:
+            threading.Thread(target=self._swap_quietly, args=(version, persist, pointer_mtime),
+                             name=f"model-load-{version}", daemon=True).start()
+        else:
+            self._load_and_swap(version, persist, pointer_mtime)
+        return self.status()
+
+    def _swap_quietly(self, version, persist, pointer_mtime=None):
+        try:
+            self._load_and_swap(version, persist, pointer_mtime)
+        except Exception:
+            pass  # recorded in _last_error
+
+    def refresh(self):
+        """
+        Cheap check (at most every POINTER_POLL_SECONDS) whether another
+        worker moved the ACTIVE pointer; follows it in the background. A
+        pointer whose version fails to load (e.g. still being copied) is
+        retried on the next check.
+        """
+        now = time.monotonic()
+        if now - self._pointer_checked < POINTER_POLL_SECONDS:
+            return
+        self._pointer_checked = now
+        try:
+            mtime = os.path.getmtime(self._pointer_path())
+        except OSError:
+            return
+        if mtime == self._pointer_mtime or self._loading:
+            return
+        version = self._read_pointer()
+        if version and (self._active is None or version != self._active.version):
+            try:
+                self.activate(version, background=True, persist=False, pointer_mtime=mtime)
+            except Exception as e:
+                logger.warning("following model pointer to %s failed: %s", version, e)
+        else:
+            self._pointer_mtime = mtime
+
+
+registry = ModelRegistry()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Model registry tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    p_manifest = sub.add_parser("manifest", help="(re)write manifest.json for a version directory")
+    p_manifest.add_argument("directory")
+    p_activate = sub.add_parser("activate", help="point ACTIVE at a version (workers follow it)")
+    p_activate.add_argument("version")
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        print(json.dumps(registry.list_versions(), indent=2))
+    elif args.cmd == "manifest":
+        print(json.dumps(write_manifest(args.directory), indent=2))
+    elif args.cmd == "activate":
+        if args.version != LEGACY_VERSION and not os.path.exists(
+                os.path.join(REGISTRY_DIR, args.version, MANIFEST_FILE)):
+            sys.exit(f"Unknown model version: {args.version}")
+        registry._write_pointer(args.version)
+        print(f"ACTIVE -> {args.version}")
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+
+# How products the encoder never saw are encoded:
+#   "mid"  -> centre of the trained code range (default, least biased towards any one product)
+#   "zero" -> 0, the value the model used to receive for every product
+#   <int>  -> an explicit code
+UNSEEN_PRODUCT_CODE = os.getenv("NIYOJAN_UNSEEN_PRODUCT_CODE", "mid")
+
+
+class ProductIndex:
+    """
+    Precomputed Product_ID -> code lookup built once from the LabelEncoder
+    the model was trained with. encode() maps a whole batch with one
+    searchsorted instead of calling LabelEncoder.transform per request.
+    """
+
+    def __init__(self, classes, unseen=UNSEEN_PRODUCT_CODE):
+        classes = np.asarray(classes).astype(str)
+        order = np.argsort(classes, kind="stable")
+        self._sorted = classes[order]
+        self._codes = order.astype(np.float32)  # LabelEncoder code = position in classes_
+        self.size = len(classes)
+        self.fallback = self._resolve_fallback(unseen)
+
+    @classmethod
+    def from_label_encoder(cls, label_encoder, unseen=UNSEEN_PRODUCT_CODE):
+        return cls(label_encoder.classes_, unseen)
+
+    def _resolve_fallback(self, unseen):
+        if unseen == "zero" or self.size == 0:
+            return 0.0
+        if unseen == "mid":
+            return (self.size - 1) / 2.0
+        return float(int(unseen))
+
+    def encode(self, products):
+        """
+        Codes for a batch of product ids as float32, plus a boolean mask of
+        products that were not in the training set (they get the fallback).
+        """
+        keys = np.asarray(products).astype(str)
+        if not self.size or not len(keys):
+            return np.full(len(keys), self.fallback, dtype=np.float32), np.ones(len(keys), dtype=bool)
+        pos = np.minimum(np.searchsorted(self._sorted, keys), self.size - 1)
+        known = self._sorted[pos] == keys
+        codes = np.where(known, self._codes[pos], self.fallback).astype(np.float32)
+        return codes, ~known
+
+    def __contains__(self, product):
+        pos = np.searchsorted(self._sorted, str(product))
+        return pos < self.size and self._sorted[pos] == str(product)
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,427 @@
+"""
+On-demand profiling for the live server (admin only).
+
+Modes:
+    sample      sampling profiler over *all* threads (event loop, threadpool,
+                background workers) via sys._current_frames; writes a
+                speedscope file (https://www.speedscope.app) and a hotspot table
+    cprofile    deterministic cProfile of the thread that starts it (the event
+                loop for async endpoints); writes a .pstats file
+    tracemalloc allocation growth between start and stop, top lines by size;
+                writes the tracemalloc snapshot
+
+A profile covers either one request (ProfileMiddleware: X-Niyojan-Profile
+header or ?profile=<mode>) or a time window (start_window / stop_window,
+behind /admin/profile/start|stop). Results are stored in PROFILES_DIR as
+<id>.json (summary) plus the mode's download file.
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import secrets
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES_DIR = os.getenv("NIYOJAN_PROFILES_DIR", os.path.join(ROOT_DIR, "backend", "app", "profiles"))
+PROFILES_KEEP = int(os.getenv("NIYOJAN_PROFILES_KEEP", "50"))
+SAMPLE_INTERVAL_MS = float(os.getenv("NIYOJAN_PROFILE_INTERVAL_MS", "5"))
+WINDOW_MAX_SECONDS = float(os.getenv("NIYOJAN_PROFILE_MAX_SECONDS", "300"))
+TOP_N = 25
+
+MODES = ("sample", "cprofile", "tracemalloc")
+DOWNLOAD_SUFFIX = {"sample": ".speedscope.json", "cprofile": ".pstats", "tracemalloc": ".tracemalloc"}
+
+# cProfile / tracemalloc are process-wide resources: one session of each at a time
+_exclusive = {"cprofile": threading.Lock(), "tracemalloc": threading.Lock()}
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+# -------------------------
+# Sampling profiler
+# -------------------------
+def _frame_key(frame):
+    code = frame.f_code
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+
+# leaf frames of threads that are parked, not working (idle loop, pool workers)
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "base_events.py")
+_IDLE_FUNCS = {"wait", "select", "poll", "get", "_wait_for_tstate_lock", "acquire", "_run_once"}
+
+
+def _is_idle(stack):
+    name, path, _ = stack[-1]
+    return name in _IDLE_FUNCS and path.endswith(_IDLE_FILES)
+
+
+class SamplingProfiler:
+    """Counts identical stacks per thread every `interval` seconds."""
+
+    def __init__(self, interval_ms=SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.stacks = {}  # thread name -> Counter(stack tuple)
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="niyojan-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_key(frame))
+                    frame = frame.f_back
+                name = names.get(ident, str(ident))
+                self.stacks.setdefault(name, Counter())[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def hotspots(self, top=TOP_N):
+        """
+        Functions by self time (leaf of the stack) and total time (anywhere
+        on it). Samples of parked threads are left out here; the speedscope
+        file keeps them.
+        """
+        self_counts, total_counts = Counter(), Counter()
+        for counter in self.stacks.values():
+            for stack, n in counter.items():
+                if _is_idle(stack):
+                    continue
+                self_counts[stack[-1]] += n
+                for key in set(stack):
+                    total_counts[key] += n
+        all_samples = sum(self_counts.values()) or 1
+        ms = self.interval * 1000
+        return [{
+            "function": f"{name} ({os.path.relpath(path, ROOT_DIR) if path.startswith(ROOT_DIR) else path}:{line})",
+            "self_ms": round(n * ms, 1),
+            "total_ms": round(total_counts[(name, path, line)] * ms, 1),
+            "self_pct": round(100.0 * n / all_samples, 1),
+        } for (name, path, line), n in self_counts.most_common(top)]
+
+    def to_speedscope(self, title):
+        frames, index = [], {}
+        profiles = []
+        ms = self.interval * 1000
+        for thread, counter in sorted(self.stacks.items()):
+            samples, weights = [], []
+            for stack, n in counter.most_common():
+                ids = []
+                for key in stack:
+                    if key not in index:
+                        index[key] = len(frames)
+                        frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                    ids.append(index[key])
+                samples.append(ids)
+                weights.append(round(n * ms, 3))
+            profiles.append({"type": "sampled", "name": thread, "unit": "milliseconds",
+                             "startValue": 0, "endValue": round(sum(weights), 3),
+                             "samples": samples, "weights": weights})
+        return {"$schema": "https://www.speedscope.app/file-format-schema.json",
+                "name": title, "exporter": "niyojan", "activeProfileIndex": 0,
+                "shared": {"frames": frames}, "profiles": profiles}
+
+
+# -------------------------
+# Sessions
+# -------------------------
+class ProfileSession:
+    """
+    One running profile. halt() stops collecting and is cheap; stop() (which
+    halts first if needed) writes the files and returns the summary, and may
+    run on another thread.
+    """
+
+    def __init__(self, mode, label, interval_ms=SAMPLE_INTERVAL_MS, directory=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.label = label
+        self.directory = directory or PROFILES_DIR
+        self.id = f"{datetime.now():%Y%m%d-%H%M%S}-{mode}-{secrets.token_hex(3)}"
+        self.interval_ms = interval_ms
+        self._lock = _exclusive.get(mode)
+        self._profiler = None
+        self._snapshot = None
+        self._started_tracemalloc = False
+        self.started_at = None
+        self._t0 = None
+        self._duration = None
+
+    def start(self):
+        if self._lock is not None and not self._lock.acquire(blocking=False):
+            raise ProfilerBusy(f"a {self.mode} profile is already running")
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._t0 = time.perf_counter()
+        if self.mode == "sample":
+            self._profiler = SamplingProfiler(self.interval_ms)
+            self._profiler.start()
+        elif self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+                self._started_tracemalloc = True
+            self._snapshot = tracemalloc.take_snapshot()
+        return self
+
+    def halt(self):
+        """
+        Stop collecting. cProfile hooks only the thread that enabled it, so
+        call this on that thread (the event loop) before handing stop() to a
+        worker thread.
+        """
+        if self._duration is not None:
+            return
+        self._duration = time.perf_counter() - self._t0
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        elif self.mode == "sample":
+            self._profiler._stop.set()
+
+    def stop(self):
+        try:
+            self.halt()
+            duration = self._duration
+            os.makedirs(self.directory, exist_ok=True)
+            download = os.path.join(self.directory, self.id + DOWNLOAD_SUFFIX[self.mode])
+            if self.mode == "sample":
+                self._profiler.stop()
+                with open(download, "w", encoding="utf-8") as f:
+                    json.dump(self._profiler.to_speedscope(f"{self.label} ({self.id})"), f)
+                summary = {"samples": self._profiler.samples, "hotspots": self._profiler.hotspots()}
+            elif self.mode == "cprofile":
+                self._profiler.dump_stats(download)
+                summary = {"hotspots": _pstats_hotspots(download)}
+            else:
+                after = tracemalloc.take_snapshot()
+                after.dump(download)
+                summary = {"growth": _tracemalloc_growth(self._snapshot, after),
+                           "traced_current_bytes": tracemalloc.get_traced_memory()[0]}
+                if self._started_tracemalloc:
+                    tracemalloc.stop()
+        finally:
+            if self._lock is not None:
+                self._lock.release()
+
+        meta = {"id": self.id, "mode": self.mode, "label": self.label, "started_at": self.started_at,
+                "duration_seconds": round(duration, 3), "file": os.path.basename(download), **summary}
+        # written aside and renamed: list_profiles() may read the directory meanwhile
+        path = os.path.join(self.directory, self.id + ".json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(path + ".tmp", path)
+        _prune(self.directory)
+        return meta
+
+
+def _pstats_hotspots(path, top=TOP_N):
+    stats = pstats.Stats(path)
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({"function": f"{name} ({os.path.relpath(filename, ROOT_DIR) if filename.startswith(ROOT_DIR) else filename}:{line})",
+                     "calls": nc, "self_ms": round(tt * 1000, 2), "total_ms": round(ct * 1000, 2)})
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return rows[:top]
+
+
+def _tracemalloc_growth(before, after, top=TOP_N):
+    return [{"location": str(stat.traceback[0]), "size_diff_kib": round(stat.size_diff / 1024, 1),
+             "size_kib": round(stat.size / 1024, 1), "count_diff": stat.count_diff}
+            for stat in after.compare_to(before, "lineno")[:top]]
+
+
+# -------------------------
+# Store
+# -------------------------
+def _prune(directory, keep=PROFILES_KEEP):
+    metas = sorted(f for f in os.listdir(directory) if f.endswith(".json") and not f.endswith(".speedscope.json"))
+    for name in metas[:-keep] if keep else []:
+        profile_id = name[:-len(".json")]
+        for suffix in (".json",) + tuple(DOWNLOAD_SUFFIX.values()):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory=None):
+    directory = directory or PROFILES_DIR
+    if not os.path.isdir(directory):
+        return []
+    out = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(".json") and not name.endswith(".speedscope.json"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                meta = json.load(f)
+            out.append({k: meta.get(k) for k in ("id", "mode", "label", "started_at", "duration_seconds")})
+    return out
+
+
+def _safe_id(profile_id):
+    if not profile_id or os.path.basename(profile_id) != profile_id or profile_id.startswith("."):
+        raise FileNotFoundError(profile_id)
+    return profile_id
+
+
+def get_profile(profile_id, directory=None):
+    path = os.path.join(directory or PROFILES_DIR, _safe_id(profile_id) + ".json")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def profile_file(profile_id, directory=None):
+    """Path of the downloadable file (speedscope / pstats / tracemalloc)."""
+    meta = get_profile(profile_id, directory)
+    path = os.path.join(directory or PROFILES_DIR, meta["file"])
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return path
+
+
+# -------------------------
+# Time-window profiling
+# -------------------------
+_window = {"session": None, "timer": None}
+_window_lock = threading.Lock()
+
+
+def start_window(mode="sample", interval_ms=SAMPLE_INTERVAL_MS, max_seconds=WINDOW_MAX_SECONDS, loop=None):
+    """
+    Start the (single) window profile; it stops itself after max_seconds.
+    cProfile must be stopped on the thread that started it, so pass the
+    event loop when starting from an async endpoint.
+    """
+    with _window_lock:
+        if _window["session"] is not None:
+            raise ProfilerBusy(f"profile {_window['session'].id} is already running")
+        session = ProfileSession(mode, "window", interval_ms).start()
+        if loop is not None:
+            timer = loop.call_later(max_seconds, _auto_stop, session.id, loop)
+        else:
+            timer = threading.Timer(max_seconds, _auto_stop, args=(session.id,))
+            timer.daemon = True
+            timer.start()
+        _window.update(session=session, timer=timer)
+    return {"id": session.id, "mode": mode, "started_at": session.started_at, "max_seconds": max_seconds}
+
+
+def halt_window(session_id=None):
+    """
+    Detach and halt the window profile (only if it is `session_id`, when
+    given) on the calling thread. Returns the session, whose stop() does the
+    slow part, or None when nothing is running.
+    """
+    with _window_lock:
+        session, timer = _window["session"], _window["timer"]
+        if session is None or (session_id is not None and session.id != session_id):
+            return None
+        _window.update(session=None, timer=None)
+    timer.cancel()
+    session.halt()
+    return session
+
+
+def stop_window():
+    session = halt_window()
+    return session.stop() if session is not None else None
+
+
+def window_status():
+    session = _window["session"]
+    return {"running": session is not None, "id": session.id if session else None,
+            "mode": session.mode if session else None}
+
+
+def _auto_stop(session_id, loop=None):
+    session = halt_window(session_id)
+    if session is None:
+        return
+    if loop is not None:
+        loop.run_in_executor(None, session.stop)  # keep file writing off the event loop
+    else:
+        session.stop()
+
+
+# -------------------------
+# Per-request profiling
+# -------------------------
+PROFILE_HEADER = "x-niyojan-profile"
+
+
+class ProfileMiddleware:
+    """
+    Profile single requests that ask for it with `X-Niyojan-Profile: <mode>`
+    or `?profile=<mode>`. `authorize(scope)` decides whether the caller may
+    (admins only); others are served normally. The profile id is returned in
+    the X-Niyojan-Profile-Id response header.
+    """
+
+    def __init__(self, app, authorize):
+        self.app = app
+        self.authorize = authorize
+
+    def _requested_mode(self, scope):
+        for key, value in scope.get("headers", []):
+            if key == PROFILE_HEADER.encode():
+                return value.decode().strip() or "sample"
+        query = scope.get("query_string", b"").decode()
+        for part in query.split("&"):
+            if part.startswith("profile="):
+                return part[len("profile="):] or "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        mode = self._requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None or not self.authorize(scope):
+            await self.app(scope, receive, send)
+            return
+
+        label = f"{scope['method']} {scope['path']}"
+        try:
+            session = ProfileSession(mode, label).start()
+        except (ValueError, ProfilerBusy) as e:
+            error = str(e).encode()
+
+            async def send_error_header(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-niyojan-profile-error", error)]
+                await send(message)
+
+            await self.app(scope, receive, send_error_header)
+            return
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-niyojan-profile-id", session.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            session.halt()
+            # joining the sampler, dumping stats and tracemalloc snapshots block
+            await run_in_threadpool(session.stop)
@@ -0,0 +1,150 @@
+"""
+Compact encodings of the /forecast result, opt-in via ?format=.
+
+- rows      the default List[Dict] shape (unchanged, validated by Pydantic)
+- columnar  parallel arrays per field plus a products x horizon forecast
+            matrix; Final_Forecasted_Sales (identical to the forecast) and
+            Forecasted_Revenue (Price x forecast) are left to the client
+- arrow     the same columns as an Arrow IPC stream (forecast as a
+            fixed-size list column), needs pyarrow
+
+columnar / arrow bodies are serialized with orjson when installed and
+compressed with brotli or gzip according to Accept-Encoding.
+"""
+import os
+import gzip
+import json
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from utils import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+FORMATS = ("rows", "columnar", "arrow")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNS = ["Product_ID", "Product_Name", "Category", "Price", "Trend_Symbol", "Last_Week",
+           "Last_Week_Sales", "Forecast_Model"]
+MIN_COMPRESS_BYTES = int(os.getenv("NIYOJAN_MIN_COMPRESS_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("NIYOJAN_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("NIYOJAN_BROTLI_QUALITY", "4"))
+
+OPTIONAL_PACKAGES = metrics.gauge("niyojan_optional_package_available",
+                                  "1 when an optional encoder / decoder package is importable", ("package",))
+
+
+def available():
+    """Optional packages behind the compact formats: {package: importable}."""
+    return {"orjson": orjson is not None, "brotli": brotli is not None, "pyarrow": pa is not None}
+
+
+for _package, _ok in available().items():
+    OPTIONAL_PACKAGES.set(int(_ok), package=_package)
+
+
+def pick_format(requested=None, accept=None):
+    """?format= wins; an Arrow Accept header selects arrow; otherwise rows."""
+    fmt = (requested or "").lower() or ("arrow" if accept and ARROW_MEDIA_TYPE in accept else "rows")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    if fmt == "arrow" and pa is None:
+        raise HTTPException(status_code=406, detail="Arrow output needs pyarrow on the server")
+    return fmt
+
+
+def _json_default(obj):
+    """numpy values for the stdlib fallback (orjson handles them natively)."""
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+def columnar(resp):
+    rows = resp["data"]
+    return {
+        "format": "columnar",
+        "products": resp["products"],
+        "horizon": resp["horizon"],
+        "model_version": resp.get("model_version"),
+        "batch_id": resp.get("batch_id"),
+        "validation": resp.get("validation"),
+        "columns": {name: [r[name] for r in rows] for name in COLUMNS},
+        "forecast": [r["Forecasted_Sales"] for r in rows],
+    }
+
+
+def arrow_ipc(resp):
+    table = columnar(resp)
+    horizon = table["horizon"]
+    arrays = [pa.array(values) for values in table["columns"].values()]
+    flat = pa.array([v for row in table["forecast"] for v in row], type=pa.int32())
+    arrays.append(pa.FixedSizeListArray.from_arrays(flat, horizon))
+    metadata = {k: str(table[k]) for k in ("products", "horizon", "model_version", "batch_id")}
+    batch = pa.RecordBatch.from_arrays(arrays, names=COLUMNS + ["forecast"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema.with_metadata(metadata)) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def negotiate_encoding(accept_encoding):
+    """'br', 'gzip' or None, honouring q-values (q=0 refuses)."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            accepted[token.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    scored = [(accepted.get(enc, wildcard), -i, enc) for i, enc in enumerate(candidates)]
+    q, _, enc = max(scored)
+    return enc if q > 0 else None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def render(resp, fmt, accept_encoding=None):
+    """Response for a non-default format, compressed when it pays off."""
+    if fmt == "arrow":
+        body, media_type = arrow_ipc(resp), ARROW_MEDIA_TYPE
+    else:
+        body, media_type = dumps(columnar(resp)), "application/json"
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,224 @@
+"""
+Cron-style schedules stored in SQLite (`report_schedules`), run by an asyncio
+task inside the API process.
+
+Every process runs the loop, but only the holder of the `scheduler` lease in
+`scheduler_leases` executes due schedules, so a multi-worker deployment runs
+each firing once. If the leader dies its lease expires and another worker
+takes over within NIYOJAN_SCHEDULER_LEASE_SECONDS. Job kinds are registered
+by the app; handlers run in a thread and return a short summary:
+
+    scheduler.register_job("report", fn)     # fn(schedule: dict) -> str
+
+Cron expressions have five fields (minute hour day month weekday, server
+local time) with *, lists, ranges and steps, or @hourly / @daily / @weekly /
+@monthly. Missed firings (server down) are not replayed; the next one is.
+"""
+import os
+import uuid
+import time
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import database.async_db as async_db
+import database.db_manager as db_manager
+from utils import metrics
+
+logger = logging.getLogger("niyojan.scheduler")
+
+SCHEDULER_ENABLED = os.getenv("NIYOJAN_SCHEDULER", "1") == "1"
+TICK_SECONDS = float(os.getenv("NIYOJAN_SCHEDULER_TICK_SECONDS", "20"))
+LEASE_SECONDS = float(os.getenv("NIYOJAN_SCHEDULER_LEASE_SECONDS", "60"))
+LEASE_NAME = "scheduler"
+
+JOB_RUNS = metrics.counter("niyojan_scheduler_runs_total", "Scheduled job runs by job and outcome", ("job", "status"))
+JOB_SECONDS = metrics.histogram("niyojan_scheduler_run_seconds", "Scheduled job duration", ("job",),
+                                buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+IS_LEADER = metrics.gauge("niyojan_scheduler_leader", "1 while this process holds the scheduler lease")
+
+# -------------------------
+# Cron expressions
+# -------------------------
+# weekday 0 and 7 are both Sunday
+FIELDS = [("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7)]
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+
+def _parse_field(text, name, low, high):
+    values = set()
+    for part in text.split(","):
+        expr, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if expr == "*":
+            start, end = low, high
+        elif "-" in expr:
+            start, end = (int(v) for v in expr.split("-", 1))
+        else:
+            start = end = int(expr)
+            if step > 1:
+                end = high
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"cron {name} out of range: {part!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expr):
+    """[(minutes, hours, days, months, weekdays) as sets, day restricted, weekday restricted]."""
+    expr = ALIASES.get(expr.strip(), expr.strip())
+    parts = expr.split()
+    if len(parts) != 5:
+        raise ValueError(f"cron needs 5 fields (minute hour day month weekday), got {expr!r}")
+    try:
+        sets = [_parse_field(p, name, low, high) for p, (name, low, high) in zip(parts, FIELDS)]
+    except ValueError as e:
+        raise ValueError(str(e) if "cron" in str(e) else f"invalid cron {expr!r}: {e}")
+    sets[4] = {d % 7 for d in sets[4]}
+    return sets, parts[2] != "*", parts[4] != "*"
+
+
+def next_run(expr, after=None):
+    """First minute strictly after `after` (local naive datetime) matching the expression."""
+    (minutes, hours, days, months, weekdays), day_set, weekday_set = parse_cron(expr)
+    t = (after or datetime.now()).replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = t + timedelta(days=366 * 5)
+    while t < limit:
+        if t.month not in months:
+            t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            continue
+        day_ok, weekday_ok = t.day in days, (t.isoweekday() % 7) in weekdays
+        # classic cron: if both day and weekday are restricted, either may match
+        if not ((day_ok or weekday_ok) if day_set and weekday_set else (day_ok and weekday_ok)):
+            t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            continue
+        if t.hour not in hours:
+            t = t.replace(minute=0) + timedelta(hours=1)
+            continue
+        if t.minute not in minutes:
+            t += timedelta(minutes=1)
+            continue
+        return t
+    raise ValueError(f"cron {expr!r} never fires")
+
+
+def next_run_ts(expr, after_ts=None):
+    after = datetime.fromtimestamp(after_ts) if after_ts is not None else None
+    return next_run(expr, after).timestamp()
+
+
+# -------------------------
+# Jobs
+# -------------------------
+_jobs = {}
+
+
+def register_job(name, fn):
+    _jobs[name] = fn
+
+
+def job_names():
+    return sorted(_jobs)
+
+
+def create(name, cron, job, params=None, created_by=None, enabled=True):
+    """Validate and store a schedule. Returns it as a dict."""
+    if job not in _jobs:
+        raise ValueError(f"unknown job {job!r}; expected one of {', '.join(job_names())}")
+    schedule_id = async_db.write_sync(db_manager.create_schedule, name, cron, job, params or {},
+                                      next_run_ts(cron), created_by, enabled)
+    return db_manager.get_schedule(schedule_id)
+
+
+class Scheduler:
+    def __init__(self, tick_seconds=TICK_SECONDS, lease_seconds=LEASE_SECONDS):
+        self.tick_seconds = tick_seconds
+        self.lease_seconds = lease_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._task = None
+        self._running = {}  # schedule id -> task
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop(), name="niyojan-scheduler")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            await async_db.write(db_manager.release_lease, LEASE_NAME, self.holder)
+            self.is_leader = False
+            IS_LEADER.set(0)
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("scheduler tick failed")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def tick(self):
+        leader = await async_db.write(db_manager.acquire_lease, LEASE_NAME, self.holder, self.lease_seconds)
+        if leader != self.is_leader:
+            logger.info("scheduler lease %s by %s", "acquired" if leader else "lost", self.holder)
+        self.is_leader = leader
+        IS_LEADER.set(1 if leader else 0)
+        if not leader:
+            return
+        now = time.time()
+        for schedule in await async_db.read(db_manager.due_schedules, now):
+            if schedule["id"] in self._running:
+                continue  # previous firing still running
+            try:
+                following = next_run_ts(schedule["cron"], now)
+            except ValueError as e:
+                await async_db.write(db_manager.finish_schedule_run, schedule["id"], "error", str(e), 0.0)
+                continue
+            await async_db.write(db_manager.mark_schedule_started, schedule["id"], following)
+            self.run_now(schedule)
+
+    def run_now(self, schedule):
+        """Run a schedule's job in the background, whether or not this process leads."""
+        task = asyncio.get_running_loop().create_task(self._execute(schedule))
+        self._running[schedule["id"]] = task
+        task.add_done_callback(lambda _: self._running.pop(schedule["id"], None))
+        return task
+
+    async def _execute(self, schedule):
+        job = schedule["job"]
+        started = time.perf_counter()
+        try:
+            fn = _jobs[job]
+            detail = await asyncio.to_thread(fn, schedule)
+            status = "ok"
+        except Exception as e:
+            logger.exception("schedule %s (%s) failed", schedule["name"], job)
+            detail, status = f"{type(e).__name__}: {e}", "error"
+        duration = time.perf_counter() - started
+        JOB_RUNS.inc(job=job, status=status)
+        JOB_SECONDS.observe(duration, job=job)
+        await async_db.write(db_manager.finish_schedule_run, schedule["id"], status,
+                             str(detail)[:2000] if detail is not None else None, round(duration, 3))
+
+    def status(self):
+        return {"enabled": SCHEDULER_ENABLED, "holder": self.holder, "leader": self.is_leader,
+                "lease": db_manager.get_lease(LEASE_NAME), "running": sorted(self._running),
+                "jobs": job_names()}
+
+
+scheduler = Scheduler()
@@ -0,0 +1,172 @@
+"""
+Sharded model inference over a persistent process pool.
+
+Large prepared batches (n >= NIYOJAN_SHARD_MIN_ROWS windows) are split into
+shards that run in long-lived worker processes. Each worker loads the model
+once (importing utils.forecast_engine) and keeps it. The model input and the
+forecast matrix live in multiprocessing.shared_memory blocks: tasks carry
+only block names and row ranges, each worker writes its rows in place, and
+the result comes back already in product order. Nothing is pickled but the
+task tuple.
+
+    NIYOJAN_INFERENCE_WORKERS   pool size (default: CPU count, max 8; 0 disables)
+    NIYOJAN_SHARD_MIN_ROWS      smallest batch worth sharding (default 20000)
+    NIYOJAN_SHARD_ROWS          rows per shard (default: batch split evenly over workers)
+"""
+import os
+import atexit
+import logging
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger("niyojan.sharded")
+
+INFERENCE_WORKERS = int(os.getenv("NIYOJAN_INFERENCE_WORKERS", str(min(os.cpu_count() or 1, 8))))
+SHARD_MIN_ROWS = int(os.getenv("NIYOJAN_SHARD_MIN_ROWS", "20000"))
+SHARD_ROWS = int(os.getenv("NIYOJAN_SHARD_ROWS", "0"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# -------------------------
+# Worker side
+# -------------------------
+_worker_bundles = {}
+# set by the pool initializer: workers predict their shard inline and never shard again.
+# (multiprocessing.parent_process() cannot tell: uvicorn --workers / --reload
+# also serve the app from spawned children)
+_pool_worker = False
+
+
+def _init_worker():
+    """One BLAS / TF thread per process: the pool itself provides the parallelism."""
+    global _pool_worker
+    _pool_worker = True
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    from utils.model_registry import MODEL_VARIANT
+    if MODEL_VARIANT == "keras":
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(1)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    from utils import forecast_engine  # noqa: F401 -- loads the active model once per worker
+
+
+def _worker_bundle(version, variant):
+    """The parent's bundle version in this worker (loaded on first use after a swap)."""
+    from utils.model_registry import registry, load_bundle
+    active = registry.active()
+    if active.version == version and active.variant == variant:
+        return active
+    key = (version, variant)
+    if key not in _worker_bundles:
+        _worker_bundles.clear()  # keep at most one extra version around
+        _worker_bundles[key] = load_bundle(version, registry.registry_dir, variant=variant)
+    return _worker_bundles[key]
+
+
+def _run_shard(task):
+    from utils import forecast_engine as fe
+
+    x_name, x_shape, out_name, out_shape, start, stop, version, variant, horizon, direct = task
+    x_shm = shared_memory.SharedMemory(name=x_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    try:
+        x = np.ndarray(x_shape, dtype=np.float32, buffer=x_shm.buf)
+        out = np.ndarray(out_shape, dtype=np.float64, buffer=out_shm.buf)
+        bundle = _worker_bundle(version, variant)
+        out[start:stop] = fe._predict_local(bundle, x[start:stop], horizon, direct)
+        del x, out  # release the buffer views before closing
+    finally:
+        x_shm.close()
+        out_shm.close()
+    return stop - start
+
+
+# -------------------------
+# Parent side
+# -------------------------
+def get_pool():
+    """The shared worker pool, started on first use (also runs backtest chunks)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=INFERENCE_WORKERS, mp_context=mp.get_context("spawn"),
+                                        initializer=_init_worker)
+            logger.info("started inference pool with %d workers", INFERENCE_WORKERS)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown)
+
+
+def should_shard(rows):
+    """Serving processes shard; pool workers (shards, backtest chunks) predict inline."""
+    return INFERENCE_WORKERS > 0 and rows >= SHARD_MIN_ROWS and not _pool_worker
+
+
+def log_status():
+    """Say once per serving process whether large batches will be sharded."""
+    if _pool_worker:
+        return
+    if INFERENCE_WORKERS > 0:
+        logger.info("sharded inference on: %d pool workers for batches of %d+ windows",
+                    INFERENCE_WORKERS, SHARD_MIN_ROWS)
+    else:
+        logger.info("sharded inference off (NIYOJAN_INFERENCE_WORKERS=0): batches run in-process")
+
+
+def warm_pool():
+    """Start every worker (and load its model) ahead of the first large batch."""
+    pool = get_pool()
+    list(pool.map(_noop, range(INFERENCE_WORKERS)))
+
+
+def _noop(_):
+    return os.getpid()
+
+
+def _shards(rows, workers):
+    size = SHARD_ROWS or -(-rows // workers)
+    return [(s, min(s + size, rows)) for s in range(0, rows, size)]
+
+
+def predict(bundle, x, horizon, direct):
+    """
+    forecast_engine._predict_local(bundle, x, horizon, direct) computed shard
+    by shard in the pool; returns (n, horizon) float64 in row order.
+    """
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    out_shape = (len(x), horizon)
+    x_shm = shared_memory.SharedMemory(create=True, size=max(x.nbytes, 1))
+    out_shm = shared_memory.SharedMemory(create=True, size=max(len(x) * horizon * 8, 1))
+    try:
+        np.ndarray(x.shape, dtype=np.float32, buffer=x_shm.buf)[:] = x
+        tasks = [(x_shm.name, x.shape, out_shm.name, out_shape, start, stop,
+                  bundle.version, bundle.variant, horizon, bool(direct))
+                 for start, stop in _shards(len(x), INFERENCE_WORKERS)]
+        done = sum(get_pool().map(_run_shard, tasks))
+        if done != len(x):
+            raise RuntimeError(f"sharded inference returned {done} of {len(x)} rows")
+        return np.ndarray(out_shape, dtype=np.float64, buffer=out_shm.buf).copy()
+    finally:
+        x_shm.close()
+        x_shm.unlink()
+        out_shm.close()
+        out_shm.unlink()
@@ -0,0 +1,77 @@
+"""
+Single-file weight store that every worker maps read-only.
+
+Layout: MAGIC | uint64 header length | JSON header | 64-byte aligned arrays.
+open_mapped() returns NumPy views over one read-only np.memmap, so the
+weights live once in the page cache and are shared by all processes that
+map the file instead of being copied into each worker's heap.
+"""
+import os
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"NIYW0001"
+ALIGN = 64
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def pack(arrays, path):
+    """Write {name: ndarray} to `path` atomically."""
+    arrays = {k: np.asarray(v) for k, v in arrays.items()}  # tobytes() writes C order
+    index, offset = {}, 0
+    for name, a in arrays.items():
+        index[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset = _align(offset + a.nbytes)
+    header = json.dumps(index).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, a in arrays.items():
+            f.seek(data_start + index[name]["offset"])
+            f.write(a.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+    return path
+
+
+def pack_npz(npz_path, out_path=None):
+    """Repack an .npz weight file as <name>.weights next to it."""
+    out_path = out_path or os.path.splitext(npz_path)[0] + ".weights"
+    with np.load(npz_path) as npz:
+        return pack({k: npz[k] for k in npz.files}, out_path)
+
+
+def open_mapped(path):
+    """{name: read-only ndarray view} backed by one shared mapping of `path`."""
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(mm[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a weights file")
+    (header_len,) = struct.unpack("<Q", bytes(mm[len(MAGIC):len(MAGIC) + 8]))
+    header_end = len(MAGIC) + 8 + header_len
+    index = json.loads(bytes(mm[len(MAGIC) + 8:header_end]))
+    data_start = _align(header_end)
+
+    arrays = {}
+    for name, meta in index.items():
+        dtype = np.dtype(meta["dtype"])
+        count = int(np.prod(meta["shape"], dtype=np.int64))
+        start = data_start + meta["offset"]
+        arrays[name] = mm[start:start + count * dtype.itemsize].view(dtype).reshape(meta["shape"])
+    return arrays
+
+
+def warm(paths):
+    """Read files once so the first worker to map them finds the pages resident."""
+    total = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                total += len(block)
+    return total
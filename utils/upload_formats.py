@@ -0,0 +1,112 @@
+"""
+Sales uploads in more than plain CSV. The format is sniffed from the leading
+bytes, so file names and content types do not matter:
+
+- CSV, optionally gzip- or zstd-compressed (zstd needs `zstandard`)
+- Parquet, Arrow IPC file / Feather v2, Arrow IPC stream (need `pyarrow`)
+
+Columnar uploads are read from the request bytes without a copy
+(pa.py_buffer) and handed to pandas with split blocks, so numeric columns
+land in the preprocessing arrays without another pass; a timestamp/date
+`Week` column arrives as datetime64 and skips date parsing entirely.
+"""
+import io
+import os
+import gzip
+
+import pandas as pd
+
+from utils import metrics
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# decompressed CSV larger than this is refused (guards against zip bombs)
+MAX_DECOMPRESSED_BYTES = int(os.getenv("NIYOJAN_MAX_DECOMPRESSED_MB", "2048")) * 1024 * 1024
+
+UPLOADS = metrics.counter("niyojan_uploads_total", "Sales uploads by detected format", ("format",))
+OPTIONAL_PACKAGES = metrics.gauge("niyojan_optional_package_available",
+                                  "1 when an optional encoder / decoder package is importable", ("package",))
+
+
+def available():
+    """Optional packages behind the non-CSV uploads: {package: importable}."""
+    return {"pyarrow": pa is not None, "zstandard": zstandard is not None}
+
+
+for _package, _ok in available().items():
+    OPTIONAL_PACKAGES.set(int(_ok), package=_package)
+
+MAGIC = [
+    (b"PAR1", "parquet"),
+    (b"ARROW1", "arrow"),
+    (b"\xff\xff\xff\xff", "arrow_stream"),
+    (b"\x1f\x8b", "csv.gz"),
+    (b"\x28\xb5\x2f\xfd", "csv.zst"),
+]
+
+
+class UnsupportedUpload(ValueError):
+    """The upload is in a format this server cannot read (missing optional dependency)."""
+
+
+def detect(raw):
+    """'parquet', 'arrow', 'arrow_stream', 'csv.gz', 'csv.zst' or 'csv'."""
+    for magic, kind in MAGIC:
+        if raw[:len(magic)] == magic:
+            return kind
+    return "csv"
+
+
+def _bounded(stream, what):
+    data = stream.read(MAX_DECOMPRESSED_BYTES + 1)
+    if len(data) > MAX_DECOMPRESSED_BYTES:
+        raise ValueError(f"{what} upload expands beyond {MAX_DECOMPRESSED_BYTES // (1024 * 1024)} MB")
+    return data
+
+
+def decompress(raw, kind):
+    if kind == "csv.gz":
+        return _bounded(gzip.GzipFile(fileobj=io.BytesIO(raw)), "gzip")
+    if kind == "csv.zst":
+        if zstandard is None:
+            raise UnsupportedUpload("zstd-compressed uploads need the zstandard package on the server")
+        return _bounded(zstandard.ZstdDecompressor().stream_reader(io.BytesIO(raw)), "zstd")
+    return raw
+
+
+def _arrow_table(raw, kind):
+    if pa is None:
+        raise UnsupportedUpload(f"{kind} uploads need pyarrow on the server")
+    buf = pa.py_buffer(raw)  # wraps the request bytes, no copy
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(pa.BufferReader(buf))
+    if kind == "arrow":
+        return pa.ipc.open_file(buf).read_all()
+    return pa.ipc.open_stream(buf).read_all()
+
+
+def read_frame(raw):
+    """DataFrame from upload bytes in any supported format."""
+    kind = detect(raw)
+    UPLOADS.inc(format=kind)
+    if kind in ("parquet", "arrow", "arrow_stream"):
+        table = _arrow_table(raw, kind)
+        if any(pa.types.is_dictionary(f.type) for f in table.schema):
+            # dictionary-encoded strings would become Categoricals; the pipeline expects plain values
+            table = table.cast(pa.schema([
+                pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+                for f in table.schema
+            ]))
+        df = table.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
+        del table
+        return df
+    return pd.read_csv(io.BytesIO(decompress(raw, kind)))
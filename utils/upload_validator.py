@@ -0,0 +1,175 @@
+"""
+Schema checks for sales uploads, run once per upload before forecasting.
+
+    df, report = upload_validator.validate(df)
+
+- Week: the date format is inferred from a sample of distinct values and
+  then applied explicitly to the distinct values only (an upload has a few
+  hundred distinct weeks, not a few hundred thousand). Day-first and
+  month-first are told apart by which one spaces the weeks 7 days apart.
+- Sales_Quantity / Price columns must be numbers >= 0, Product_ID non-empty.
+- Duplicate (Product_ID, Week) rows keep the last occurrence.
+- Gaps (missing weeks inside a product's history) are reported.
+
+Rows with errors are dropped; the report lists counts and the first few row
+numbers (1-based data rows, header excluded) per problem. The upload is
+rejected (ValueError with the report attached) when more than
+NIYOJAN_UPLOAD_MAX_ERROR_SHARE of the rows have errors.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+MAX_ERROR_SHARE = float(os.getenv("NIYOJAN_UPLOAD_MAX_ERROR_SHARE", "0.05"))
+SAMPLE_SIZE = 500
+EXAMPLES = 10
+
+# ties go to the earlier entry: day-first before month-first, like the old dayfirst=True
+DATE_FORMATS = [
+    "%Y-%m-%d", "%d-%m-%Y", "%m-%d-%Y", "%d/%m/%Y", "%m/%d/%Y", "%Y/%m/%d", "%d.%m.%Y",
+    "%Y-%m-%d %H:%M:%S", "%d-%m-%y", "%d/%m/%y", "%d-%b-%Y", "%d %b %Y",
+]
+# forecast inputs: unreadable or negative values drop the row
+NUMERIC_COLUMNS = ["Sales_Quantity", "Price_per_Unit", "Price"]
+# informational: coerced to numbers (unreadable -> NaN, negative refunds allowed), only warned about
+COERCED_COLUMNS = ["Revenue"]
+
+
+class UploadRejected(ValueError):
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+def _weekly_share(dates):
+    """Share of gaps between consecutive distinct dates that are whole weeks."""
+    days = np.diff(np.sort(dates.dropna().unique()).astype("datetime64[D]").astype(np.int64))
+    return float((days % 7 == 0).mean()) if len(days) else 1.0
+
+
+def infer_date_format(values, sample_size=SAMPLE_SIZE):
+    """Best format for a sample of distinct date strings, or None if none parses any."""
+    sample = pd.Series(values).dropna().astype(str).str.strip()
+    sample = sample.drop_duplicates()
+    if len(sample) > sample_size:
+        sample = sample.sample(sample_size, random_state=0)
+    best, best_score = None, None
+    for rank, fmt in enumerate(DATE_FORMATS):
+        parsed = pd.to_datetime(sample, format=fmt, errors="coerce")
+        hits = int(parsed.notna().sum())
+        if not hits:
+            continue
+        score = (hits, _weekly_share(parsed), -rank)
+        if best_score is None or score > best_score:
+            best, best_score = fmt, score
+    return best
+
+
+def parse_weeks(column):
+    """(datetime64 Series, formats used). Unparseable cells become NaT."""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column, []
+    codes, uniques = pd.factorize(column)
+    parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype="datetime64[ns]")
+    formats = []
+    remaining = pd.Series(uniques).astype(str).str.strip()
+    # a file may mix formats: keep inferring on what is left until nothing new parses
+    while len(remaining) and len(formats) < 3:
+        fmt = infer_date_format(remaining)
+        if fmt is None:
+            break
+        hit = pd.to_datetime(remaining, format=fmt, errors="coerce")
+        parsed[hit.index[hit.notna()]] = hit[hit.notna()].astype("datetime64[ns]")
+        formats.append(fmt)
+        remaining = remaining[hit.isna()]
+    weeks = parsed.to_numpy()[codes]
+    weeks[codes < 0] = np.datetime64("NaT")
+    return pd.Series(weeks, index=column.index, name=column.name), formats
+
+
+def _problem(mask, values=None):
+    # the index holds the original row positions, also after bad rows were dropped
+    rows = mask.index[mask.to_numpy()]
+    entry = {"count": int(len(rows)), "rows": (rows[:EXAMPLES] + 1).tolist()}
+    if values is not None:
+        entry["examples"] = values.loc[rows[:EXAMPLES]].astype(str).tolist()
+    return entry
+
+
+def validate(df, max_error_share=MAX_ERROR_SHARE):
+    """Checked copy of `df` (bad rows dropped, Week as datetime) and a report dict."""
+    df = df.reset_index(drop=True)
+    errors, warnings = {}, {}
+    bad = pd.Series(False, index=df.index)
+
+    weeks, formats = parse_weeks(df["Week"])
+    invalid = weeks.isna()
+    if invalid.any():
+        errors["invalid_week"] = _problem(invalid, df["Week"])
+    bad |= invalid
+    df["Week"] = weeks
+
+    codes, uniques = pd.factorize(df["Product_ID"])
+    blank = (pd.Series(uniques).astype(str).str.strip() == "").to_numpy()
+    missing_id = pd.Series((codes < 0) | np.append(blank, False)[codes], index=df.index)
+    if missing_id.any():
+        errors["missing_product_id"] = _problem(missing_id)
+    bad |= missing_id
+
+    for col in [c for c in NUMERIC_COLUMNS if c in df.columns]:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            numbers = df[col]
+            not_number = pd.Series(False, index=df.index)
+        else:
+            numbers = pd.to_numeric(df[col], errors="coerce")
+            not_number = numbers.isna() & df[col].notna()
+        if not_number.any():
+            errors[f"{col}_not_a_number"] = _problem(not_number, df[col])
+        negative = numbers < 0
+        if negative.any():
+            errors[f"{col}_negative"] = _problem(negative, df[col])
+        bad |= not_number | negative
+        df[col] = numbers
+
+    for col in [c for c in COERCED_COLUMNS if c in df.columns]:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            numbers = pd.to_numeric(df[col], errors="coerce")
+            not_number = numbers.isna() & df[col].notna()
+            if not_number.any():
+                warnings[f"{col}_not_a_number"] = _problem(not_number, df[col])
+            df[col] = numbers
+
+    n_bad = int(bad.sum())
+    report = {"rows": len(df), "valid_rows": len(df) - n_bad, "date_formats": formats,
+              "errors": errors, "warnings": warnings}
+    if len(df) == 0 or n_bad > max_error_share * len(df):
+        raise UploadRejected(
+            f"{n_bad} of {len(df)} rows failed validation (limit {max_error_share:.0%})", report)
+    keep = ~bad.to_numpy()
+
+    # duplicates and gaps on integer keys: product code, then day number, then row position
+    pcode = codes[keep]
+    day = weeks.to_numpy()[keep].astype("datetime64[D]").astype(np.int64)
+    rows = df.index.to_numpy()[keep]
+    order = np.lexsort((rows, day, pcode))
+    same = pcode[order][1:] == pcode[order][:-1]
+    step = np.diff(day[order])
+
+    dup = same & (step == 0)  # the earlier of two equal (product, week) rows; the last one wins
+    if dup.any():
+        dup_mask = pd.Series(False, index=df.index)
+        dup_mask[rows[order][:-1][dup]] = True
+        warnings["duplicate_product_week"] = _problem(dup_mask)
+        keep[rows[order][:-1][dup]] = False
+
+    missing_weeks = np.where(same & (step > 7), step // 7 - 1, 0)
+    if missing_weeks.any():
+        gap_products = pd.unique(pcode[order][1:][missing_weeks > 0])
+        warnings["gaps"] = {"products": int(len(gap_products)), "missing_weeks": int(missing_weeks.sum()),
+                            "examples": [str(uniques[c]) for c in gap_products[:EXAMPLES]]}
+
+    if not keep.all():
+        df = df[keep]
+    report["valid_rows"] = len(df)
+    return df, report